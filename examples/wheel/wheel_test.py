@@ -512,6 +512,29 @@ Tag: cp38-abi3-{os_string}_{arch}
                 ],
             )
 
+    def test_compression_policy(self):
+        filename = self._get_path("compression_policy-0.0.1-py3-none-any.whl")
+
+        with zipfile.ZipFile(filename) as zf:
+            compress_types = {
+                zinfo.filename: zinfo.compress_type for zinfo in zf.infolist()
+            }
+        self.assertEqual(
+            {
+                "examples/wheel/lib/module_with_type_annotations.py": zipfile.ZIP_DEFLATED,
+                "examples/wheel/lib/module_with_type_annotations.pyi": zipfile.ZIP_STORED,
+                "examples/wheel/lib/simple_module.py": zipfile.ZIP_DEFLATED,
+                # Smaller than min_compression_size
+                "compression_policy-0.0.1.data/scripts/NOTICE": zipfile.ZIP_STORED,
+                "compression_policy-0.0.1.dist-info/RECORD": zipfile.ZIP_DEFLATED,
+            },
+            {
+                name: compress_type
+                for name, compress_type in compress_types.items()
+                if not name.endswith(("/WHEEL", "/METADATA"))
+            },
+        )
+
     def test_extra_requires(self):
         filename = self._get_path("extra_requires-0.0.1-py3-none-any.whl")
 
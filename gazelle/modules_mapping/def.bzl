@@ -30,23 +30,57 @@ def _modules_mapping_impl(ctx):
         transitive = [dep[DefaultInfo].files for dep in ctx.attr.wheels] + [dep[DefaultInfo].data_runfiles.files for dep in ctx.attr.wheels],
     )
 
+    # Each wheel is scanned in its own action, so that changing one requirement
+    # only rescans the wheels that changed. The partial mappings are then merged
+    # in the same order as the wheels would have been scanned in.
+    partial_mappings = []
+    basename_counts = {}
+    for whl in all_wheels.to_list():
+        # The depset already removed duplicate files. Different files can still
+        # share a file name, e.g. wheels from different repositories, so give
+        # those distinct outputs.
+        count = basename_counts.get(whl.basename, 0)
+        basename_counts[whl.basename] = count + 1
+        output_name = whl.basename
+        if count:
+            output_name = "{}.{}".format(whl.basename, count)
+        partial_mapping = ctx.actions.declare_file(
+            "{}.modules_mapping/{}.json".format(ctx.label.name, output_name),
+        )
+        args = ctx.actions.args()
+        if ctx.attr.include_stub_packages:
+            args.add("--include_stub_packages")
+        args.add("--partial")
+        args.add("--output_file", partial_mapping)
+        args.add_all("--exclude_patterns", ctx.attr.exclude_patterns)
+        args.add("--wheels", whl)
+        ctx.actions.run(
+            inputs = [whl],
+            outputs = [partial_mapping],
+            executable = ctx.executable._generator,
+            arguments = [args],
+            mnemonic = "PyModulesMappingScan",
+            progress_message = "Scanning modules in %{input}",
+            use_default_shell_env = False,
+        )
+        partial_mappings.append(partial_mapping)
+
     args = ctx.actions.args()
 
     # Spill parameters to a file prefixed with '@'. Note, the '@' prefix is the same
     # prefix as used in the `generator.py` in `fromfile_prefix_chars` attribute.
     args.use_param_file(param_file_arg = "@%s")
     args.set_param_file_format(format = "multiline")
-    if ctx.attr.include_stub_packages:
-        args.add("--include_stub_packages")
     args.add("--output_file", modules_mapping)
-    args.add_all("--exclude_patterns", ctx.attr.exclude_patterns)
-    args.add_all("--wheels", all_wheels)
+    args.add_all("--mappings", partial_mappings)
 
     ctx.actions.run(
-        inputs = all_wheels,
+        inputs = partial_mappings,
         outputs = [modules_mapping],
         executable = ctx.executable._generator,
         arguments = [args],
+        mnemonic = "PyModulesMapping",
+        progress_message = "Merging modules mapping %{output}",
         use_default_shell_env = False,
     )
     return [DefaultInfo(files = depset([modules_mapping]))]
@@ -13,7 +13,9 @@
 # limitations under the License.
 
 import argparse
+import concurrent.futures
 import json
+import os
 import pathlib
 import re
 import sys
@@ -26,100 +28,184 @@ class Generator:
     output_file = None
     excluded_patterns = None
 
-    def __init__(self, stderr, output_file, excluded_patterns, include_stub_packages):
+    def __init__(
+        self, stderr, output_file, excluded_patterns, include_stub_packages, jobs=1
+    ):
         self.stderr = stderr
         self.output_file = output_file
-        self.excluded_patterns = [re.compile(pattern) for pattern in excluded_patterns]
+        self.excluded_patterns = compile_patterns(excluded_patterns)
         self.include_stub_packages = include_stub_packages
+        self.jobs = jobs
         self.mapping = {}
 
     # dig_wheel analyses the wheel .whl file determining the modules it provides
     # by looking at the directory structure.
     def dig_wheel(self, whl):
-        # Skip stubs and types wheels.
-        wheel_name = get_wheel_name(whl)
-        if self.include_stub_packages and (
-            wheel_name.endswith(("_stubs", "_types"))
-            or wheel_name.startswith(("types_", "stubs_"))
-        ):
-            self.mapping[wheel_name.lower()] = wheel_name.lower()
+        self.mapping.update(
+            scan_wheel(whl, self.excluded_patterns, self.include_stub_packages)
+        )
+
+    # dig_wheels analyses all the wheels, in parallel if jobs > 1. The per-wheel
+    # mappings are merged in the order of the wheels, so the result is the same
+    # as calling dig_wheel for each wheel in turn.
+    def dig_wheels(self, wheels):
+        wheels = list(wheels)
+        jobs = min(self.jobs, len(wheels))
+        if jobs <= 1:
+            for whl in wheels:
+                self.dig_wheel(whl)
             return
-        with zipfile.ZipFile(whl, "r") as zip_file:
-            for path in zip_file.namelist():
-                if is_metadata(path):
-                    if data_has_purelib_or_platlib(path):
-                        self.module_for_path(path, whl)
-                    else:
-                        continue
-                else:
-                    self.module_for_path(path, whl)
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            mappings = executor.map(
+                scan_wheel,
+                wheels,
+                [self.excluded_patterns] * len(wheels),
+                [self.include_stub_packages] * len(wheels),
+                chunksize=max(1, len(wheels) // (jobs * 4)),
+            )
+            for mapping in mappings:
+                self.mapping.update(mapping)
 
+    # simplify drops the modules that are provided by the same wheel as their
+    # closest parent module in the mapping. Looking at that parent is enough: if
+    # it is dropped, its own closest parent is provided by the same wheel, and so
+    # on up to a parent that is kept. This is a single pass over the mapping,
+    # which is already a trie of the dotted module names.
     def simplify(self):
+        mapping = self.mapping
         simplified = {}
-        for module, wheel_name in sorted(self.mapping.items(), key=lambda x: x[0]):
-            mod = module
+        for module, wheel_name in mapping.items():
+            parent = module
             while True:
-                if mod in simplified:
-                    if simplified[mod] != wheel_name:
-                        break
-                    wheel_name = ""
+                dot = parent.rfind(".")
+                if dot == -1:
+                    simplified[module] = wheel_name
                     break
-                if mod.count(".") == 0:
+                parent = parent[:dot]
+                parent_wheel_name = mapping.get(parent)
+                if parent_wheel_name is not None:
+                    if parent_wheel_name != wheel_name:
+                        simplified[module] = wheel_name
                     break
-                mod = mod.rsplit(".", 1)[0]
-            if wheel_name:
-                simplified[module] = wheel_name
-        self.mapping = simplified
-
-    def module_for_path(self, path, whl):
-        ext = pathlib.Path(path).suffix
-        if ext == ".py" or ext == ".so":
-            if "purelib" in path or "platlib" in path:
-                root = "/".join(path.split("/")[2:])
-            else:
-                root = path
-
-            wheel_name = get_wheel_name(whl)
-
-            if root.endswith("/__init__.py"):
-                # Note the '/' here means that the __init__.py is not in the
-                # root of the wheel, therefore we can index the directory
-                # where this file is as an importable package.
-                module = root[: -len("/__init__.py")].replace("/", ".")
-                if not self.is_excluded(module):
-                    self.mapping[module] = wheel_name
-
-            # Always index the module file.
-            if ext == ".so":
-                # Also remove extra metadata that is embeded as part of
-                # the file name as an extra extension.
-                ext = "".join(pathlib.Path(root).suffixes)
-            module = root[: -len(ext)].replace("/", ".")
-            if not self.is_excluded(module):
-                if not self.is_excluded(module):
-                    self.mapping[module] = wheel_name
+        # Keep the output sorted by module name.
+        self.mapping = dict(sorted(simplified.items()))
 
     def is_excluded(self, module):
-        for pattern in self.excluded_patterns:
-            if pattern.search(module):
-                return True
-        return False
-
-    # run is the entrypoint for the generator.
-    def run(self, wheels):
-        for whl in wheels:
-            try:
-                self.dig_wheel(whl)
-            except AssertionError as error:
-                print(error, file=self.stderr)
-                return 1
-        self.simplify()
+        return is_excluded(module, self.excluded_patterns)
+
+    # merge_mappings merges the unsimplified mappings previously written by
+    # run(..., partial=True), in order.
+    def merge_mappings(self, mapping_files):
+        for mapping_file in mapping_files:
+            with open(mapping_file, "r") as f:
+                self.mapping.update(json.load(f))
+
+    # run is the entrypoint for the generator. The mapping is only simplified
+    # when it is complete; a partial mapping is written as is, so that it can be
+    # merged with the mappings of other wheels later.
+    def run(self, wheels, mapping_files=(), partial=False):
+        try:
+            self.dig_wheels(wheels)
+        except AssertionError as error:
+            print(error, file=self.stderr)
+            return 1
+        self.merge_mappings(mapping_files)
+        if not partial:
+            self.simplify()
         mapping_json = json.dumps(self.mapping)
         with open(self.output_file, "w") as f:
             f.write(mapping_json)
         return 0
 
 
+# scan_wheel returns the mapping from the modules provided by a single wheel to
+# the wheel name. It is a module level function so that it can be run in a
+# process pool.
+def scan_wheel(whl, excluded_patterns, include_stub_packages):
+    wheel_name = get_wheel_name(whl)
+    # Skip stubs and types wheels.
+    if include_stub_packages and (
+        wheel_name.endswith(("_stubs", "_types"))
+        or wheel_name.startswith(("types_", "stubs_"))
+    ):
+        return {wheel_name.lower(): wheel_name.lower()}
+
+    mapping = {}
+    with zipfile.ZipFile(whl, "r") as zip_file:
+        for path in zip_file.namelist():
+            if is_metadata(path) and not data_has_purelib_or_platlib(path):
+                continue
+            for module in modules_for_path(path):
+                if not is_excluded(module, excluded_patterns):
+                    mapping[module] = wheel_name
+    return mapping
+
+
+# modules_for_path returns the modules that a path in a wheel provides.
+def modules_for_path(path):
+    if not path.endswith((".py", ".so")):
+        return []
+    # Work on strings rather than pathlib objects; this runs for every file in
+    # every wheel.
+    # A file named just ".py" or ".so" has no suffix.
+    if path == path[-3:] or path[-4] == "/":
+        return []
+    ext = path[-3:]
+
+    if "purelib" in path or "platlib" in path:
+        root = "/".join(path.split("/")[2:])
+    else:
+        root = path
+
+    modules = []
+    if root.endswith("/__init__.py"):
+        # Note the '/' here means that the __init__.py is not in the
+        # root of the wheel, therefore we can index the directory
+        # where this file is as an importable package.
+        modules.append(root[: -len("/__init__.py")].replace("/", "."))
+
+    # Always index the module file.
+    if ext == ".so":
+        # Also remove extra metadata that is embeded as part of
+        # the file name as an extra extension.
+        ext = "".join(_suffixes(root.rstrip("/").rsplit("/", 1)[-1]))
+    modules.append(root[: -len(ext)].replace("/", "."))
+    return modules
+
+
+# _suffixes is the same as pathlib.PurePath(name).suffixes for a file name.
+def _suffixes(name):
+    if name.endswith("."):
+        return []
+    return ["." + suffix for suffix in name.lstrip(".").split(".")[1:]]
+
+
+# compile_patterns compiles the exclusion patterns. They are combined into a
+# single regex when that is equivalent, so that each module is searched once.
+# That isn't the case if a pattern sets global inline flags, like "(?i)", or
+# refers to groups by number, which are renumbered when combined. Clashing
+# group names fail to compile, which also falls back to separate regexes.
+def compile_patterns(patterns):
+    compiled = [re.compile(pattern) for pattern in patterns]
+    if len(compiled) <= 1 or any(
+        pattern.flags != re.UNICODE or _GROUP_NUMBER_REFERENCE.search(pattern.pattern)
+        for pattern in compiled
+    ):
+        return compiled
+    try:
+        return [re.compile("|".join("(?:{})".format(pattern) for pattern in patterns))]
+    except re.error:
+        return compiled
+
+
+# Matches backreferences like "\1" and conditionals like "(?(1)...)".
+_GROUP_NUMBER_REFERENCE = re.compile(r"\\[1-9]|\(\?\(\d")
+
+
+def is_excluded(module, excluded_patterns):
+    return any(pattern.search(module) for pattern in excluded_patterns)
+
+
 def get_wheel_name(path):
     pp = pathlib.PurePath(path)
     if pp.suffix != ".whl":
@@ -160,8 +246,29 @@ if __name__ == "__main__":
     parser.add_argument("--include_stub_packages", action="store_true")
     parser.add_argument("--exclude_patterns", nargs="+", default=[])
     parser.add_argument("--wheels", nargs="+", default=[])
+    parser.add_argument(
+        "--mappings",
+        nargs="+",
+        default=[],
+        help="Partial mappings to merge, in order, after scanning the wheels.",
+    )
+    parser.add_argument(
+        "--partial",
+        action="store_true",
+        help="Write the mapping without simplifying it, for use with --mappings.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="The number of wheels to scan in parallel.",
+    )
     args = parser.parse_args()
     generator = Generator(
-        sys.stderr, args.output_file, args.exclude_patterns, args.include_stub_packages
+        sys.stderr,
+        args.output_file,
+        args.exclude_patterns,
+        args.include_stub_packages,
+        args.jobs,
     )
-    sys.exit(generator.run(args.wheels))
+    sys.exit(generator.run(args.wheels, args.mappings, args.partial))
@@ -0,0 +1,87 @@
+# Copyright 2025 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks the modules mapping generator on a large synthetic wheel set.
+
+The wheels mimic big SDKs with generated protobuf modules: many versioned
+packages per wheel, each with many _pb2 modules.
+
+Usage:
+    bazel run //modules_mapping:generator_benchmark -- --wheels=200 --modules=5000
+"""
+
+import argparse
+import pathlib
+import shutil
+import tempfile
+import time
+import zipfile
+
+from generator import Generator
+
+
+# make_wheels creates the synthetic wheels in root and returns their paths.
+def make_wheels(root, num_wheels, modules_per_wheel):
+    wheels = []
+    for i in range(num_wheels):
+        name = "sdk_part{}".format(i)
+        whl = root / "{}-1.0-py3-none-any.whl".format(name)
+        with zipfile.ZipFile(whl, "w", zipfile.ZIP_STORED) as zip_file:
+            zip_file.writestr("sdk/__init__.py", "")
+            zip_file.writestr("sdk/{}/__init__.py".format(name), "")
+            for j in range(modules_per_wheel):
+                package = "sdk/{}/v{}/service{}".format(name, j % 3, j % 50)
+                if j < 150:
+                    zip_file.writestr(package + "/__init__.py", "")
+                zip_file.writestr("{}/types{}_pb2.py".format(package, j), "")
+                if j % 10 == 0:
+                    zip_file.writestr("{}/_internal{}.py".format(package, j), "")
+            zip_file.writestr("{}-1.0.dist-info/METADATA".format(name), "")
+        wheels.append(whl)
+    return wheels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wheels", type=int, default=200)
+    parser.add_argument("--modules", type=int, default=5000)
+    parser.add_argument("--jobs", type=int, default=1)
+    args = parser.parse_args()
+
+    root = pathlib.Path(tempfile.mkdtemp())
+    try:
+        wheels = make_wheels(root, args.wheels, args.modules)
+        gen = Generator(
+            None, root / "modules_mapping.json", ["^_|(\\._)+"], False, args.jobs
+        )
+
+        start = time.perf_counter()
+        gen.dig_wheels(wheels)
+        scanned = time.perf_counter()
+        num_modules = len(gen.mapping)
+        gen.simplify()
+        simplified = time.perf_counter()
+    finally:
+        shutil.rmtree(root)
+
+    print(
+        "{} wheels, {} modules, {} after simplify: ".format(
+            args.wheels, num_modules, len(gen.mapping)
+        )
+        + "scan {:.3f}s, simplify {:.3f}s".format(scanned - start, simplified - scanned)
+    )
+
+
+if __name__ == "__main__":
+    main()
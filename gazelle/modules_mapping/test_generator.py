@@ -1,5 +1,8 @@
+import json
 import pathlib
+import tempfile
 import unittest
+import zipfile
 
 from generator import Generator
 
@@ -39,6 +42,93 @@ class GeneratorTest(unittest.TestCase):
             gen.mapping.items(),
         )
 
+    def test_simplify(self):
+        gen = Generator(None, None, {}, False)
+        gen.mapping = {
+            "foo.bar.baz": "foo",
+            "foo": "foo",
+            "foo.bar": "foo_bar",
+            "foo.bar.qux": "foo_bar",
+            "foo.other.quux": "foo",
+            "foo.other.corge": "corge",
+            "grault.garply": "grault",
+        }
+        gen.simplify()
+        self.assertEqual(
+            [
+                ("foo", "foo"),
+                ("foo.bar", "foo_bar"),
+                ("foo.bar.baz", "foo"),
+                ("foo.other.corge", "corge"),
+                ("grault.garply", "grault"),
+            ],
+            list(gen.mapping.items()),
+        )
+
+    def test_is_excluded(self):
+        gen = Generator(None, None, ["^_", "(\\._)+", "tests?$"], False)
+        self.assertTrue(gen.is_excluded("_foo"))
+        self.assertTrue(gen.is_excluded("foo._bar"))
+        self.assertTrue(gen.is_excluded("foo.tests"))
+        self.assertFalse(gen.is_excluded("foo.bar_"))
+        self.assertFalse(Generator(None, None, [], False).is_excluded("_foo"))
+
+    def test_is_excluded_with_patterns_that_cannot_be_combined(self):
+        gen = Generator(None, None, ["(?i)^test", "^_"], False)
+        self.assertTrue(gen.is_excluded("Tests.foo"))
+        self.assertTrue(gen.is_excluded("_foo"))
+        self.assertFalse(gen.is_excluded("foo._Bar"))
+
+        gen = Generator(None, None, ["(?P<x>a)b", "^_", "(?P<x>c)d"], False)
+        self.assertTrue(gen.is_excluded("foo.ab"))
+        self.assertTrue(gen.is_excluded("foo.cd"))
+
+        gen = Generator(None, None, ["^(_)", r"(\w)\1$"], False)
+        self.assertTrue(gen.is_excluded("foo.bb"))
+        self.assertFalse(gen.is_excluded("foo.b_"))
+
+    def test_parallel_and_merged_runs_match_serial_run(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmpdir = pathlib.Path(tmpdir)
+            wheels = []
+            for name, paths in [
+                ("foo", ["foo/__init__.py", "foo/bar.py", "foo/_baz.so"]),
+                ("foo_ext", ["foo/ext.cpython-311-x86_64-linux-gnu.so"]),
+                ("qux", ["qux.data/purelib/qux/__init__.py", "foo/bar.py"]),
+            ]:
+                whl = tmpdir / "{}-1.0-py3-none-any.whl".format(name)
+                with zipfile.ZipFile(whl, "w") as zip_file:
+                    for path in paths:
+                        zip_file.writestr(path, "")
+                wheels.append(whl)
+
+            mappings = []
+            for jobs in [1, 2]:
+                output_file = tmpdir / "modules_mapping_{}.json".format(jobs)
+                gen = Generator(None, output_file, ["^_|(\\._)+"], False, jobs)
+                self.assertEqual(0, gen.run(wheels))
+                mappings.append(json.loads(output_file.read_text()))
+
+            # Scanning each wheel on its own and merging the partial mappings
+            # gives the same result.
+            partial_mappings = []
+            for whl in wheels:
+                output_file = tmpdir / "{}.json".format(whl.name)
+                gen = Generator(None, output_file, ["^_|(\\._)+"], False)
+                self.assertEqual(0, gen.run([whl], partial=True))
+                partial_mappings.append(output_file)
+            output_file = tmpdir / "modules_mapping_merged.json"
+            gen = Generator(None, output_file, [], False)
+            self.assertEqual(0, gen.run([], partial_mappings))
+            mappings.append(json.loads(output_file.read_text()))
+
+        self.assertEqual(
+            {"foo": "foo", "foo.bar": "qux", "foo.ext": "foo_ext", "qux": "qux"},
+            mappings[0],
+        )
+        self.assertEqual(mappings[0], mappings[1])
+        self.assertEqual(mappings[0], mappings[2])
+
 
 if __name__ == "__main__":
     unittest.main()
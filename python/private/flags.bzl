@@ -118,6 +118,20 @@ VenvsUseDeclareSymlinkFlag = FlagEnum(
     get_value = _venvs_use_declare_symlink_flag_get_value,
 )
 
+def _zip_compression_flag_get_value(ctx):
+    return ctx.attr._zip_compression_flag[BuildSettingInfo].value
+
+# Determines how the files in the zip file of a binary are stored.
+# buildifier: disable=name-conventions
+ZipCompressionFlag = FlagEnum(
+    # Compress the files with deflate.
+    DEFLATED = "deflated",
+    # Store the files uncompressed. The zip is bigger, but faster to create,
+    # and its files are read without having to inflate them.
+    STORED = "stored",
+    get_value = _zip_compression_flag_get_value,
+)
+
 def _venvs_site_packages_is_enabled(ctx):
     if not ctx.attr.experimental_venvs_site_packages:
         return False
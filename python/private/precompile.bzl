@@ -70,24 +70,32 @@ def maybe_precompile(ctx, srcs):
         pyc_files = [],
         py_to_pyc_map = {},
     )
+    to_compile = []
     for src in srcs:
         if should_precompile:
-            # NOTE: _precompile() may return None
-            pyc = _precompile(ctx, src, use_pycache = keep_source)
+            # NOTE: _declare_pyc() may return None
+            pyc = _declare_pyc(ctx, src, use_pycache = keep_source)
         else:
             pyc = None
 
         if pyc:
+            to_compile.append((src, pyc))
             result.pyc_files.append(pyc)
             result.py_to_pyc_map[src] = pyc
 
         if keep_source or not pyc:
             result.keep_srcs.append(src)
 
+    batch_size = ctx.attr._precompile_batch_size_flag[BuildSettingInfo].value
+    if batch_size <= 0:
+        batch_size = max(len(to_compile), 1)
+    for i in range(0, len(to_compile), batch_size):
+        _precompile(ctx, to_compile[i:i + batch_size])
+
     return result
 
-def _precompile(ctx, src, *, use_pycache):
-    """Compile a py file to pyc.
+def _declare_pyc(ctx, src, *, use_pycache):
+    """Declares the pyc file a py file is compiled to.
 
     Args:
         ctx: rule context.
@@ -97,7 +105,8 @@ def _precompile(ctx, src, *, use_pycache):
             file.
 
     Returns:
-        File of the generated pyc file.
+        File of the pyc file to generate, or None if the file can't be
+        precompiled.
     """
 
     # Generating a file in another package is an error, so we have to skip
@@ -105,6 +114,36 @@ def _precompile(ctx, src, *, use_pycache):
     if ctx.label.package != src.owner.package:
         return None
 
+    target_toolchain = ctx.toolchains[TARGET_TOOLCHAIN_TYPE].py3_runtime
+
+    stem = src.basename[:-(len(src.extension) + 1)]
+    if use_pycache:
+        if not hasattr(target_toolchain, "pyc_tag") or not target_toolchain.pyc_tag:
+            # This is likely one of two situations:
+            # 1. The pyc_tag attribute is missing because it's the Bazel-builtin
+            #    PyRuntimeInfo object.
+            # 2. It's a "runtime toolchain", i.e. the autodetecting toolchain,
+            #    or some equivalent toolchain that can't assume to know the
+            #    runtime Python version at build time.
+            # Instead of failing, just don't generate any pyc.
+            return None
+        pyc_path = "__pycache__/{stem}.{tag}.pyc".format(
+            stem = stem,
+            tag = target_toolchain.pyc_tag,
+        )
+    else:
+        pyc_path = "{}.pyc".format(stem)
+
+    return ctx.actions.declare_file(pyc_path, sibling = src)
+
+def _precompile(ctx, srcs_and_pycs):
+    """Compile py files to pyc in a single action.
+
+    Args:
+        ctx: rule context.
+        srcs_and_pycs: list of (File, File) tuples; the py files to compile and
+            the pyc files (from `_declare_pyc`) to compile them to.
+    """
     exec_tools_info = ctx.toolchains[EXEC_TOOLS_TOOLCHAIN_TYPE].exec_tools
     target_toolchain = ctx.toolchains[TARGET_TOOLCHAIN_TYPE].py3_runtime
 
@@ -132,26 +171,6 @@ def _precompile(ctx, src, *, use_pycache):
             precompiler,
         ))
 
-    stem = src.basename[:-(len(src.extension) + 1)]
-    if use_pycache:
-        if not hasattr(target_toolchain, "pyc_tag") or not target_toolchain.pyc_tag:
-            # This is likely one of two situations:
-            # 1. The pyc_tag attribute is missing because it's the Bazel-builtin
-            #    PyRuntimeInfo object.
-            # 2. It's a "runtime toolchain", i.e. the autodetecting toolchain,
-            #    or some equivalent toolchain that can't assume to know the
-            #    runtime Python version at build time.
-            # Instead of failing, just don't generate any pyc.
-            return None
-        pyc_path = "__pycache__/{stem}.{tag}.pyc".format(
-            stem = stem,
-            tag = target_toolchain.pyc_tag,
-        )
-    else:
-        pyc_path = "{}.pyc".format(stem)
-
-    pyc = ctx.actions.declare_file(pyc_path, sibling = src)
-
     invalidation_mode = ctx.attr.precompile_invalidation_mode
     if invalidation_mode == PrecompileInvalidationModeAttr.AUTO:
         if ctx.var["COMPILATION_MODE"] == "opt":
@@ -174,27 +193,35 @@ def _precompile(ctx, src, *, use_pycache):
     precompile_request_args.set_param_file_format("multiline")
 
     precompile_request_args.add("--invalidation_mode", invalidation_mode)
-    precompile_request_args.add("--src", src)
-
-    # NOTE: src.short_path is used because src.path contains the platform and
-    # build-specific hash portions of the path, which we don't want in the
-    # pyc data. Note, however, for remote-remote files, short_path will
-    # have the repo name, which is likely to contain extraneous info.
-    precompile_request_args.add("--src_name", src.short_path)
-    precompile_request_args.add("--pyc", pyc)
+    for src, pyc in srcs_and_pycs:
+        precompile_request_args.add("--src", src)
+
+        # NOTE: src.short_path is used because src.path contains the platform and
+        # build-specific hash portions of the path, which we don't want in the
+        # pyc data. Note, however, for remote-remote files, short_path will
+        # have the repo name, which is likely to contain extraneous info.
+        precompile_request_args.add("--src_name", src.short_path)
+        precompile_request_args.add("--pyc", pyc)
     precompile_request_args.add("--optimize", ctx.attr.precompile_optimize_level)
 
     version_info = target_toolchain.interpreter_version_info
     python_version = "{}.{}".format(version_info.major, version_info.minor)
     precompile_request_args.add("--python_version", python_version)
 
+    if len(srcs_and_pycs) == 1:
+        progress_message = "Python precompiling %{input} into %{output}"
+    else:
+        progress_message = "Python precompiling {} files for %{{label}}".format(
+            len(srcs_and_pycs),
+        )
+
     ctx.actions.run(
         executable = precompiler_executable,
         arguments = [precompiler_startup_args, precompile_request_args],
-        inputs = [src],
-        outputs = [pyc],
+        inputs = [src for src, _ in srcs_and_pycs],
+        outputs = [pyc for _, pyc in srcs_and_pycs],
         mnemonic = "PyCompile",
-        progress_message = "Python precompiling %{input} into %{output}",
+        progress_message = progress_message,
         tools = tools,
         env = env | {
             "PYTHONHASHSEED": "0",  # Helps avoid non-deterministic behavior
@@ -204,4 +231,3 @@ def _precompile(ctx, src, *, use_pycache):
         execution_requirements = execution_requirements,
         toolchain = EXEC_TOOLS_TOOLCHAIN_TYPE,
     )
-    return pyc
@@ -50,7 +50,7 @@ load(
     "runfiles_root_path",
     "target_platform_has_any_constraint",
 )
-load(":flags.bzl", "BootstrapImplFlag", "VenvsUseDeclareSymlinkFlag")
+load(":flags.bzl", "BootstrapImplFlag", "VenvsUseDeclareSymlinkFlag", "ZipCompressionFlag")
 load(":precompile.bzl", "maybe_precompile")
 load(":py_cc_link_params_info.bzl", "PyCcLinkParamsInfo")
 load(":py_executable_info.bzl", "PyExecutableInfo")
@@ -69,6 +69,7 @@ load(
 _py_builtins = py_internal
 _EXTERNAL_PATH_PREFIX = "external"
 _ZIP_RUNFILES_DIRECTORY_NAME = "runfiles"
+_ZIP_COMPRESSION_INHERIT = "inherit"
 _PYTHON_VERSION_FLAG = str(Label("//python/config_settings:python_version"))
 
 # Non-Google-specific attributes for executables
@@ -181,6 +182,24 @@ configuration.
 This attribute was changed from only accepting `PY2` and `PY3` values to
 accepting arbitrary Python versions.
 :::
+""",
+        ),
+        "zip_compression": lambda: attrb.String(
+            default = _ZIP_COMPRESSION_INHERIT,
+            values = sorted([_ZIP_COMPRESSION_INHERIT] + ZipCompressionFlag.flag_values()),
+            doc = """
+Determines how the files in the zip file of the binary are stored. The zip is
+only created when {obj}`--build_python_zip` is enabled or the
+`python_zip_file` output group is requested.
+
+Valid values are:
+* `inherit`: Inherit the value from {flag}`--zip_compression`.
+* `deflated`: Compress the files.
+* `stored`: Store the files uncompressed. The zip is bigger, but it's faster
+  to build, and its files are extracted or imported without inflating them.
+
+:::{versionadded} VERSION_NEXT_FEATURE
+:::
 """,
         ),
         # Required to opt-in to the transition feature.
@@ -234,6 +253,10 @@ accepting arbitrary Python versions.
             cfg = "exec",
             executable = True,
         ),
+        "_zip_compression_flag": lambda: attrb.Label(
+            default = "//python/config_settings:zip_compression",
+            providers = [BuildSettingInfo],
+        ),
         "_zipper": lambda: attrb.Label(
             cfg = "exec",
             executable = True,
@@ -354,6 +377,7 @@ def _create_executable(
         extra_runfiles = ctx.runfiles([stage2_bootstrap] + venv.files_without_interpreter)
         zip_main = _create_zip_main(
             ctx,
+            main_py = main_py,
             stage2_bootstrap = stage2_bootstrap,
             runtime_details = runtime_details,
             venv = venv,
@@ -468,9 +492,13 @@ def _create_executable(
         extra_runfiles = extra_runfiles,
     )
 
-def _create_zip_main(ctx, *, stage2_bootstrap, runtime_details, venv):
+def _create_zip_main(ctx, *, main_py, stage2_bootstrap, runtime_details, venv):
     python_binary = runfiles_root_path(ctx, venv.interpreter.short_path)
     python_binary_actual = venv.interpreter_actual_path
+    if main_py:
+        main_py_path = "{}/{}".format(ctx.workspace_name, main_py.short_path)
+    else:
+        main_py_path = ""
 
     # The location of this file doesn't really matter. It's added to
     # the zip file as the top-level __main__.py file and not included
@@ -480,6 +508,7 @@ def _create_zip_main(ctx, *, stage2_bootstrap, runtime_details, venv):
         template = runtime_details.effective_runtime.zip_main_template,
         output = output,
         substitutions = {
+            "%main%": main_py_path,
             "%python_binary%": python_binary,
             "%python_binary_actual%": python_binary_actual,
             "%stage2_bootstrap%": "{}/{}".format(
@@ -898,8 +927,12 @@ def _create_zip_file(ctx, *, output, original_nonzip_executable, zip_main, runfi
         if artifact != original_nonzip_executable and artifact != output:
             inputs.append(artifact)
 
+    compression = ctx.attr.zip_compression
+    if compression == _ZIP_COMPRESSION_INHERIT:
+        compression = ZipCompressionFlag.get_value(ctx)
+
     zip_cli_args = ctx.actions.args()
-    zip_cli_args.add("cC")
+    zip_cli_args.add("cC" if compression == ZipCompressionFlag.DEFLATED else "c")
     zip_cli_args.add(output)
 
     ctx.actions.run(
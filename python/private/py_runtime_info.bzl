@@ -326,6 +326,8 @@ skip calling `__main__.py`.
 
 The following substitutions are made during template expansion:
 * `%stage2_bootstrap%`: A runfiles-relative string to the stage 2 bootstrap file.
+* `%main%`: A runfiles-relative string to the main file of the program, or
+  empty if the program runs a main module.
 * `%python_binary%`: The path to the target Python interpreter. There are three
   types of paths:
   * An absolute path to a system interpreter (e.g. begins with `/`).
@@ -335,6 +337,10 @@ The following substitutions are made during template expansion:
 
 :::{versionadded} 0.33.0
 :::
+
+:::{versionchanged} VERSION_NEXT_FEATURE
+The `%main%` substitution was added.
+:::
 """,
     },
 )
@@ -39,6 +39,25 @@ _distribution_attrs = {
         default = True,
         doc = "Enable compression of the final archive.",
     ),
+    "compression_level": attr.int(
+        default = -1,
+        doc = """\
+Deflate compression level, from 0 (no compression) to 9 (best compression).
+
+The default of -1 uses the zlib default level.
+""",
+    ),
+    "compression_threads": attr.int(
+        default = 1,
+        doc = """\
+Number of threads used to compress and hash the files added to the wheel.
+
+Values greater than 1 speed up building wheels with many or large files. The
+wheel is byte-identical regardless of the number of threads. The action
+reserves a matching number of CPUs from Bazel's local resources, rounded up to
+2, 4, 8 or at most 16.
+""",
+    ),
     "distribution": attr.string(
         mandatory = True,
         doc = """\
@@ -54,6 +73,10 @@ Workspace status keys are expanded using `{NAME}` format, for example:
 For the available keys, see https://bazel.build/docs/user-manual#workspace-status
 """,
     ),
+    "min_compression_size": attr.int(
+        default = 0,
+        doc = "Files smaller than this many bytes are stored without compression.",
+    ),
     "platform": attr.string(
         default = "any",
         doc = """\
@@ -78,6 +101,16 @@ platform = select({
         default = "py3",
         doc = "Supported Python version(s), eg `py3`, `cp35.cp36`, etc",
     ),
+    "stored_file_patterns": attr.string_list(
+        default = [],
+        doc = """\
+Glob patterns for files that are stored in the wheel without compression.
+
+Patterns are matched against the path of the file in the wheel, and `*` also
+matches `/`, e.g. `["*.so", "*.png"]`. Use this for payloads that are already
+compressed, where deflating them again costs build time for little size gain.
+""",
+    ),
     "stamp": attr.int(
         doc = """\
 Whether to encode build information into the wheel. Possible values:
@@ -204,6 +237,18 @@ _other_attrs = {
         doc = "A string specifying the license of the package.",
         default = "",
     ),
+    "previous_wheel": attr.label(
+        allow_single_file = [".whl"],
+        doc = """\
+A previously built version of this wheel, e.g. a copy of the last build output.
+
+Files whose contents match the previous wheel's `RECORD` are copied into the new
+wheel without being compressed again, which speeds up rebuilding large wheels
+when few files changed. Compressed files are only reused if the previous wheel
+was built with the same `compression_level`, so the output is the same as that
+of a clean build.
+""",
+    ),
     "project_urls": attr.string_dict(
         doc = ("A string dict specifying additional browsable URLs for the project and corresponding labels, " +
                "where label is the key and url is the value. " +
@@ -478,6 +523,16 @@ def _py_wheel_impl(ctx):
 
     if not ctx.attr.compress:
         args.add("--no_compress")
+    if ctx.attr.compression_level >= 0:
+        args.add("--compression_level", ctx.attr.compression_level)
+    args.add_all(ctx.attr.stored_file_patterns, format_each = "--stored_file_pattern=%s")
+    if ctx.attr.min_compression_size > 0:
+        args.add("--min_compression_size", ctx.attr.min_compression_size)
+    if ctx.file.previous_wheel:
+        args.add("--previous_wheel", ctx.file.previous_wheel)
+        other_inputs.append(ctx.file.previous_wheel)
+    if ctx.attr.compression_threads > 1:
+        args.add("--compression_threads", ctx.attr.compression_threads)
 
     for target, filename in ctx.attr.extra_distinfo_files.items():
         target_files = target.files.to_list()
@@ -520,6 +575,7 @@ def _py_wheel_impl(ctx):
         outputs = [outfile, name_file],
         arguments = [args],
         executable = ctx.executable._wheelmaker,
+        resource_set = _compression_resource_set(ctx.attr.compression_threads),
         # The default shell env is used to better support toolchains that look
         # up python at runtime using PATH.
         use_default_shell_env = True,
@@ -536,6 +592,32 @@ def _py_wheel_impl(ctx):
         ),
     ]
 
+# A resource_set must be a top-level function, so the CPUs reserved for
+# threaded compression are rounded up to one of these.
+def _resource_set_cpu_2(_os, _inputs_size):
+    return {"cpu": 2}
+
+def _resource_set_cpu_4(_os, _inputs_size):
+    return {"cpu": 4}
+
+def _resource_set_cpu_8(_os, _inputs_size):
+    return {"cpu": 8}
+
+def _resource_set_cpu_16(_os, _inputs_size):
+    return {"cpu": 16}
+
+def _compression_resource_set(threads):
+    if threads <= 1:
+        return None
+    elif threads <= 2:
+        return _resource_set_cpu_2
+    elif threads <= 4:
+        return _resource_set_cpu_4
+    elif threads <= 8:
+        return _resource_set_cpu_8
+    else:
+        return _resource_set_cpu_16
+
 def _concat_dicts(*dicts):
     result = {}
     for d in dicts:
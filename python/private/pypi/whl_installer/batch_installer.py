@@ -0,0 +1,217 @@
+# Copyright 2025 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Extract many wheels in one long-lived interpreter.
+
+This avoids paying for an interpreter start and the `installer`, `packaging`
+and `pip` imports for every wheel. Requests are read from stdin as one JSON
+object per line, in the same shape as Bazel's JSON persistent worker protocol:
+
+    {"requestId": 1, "arguments": [...], "sandboxDir": "/path/to/repo"}
+
+`arguments` are the `wheel_installer` arguments, and must include `--whl-file`;
+building wheels with pip is not supported. Relative paths are resolved against
+the working directory of this process. The wheel is extracted into
+`sandboxDir`, or into the working directory if it is not set.
+
+Requests are processed concurrently in a pool of subprocesses, so that they
+don't share process state such as the umask or stderr. One response is written
+per request, as soon as it is done, so responses can arrive out of order:
+
+    {"requestId": 1, "exitCode": 0, "output": ""}
+
+If a subprocess dies, e.g. because it was killed, the pool is replaced and the
+requests that were in flight are retried once.
+
+The process exits once stdin is closed and all requests are done.
+"""
+
+import argparse
+import concurrent.futures
+import concurrent.futures.process
+import contextlib
+import functools
+import io
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import traceback
+from pathlib import Path
+from typing import Any, Dict, TextIO
+
+from python.private.pypi.whl_installer import arguments, wheel_installer
+
+
+def _process_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Extracts the wheel for a single request and returns the response."""
+    output = io.StringIO()
+    exit_code = 0
+    try:
+        with contextlib.redirect_stderr(output):
+            # argparse reports errors by exiting.
+            args = arguments.parser().parse_args(request.get("arguments", []))
+        if not args.whl_file:
+            raise ValueError("only --whl-file requests are supported")
+
+        wheel_installer.extract_wheel_file(
+            args, installation_dir=Path(request.get("sandboxDir") or ".")
+        )
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) and e.code else 2
+    except Exception:
+        exit_code = 1
+        output.write(traceback.format_exc())
+
+    return {
+        "requestId": request.get("requestId", 0),
+        "exitCode": exit_code,
+        "output": output.getvalue(),
+    }
+
+
+class BatchInstaller:
+    """Reads requests from a stream and extracts the wheels in a process pool."""
+
+    def __init__(self, instream: TextIO, outstream: TextIO, jobs: int):
+        self._instream = instream
+        self._outstream = outstream
+        self._jobs = jobs
+        self._output_lock = threading.Lock()
+        # Guards the executor, which is replaced when it breaks, and the
+        # number of requests that haven't been answered yet.
+        self._lock = threading.Condition()
+        self._executor = None
+        self._pending = 0
+
+    def run(self) -> None:
+        self._executor = self._create_executor()
+        try:
+            for line in self._instream:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    self._send_response(
+                        {
+                            "requestId": 0,
+                            "exitCode": 2,
+                            "output": "Invalid request: {!r}\n".format(line),
+                        }
+                    )
+                    continue
+                with self._lock:
+                    self._pending += 1
+                self._submit(request, retries=1)
+            # Retried requests are submitted from the done callbacks, so wait
+            # for all responses before shutting the executor down.
+            with self._lock:
+                self._lock.wait_for(lambda: not self._pending)
+        finally:
+            self._executor.shutdown()
+
+    def _create_executor(self) -> concurrent.futures.Executor:
+        return concurrent.futures.ProcessPoolExecutor(
+            self._jobs, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _submit(self, request: Dict[str, Any], retries: int) -> None:
+        with self._lock:
+            executor = self._executor
+        try:
+            try:
+                future = executor.submit(_process_request, request)
+            except concurrent.futures.process.BrokenProcessPool:
+                executor = self._replace_executor(executor)
+                future = executor.submit(_process_request, request)
+        except Exception:
+            self._finish(self._error_response(request))
+            return
+        future.add_done_callback(
+            functools.partial(self._on_done, request, retries, executor)
+        )
+
+    def _replace_executor(
+        self, broken: concurrent.futures.Executor
+    ) -> concurrent.futures.Executor:
+        """Replaces the executor if it is still the broken one, and returns it."""
+        with self._lock:
+            if self._executor is broken:
+                self._executor = self._create_executor()
+                broken.shutdown(wait=False)
+            return self._executor
+
+    def _on_done(
+        self,
+        request: Dict[str, Any],
+        retries: int,
+        executor: concurrent.futures.Executor,
+        future: concurrent.futures.Future,
+    ) -> None:
+        try:
+            response = future.result()
+        except concurrent.futures.process.BrokenProcessPool:
+            if not retries:
+                response = self._error_response(request)
+            else:
+                # A subprocess died, e.g. it was killed or ran out of memory.
+                # That fails every request in flight in the pool, most of
+                # which had nothing to do with it, so retry them in a new one.
+                self._replace_executor(executor)
+                self._submit(request, retries - 1)
+                return
+        except Exception:
+            response = self._error_response(request)
+        self._finish(response)
+
+    @staticmethod
+    def _error_response(request: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "requestId": request.get("requestId", 0),
+            "exitCode": 3,
+            "output": traceback.format_exc(),
+        }
+
+    def _finish(self, response: Dict[str, Any]) -> None:
+        self._send_response(response)
+        with self._lock:
+            self._pending -= 1
+            self._lock.notify_all()
+
+    def _send_response(self, response: Dict[str, Any]) -> None:
+        with self._output_lock:
+            self._outstream.write(json.dumps(response) + "\n")
+            self._outstream.flush()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of wheels to extract concurrently.",
+    )
+    args = parser.parse_args()
+
+    # Wheels are only extracted, never built, but keep the environment the
+    # same as for wheel_installer.
+    wheel_installer.configure_reproducible_wheels()
+    BatchInstaller(sys.stdin, sys.stdout, args.jobs).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -34,41 +34,57 @@ def implicit_namespace_packages(
     Returns:
         The set of directories found under root to be packages using the native namespace method.
     """
-    namespace_pkg_dirs: Set[Path] = set()
-    standard_pkg_dirs: Set[Path] = set()
-    directory_path = Path(directory)
-    ignored_dirname_paths: List[Path] = [Path(p) for p in ignored_dirnames or ()]
-    # Traverse bottom-up because a directory can be a namespace pkg because its child contains module files.
-    for dirpath, dirnames, filenames in map(
-        lambda t: (Path(t[0]), *t[1:]), os.walk(directory_path, topdown=False)
-    ):
-        if "__init__.py" in filenames:
-            standard_pkg_dirs.add(dirpath)
-            continue
-        elif ignored_dirname_paths:
-            is_ignored_dir = dirpath in ignored_dirname_paths
-            child_of_ignored_dir = any(
-                d in dirpath.parents for d in ignored_dirname_paths
-            )
-            if is_ignored_dir or child_of_ignored_dir:
-                continue
-
-        dir_includes_py_modules = _includes_python_modules(filenames)
-        parent_of_namespace_pkg = any(
-            Path(dirpath, d) in namespace_pkg_dirs for d in dirnames
-        )
-        parent_of_standard_pkg = any(
-            Path(dirpath, d) in standard_pkg_dirs for d in dirnames
-        )
-        parent_of_pkg = parent_of_namespace_pkg or parent_of_standard_pkg
-        if (
-            (dir_includes_py_modules or parent_of_pkg)
-            and
+    directory = os.fspath(directory)
+    namespace_pkg_dirs: List[str] = []
+    ignored_dirs: Set[str] = {os.path.normpath(p) for p in ignored_dirnames or ()}
+
+    # A single os.scandir pass per directory; whether a directory is a package is
+    # propagated up to its parent through the return value.
+    def scan(dirpath: str) -> bool:
+        """Returns whether dirpath is a standard or namespace package."""
+        try:
+            with os.scandir(dirpath) as it:
+                entries = list(it)
+        except OSError:
+            return False
+
+        filenames = []
+        subdirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                filenames.append(entry.name)
+            elif not entry.is_symlink():
+                # Like os.walk, don't descend into symlinked directories.
+                subdirs.append(entry.path)
+
+        is_standard_pkg = "__init__.py" in filenames
+        if ignored_dirs and os.path.normpath(dirpath) in ignored_dirs:
+            # Nothing below an ignored directory can be a namespace package.
+            return is_standard_pkg
+
+        # Traverse bottom-up because a directory can be a namespace pkg because its
+        # child contains module files. Children of standard packages are scanned
+        # too, since they can be namespace packages themselves.
+        parent_of_pkg = False
+        for subdir in subdirs:
+            if scan(subdir):
+                parent_of_pkg = True
+
+        if is_standard_pkg:
+            return True
+        if parent_of_pkg or _includes_python_modules(filenames):
             # The root of the directory should never be an implicit namespace
-            dirpath != directory_path
-        ):
-            namespace_pkg_dirs.add(dirpath)
-    return namespace_pkg_dirs
+            if dirpath != directory:
+                namespace_pkg_dirs.append(dirpath)
+            return True
+        return False
+
+    scan(directory)
+    return {Path(p) for p in namespace_pkg_dirs}
 
 
 def add_pkgutil_style_namespace_pkg_init(dir_path: Path) -> None:
@@ -118,4 +134,4 @@ def _includes_python_modules(files: List[str]) -> bool:
         ".so",  # Unix extension modules
         ".pyd",  # https://docs.python.org/3/faq/windows.html#is-a-pyd-file-the-same-as-a-dll
     }
-    return any(Path(f).suffix in module_suffixes for f in files)
+    return any(os.path.splitext(f)[1] in module_suffixes for f in files)
@@ -14,8 +14,18 @@
 
 """Utility class to inspect an extracted wheel directory"""
 
+import base64
+import contextlib
+import csv
 import email
+import hashlib
+import io
+import os
+import posixpath
 import re
+import stat
+import warnings
+import zipfile
 from collections import defaultdict
 from dataclasses import dataclass
 from pathlib import Path
@@ -83,6 +93,10 @@ class Deps:
             key=lambda x: f"{x.name}:{sorted(x.extras)}",
         )
 
+        # Marker evaluation results are memoized, so set up the caches first.
+        self._env_markers: Dict[Tuple[Platform, str], Dict[str, str]] = {}
+        self._marker_results: Dict[Tuple[str, Optional[Platform], str], bool] = {}
+
         want_extras = self._resolve_extras(reqs, extras)
 
         # Then add all of the requirements in order
@@ -167,6 +181,40 @@ class Deps:
             if not self._select[p]:
                 self._select.pop(p)
 
+    def _evaluate(
+        self,
+        req: Requirement,
+        marker_str: str,
+        platform: Optional[Platform],
+        extra: str,
+    ) -> bool:
+        """Evaluates the marker of req for the platform and extra.
+
+        Results are memoized by the marker string, since the same markers are
+        repeated across many requirements and are evaluated for every platform
+        and extra.
+
+        Args:
+            req: The requirement, which must have a marker.
+            marker_str: `str(req.marker)`, which is expensive to compute.
+            platform: The platform to evaluate the marker for, or None to only
+                set the extra.
+            extra: The extra to evaluate the marker for.
+        """
+        key = (marker_str, platform, extra)
+        result = self._marker_results.get(key)
+        if result is None:
+            if platform is None:
+                env = {"extra": extra}
+            else:
+                env = self._env_markers.get((platform, extra))
+                if env is None:
+                    env = platform.env_markers(extra)
+                    self._env_markers[(platform, extra)] = env
+            result = req.marker.evaluate(env)
+            self._marker_results[key] = result
+        return result
+
     @staticmethod
     def _normalize(name: str) -> str:
         return re.sub(r"[-_.]+", "_", name).lower()
@@ -196,6 +244,7 @@ class Deps:
         # is equivalent to having {"foo"}.
         extras = extras or {""}
 
+        # (requirement, marker string) pairs
         self_reqs = []
         for req in reqs:
             if Deps._normalize(req.name) != self.name:
@@ -210,19 +259,21 @@ class Deps:
                 extras = extras | req.extras
             else:
                 # process these in a separate loop
-                self_reqs.append(req)
+                self_reqs.append((req, str(req.marker)))
 
         # A double loop is not strictly optimal, but always correct without recursion
-        for req in self_reqs:
-            if any(req.marker.evaluate({"extra": extra}) for extra in extras):
+        for req, marker_str in self_reqs:
+            if any(self._evaluate(req, marker_str, None, extra) for extra in extras):
                 extras = extras | req.extras
             else:
                 continue
 
             # Iterate through all packages to ensure that we include all of the extras from previously
             # visited packages.
-            for req_ in self_reqs:
-                if any(req_.marker.evaluate({"extra": extra}) for extra in extras):
+            for req_, marker_str_ in self_reqs:
+                if any(
+                    self._evaluate(req_, marker_str_, None, extra) for extra in extras
+                ):
                     extras = extras | req_.extras
 
         return extras
@@ -235,7 +286,7 @@ class Deps:
         marker_str = str(req.marker)
 
         if not self._platforms:
-            if any(req.marker.evaluate({"extra": extra}) for extra in extras):
+            if any(self._evaluate(req, marker_str, None, extra) for extra in extras):
                 self._add(req.name, None)
             return
 
@@ -256,13 +307,13 @@ class Deps:
         match_version = "version" in marker_str
 
         if not (match_os or match_arch or match_version):
-            if any(req.marker.evaluate({"extra": extra}) for extra in extras):
+            if any(self._evaluate(req, marker_str, None, extra) for extra in extras):
                 self._add(req.name, None)
             return
 
         for plat in self._platforms:
             if not any(
-                req.marker.evaluate(plat.env_markers(extra)) for extra in extras
+                self._evaluate(req, marker_str, plat, extra) for extra in extras
             ):
                 continue
 
@@ -296,10 +347,46 @@ class Deps:
 
 
 class Wheel:
-    """Representation of the compressed .whl file"""
+    """Representation of the compressed .whl file
+
+    METADATA and entry_points.txt are parsed at most once. Use the wheel as a
+    context manager to also share a single open zip file between reads and
+    `unzip`.
+    """
 
     def __init__(self, path: Path):
         self._path = path
+        # Set while used as a context manager so that all reads share one
+        # open zip file.
+        self._zip_file = None
+        self._source = None
+        self._exit_stack = None
+        self._metadata = None
+        self._entry_points = None
+
+    def __enter__(self) -> "Wheel":
+        self._exit_stack = contextlib.ExitStack()
+        self._zip_file = self._exit_stack.enter_context(zipfile.ZipFile(self.path))
+        self._source = installer.sources.WheelFile(self._zip_file)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._exit_stack.close()
+        self._exit_stack = None
+        self._zip_file = None
+        self._source = None
+
+    @contextlib.contextmanager
+    def _open(self):
+        """Yields the open zip file and its wheel source.
+
+        Reuses the ones opened by `with Wheel(...)`, if any.
+        """
+        if self._source is not None:
+            yield self._zip_file, self._source
+            return
+        with zipfile.ZipFile(self.path) as zip_file:
+            yield zip_file, installer.sources.WheelFile(zip_file)
 
     @property
     def path(self) -> Path:
@@ -313,10 +400,11 @@ class Wheel:
 
     @property
     def metadata(self) -> email.message.Message:
-        with installer.sources.WheelFile.open(self.path) as wheel_source:
-            metadata_contents = wheel_source.read_dist_info("METADATA")
-            metadata = installer.utils.parse_metadata_file(metadata_contents)
-        return metadata
+        if self._metadata is None:
+            with self._open() as (_, wheel_source):
+                metadata_contents = wheel_source.read_dist_info("METADATA")
+            self._metadata = installer.utils.parse_metadata_file(metadata_contents)
+        return self._metadata
 
     @property
     def version(self) -> str:
@@ -331,18 +419,24 @@ class Wheel:
         Returns:
             Dict[str, Tuple[str, str]]: A mapping of the entry point's name to it's module and attribute
         """
-        with installer.sources.WheelFile.open(self.path) as wheel_source:
-            if "entry_points.txt" not in wheel_source.dist_info_filenames:
-                return dict()
+        if self._entry_points is not None:
+            return dict(self._entry_points)
+
+        with self._open() as (_, wheel_source):
+            if "entry_points.txt" in wheel_source.dist_info_filenames:
+                entry_points_contents = wheel_source.read_dist_info("entry_points.txt")
+            else:
+                entry_points_contents = None
 
-            entry_points_mapping = dict()
-            entry_points_contents = wheel_source.read_dist_info("entry_points.txt")
+        entry_points_mapping = dict()
+        if entry_points_contents is not None:
             entry_points = installer.utils.parse_entrypoints(entry_points_contents)
             for script, module, attribute, script_section in entry_points:
                 if script_section == "console":
                     entry_points_mapping[script] = (module, attribute)
 
-            return entry_points_mapping
+        self._entry_points = entry_points_mapping
+        return dict(entry_points_mapping)
 
     def dependencies(
         self,
@@ -373,11 +467,174 @@ class Wheel:
             bytecode_optimization_levels=[],
         )
 
-        with installer.sources.WheelFile.open(self.path) as wheel_source:
-            installer.install(
-                source=wheel_source,
-                destination=destination,
-                additional_metadata={
-                    "INSTALLER": b"https://github.com/bazel-contrib/rules_python",
-                },
+        additional_metadata = {
+            "INSTALLER": b"https://github.com/bazel-contrib/rules_python",
+        }
+
+        with self._open() as (zip_file, wheel_source):
+            installed = _install_root_files(
+                zip_file,
+                wheel_source,
+                destination,
+                site_packages=os.path.join(directory, "site-packages"),
+                additional_metadata=additional_metadata,
+            )
+            if not installed:
+                installer.install(
+                    source=wheel_source,
+                    destination=destination,
+                    additional_metadata=additional_metadata,
+                )
+
+
+def _install_root_files(
+    zip_file: zipfile.ZipFile,
+    source: "installer.sources.WheelFile",
+    destination: "installer.destinations.SchemeDictionaryDestination",
+    site_packages: str,
+    additional_metadata: Dict[str, bytes],
+) -> bool:
+    """Installs a wheel whose files all go to site-packages, bypassing `installer.install`.
+
+    This produces the same files as `installer.install`, but streams the zip
+    members straight to disk instead of going through the destination for
+    every file, and checks the hashes and sizes listed in the wheel's RECORD
+    while copying. Entry point scripts, the installer metadata and the final
+    RECORD file are still written by the destination.
+
+    Args:
+        zip_file: The open wheel.
+        source: The wheel source for zip_file.
+        destination: The destination `installer.install` would use.
+        site_packages: The directory the purelib and platlib schemes map to.
+        additional_metadata: Extra files to add to the .dist-info directory.
+
+    Returns:
+        False, without writing anything, if the wheel has to be installed with
+        `installer.install` instead, e.g. because it has a .data directory.
+
+    Raises:
+        ValueError: If a file does not match its RECORD entry. Files without
+            one are installed with a RuntimeWarning.
+    """
+    wheel_metadata = installer.utils.parse_metadata_file(source.read_dist_info("WHEEL"))
+    if not (wheel_metadata["Wheel-Version"] or "").startswith("1."):
+        # Let installer report the incompatible version.
+        return False
+    root_scheme = (
+        "purelib" if wheel_metadata["Root-Is-Purelib"] == "true" else "platlib"
+    )
+
+    record_file_path = posixpath.join(source.dist_info_dir, "RECORD")
+    data_dir_prefix = source.data_dir + "/"
+    members = []
+    for zinfo in zip_file.infolist():
+        path = zinfo.filename
+        if path.endswith("/") or path == record_file_path:
+            continue
+        parts = path.split("/")
+        if (
+            path.startswith(data_dir_prefix)
+            # installer skips these with a warning.
+            or "__pycache__" in parts[:-1]
+            # installer rejects paths outside of the target directory.
+            or path.startswith("/")
+            or ".." in parts
+            or "\\" in path
+        ):
+            return False
+        members.append(zinfo)
+
+    expected = {}
+    for row in csv.reader(io.StringIO(source.read_dist_info("RECORD"))):
+        if len(row) == 3:
+            expected[row[0]] = (row[1], row[2])
+
+    records = []
+    if "entry_points.txt" in source.dist_info_filenames:
+        entry_points = installer.utils.parse_entrypoints(
+            source.read_dist_info("entry_points.txt")
+        )
+        for name, module, attr, section in entry_points:
+            record = destination.write_script(
+                name=name, module=module, attr=attr, section=section
+            )
+            records.append(("scripts", record))
+
+    # Same mode as installer.utils.make_file_executable
+    umask = os.umask(0)
+    os.umask(umask)
+    executable_mode = 0o777 & ~umask | 0o111
+
+    created_dirs = set()
+    for zinfo in members:
+        path = zinfo.filename
+        target = os.path.join(site_packages, *path.split("/"))
+        parent = os.path.dirname(target)
+        if parent not in created_dirs:
+            os.makedirs(parent, exist_ok=True)
+            created_dirs.add(parent)
+
+        hash = hashlib.sha256()
+        size = 0
+        with zip_file.open(zinfo) as src, open(target, "xb") as dst:
+            while True:
+                block = src.read(2**20)
+                if not block:
+                    break
+                hash.update(block)
+                dst.write(block)
+                size += len(block)
+        digest = base64.urlsafe_b64encode(hash.digest()).decode("ascii").rstrip("=")
+
+        mode = zinfo.external_attr >> 16
+        if mode and stat.S_ISREG(mode) and mode & 0o111:
+            os.chmod(target, executable_mode)
+
+        if path not in expected:
+            # installer.install doesn't check these either, so install them
+            # the same way, but don't let them go unnoticed.
+            warnings.warn(
+                "{} in {} is not mentioned in RECORD".format(path, zip_file.filename),
+                RuntimeWarning,
+                stacklevel=2,
+            )
+        expected_hash, expected_size = expected.get(path, ("", ""))
+        if (expected_size and expected_size != str(size)) or (
+            expected_hash.startswith("sha256=")
+            and expected_hash[len("sha256=") :] != digest
+        ):
+            raise ValueError(
+                "{} in {} does not match its RECORD entry".format(
+                    path, zip_file.filename
+                )
+            )
+
+        records.append(
+            (
+                root_scheme,
+                installer.records.RecordEntry(
+                    path, installer.records.Hash("sha256", digest), size
+                ),
+            )
+        )
+
+    for filename, contents in additional_metadata.items():
+        with io.BytesIO(contents) as stream:
+            record = destination.write_file(
+                scheme=root_scheme,
+                path=posixpath.join(source.dist_info_dir, filename),
+                stream=stream,
+                is_executable=False,
             )
+        records.append((root_scheme, record))
+
+    records.append(
+        (root_scheme, installer.records.RecordEntry(record_file_path, None, None))
+    )
+    destination.finalize_installation(
+        scheme=root_scheme,
+        record_file_path=record_file_path,
+        records=records,
+    )
+    return True
@@ -14,6 +14,7 @@
 
 """Build and/or fetch a single wheel based on the requirement passed in"""
 
+import argparse
 import errno
 import glob
 import json
@@ -30,7 +31,7 @@ from pip._vendor.packaging.utils import canonicalize_name
 from python.private.pypi.whl_installer import arguments, namespace_pkgs, wheel
 
 
-def _configure_reproducible_wheels() -> None:
+def configure_reproducible_wheels() -> None:
     """Modifies the environment to make wheel building reproducible.
     Wheels created from sdists are not reproducible by default. We can however workaround this by
     patching in some configuration with environment variables.
@@ -117,32 +118,52 @@ def _extract_wheel(
         enable_implicit_namespace_pkgs: if true, disables conversion of implicit namespace packages and will unzip as-is
     """
 
-    whl = wheel.Wheel(wheel_file)
-    whl.unzip(installation_dir)
+    with wheel.Wheel(wheel_file) as whl:
+        whl.unzip(installation_dir)
 
-    if not enable_implicit_namespace_pkgs:
-        _setup_namespace_pkg_compatibility(installation_dir)
+        if not enable_implicit_namespace_pkgs:
+            _setup_namespace_pkg_compatibility(installation_dir)
 
-    extras_requested = extras[whl.name] if whl.name in extras else set()
+        extras_requested = extras[whl.name] if whl.name in extras else set()
 
-    dependencies = whl.dependencies(extras_requested, platforms)
+        dependencies = whl.dependencies(extras_requested, platforms)
 
-    with open(os.path.join(installation_dir, "metadata.json"), "w") as f:
-        metadata = {
-            "name": whl.name,
-            "version": whl.version,
-            "deps": dependencies.deps,
-            "deps_by_platform": dependencies.deps_select,
-            "entry_points": [
-                {
-                    "name": name,
-                    "module": module,
-                    "attribute": attribute,
-                }
-                for name, (module, attribute) in sorted(whl.entry_points().items())
-            ],
-        }
-        json.dump(metadata, f)
+        with open(os.path.join(installation_dir, "metadata.json"), "w") as f:
+            metadata = {
+                "name": whl.name,
+                "version": whl.version,
+                "deps": dependencies.deps,
+                "deps_by_platform": dependencies.deps_select,
+                "entry_points": [
+                    {
+                        "name": name,
+                        "module": module,
+                        "attribute": attribute,
+                    }
+                    for name, (module, attribute) in sorted(whl.entry_points().items())
+                ],
+            }
+            json.dump(metadata, f)
+
+
+def extract_wheel_file(
+    args: argparse.Namespace, installation_dir: Path = Path(".")
+) -> None:
+    """Extracts the `--whl-file` wheel of the parsed arguments.
+
+    Args:
+        args: the parsed `arguments.parser()` arguments.
+        installation_dir: the destination directory for installation of the wheel.
+    """
+    name, extras_for_pkg = _parse_requirement_for_extra(args.requirement)
+    extras = {name: extras_for_pkg} if extras_for_pkg and name else dict()
+    _extract_wheel(
+        wheel_file=Path(args.whl_file),
+        extras=extras,
+        enable_implicit_namespace_pkgs=args.enable_implicit_namespace_pkgs,
+        platforms=arguments.get_platforms(args),
+        installation_dir=installation_dir,
+    )
 
 
 def main() -> None:
@@ -150,19 +171,10 @@ def main() -> None:
     deserialized_args = dict(vars(args))
     arguments.deserialize_structured_args(deserialized_args)
 
-    _configure_reproducible_wheels()
+    configure_reproducible_wheels()
 
     if args.whl_file:
-        whl = Path(args.whl_file)
-
-        name, extras_for_pkg = _parse_requirement_for_extra(args.requirement)
-        extras = {name: extras_for_pkg} if extras_for_pkg and name else dict()
-        _extract_wheel(
-            wheel_file=whl,
-            extras=extras,
-            enable_implicit_namespace_pkgs=args.enable_implicit_namespace_pkgs,
-            platforms=arguments.get_platforms(args),
-        )
+        extract_wheel_file(args)
         return
 
     pip_args = (
@@ -15,6 +15,10 @@
 import os
 import os.path
 import sys
+import time
+
+# Microseconds since the epoch, as used by the stages of the bootstrap.
+_START = time.time_ns() // 1000
 
 # Colon-delimited string of runfiles-relative import paths to add
 _IMPORTS_STR = "%imports%"
@@ -27,6 +31,12 @@ _SELF_RUNFILES_RELATIVE_PATH = "%site_init_runfiles_path%"
 # Runfiles-relative path to the coverage tool entry point, if any.
 _COVERAGE_TOOL = "%coverage_tool%"
 
+_PROFILE = bool(os.environ.get("RULES_PYTHON_BOOTSTRAP_PROFILE"))
+# Events for the RULES_PYTHON_BOOTSTRAP_PROFILE trace, as tuples of name,
+# category, and start and end times in microseconds. The stage 2 bootstrap
+# writes them to the trace.
+PROFILE_EVENTS = []
+
 
 def _is_verbose():
     return bool(os.environ.get("RULES_PYTHON_BOOTSTRAP_VERBOSE"))
@@ -195,5 +205,266 @@ def _setup_sys_path():
     return coverage_setup
 
 
+def _install_zip_importer(zip_path):
+    """Imports the Python files of the runfiles from the zip they came from.
+
+    Zip files run with `RULES_PYTHON_ZIP_IMPORT=1` don't extract their pure
+    Python files, only the directories they are in. This installs a path hook
+    for the runfiles directories, which finds modules the same way as the
+    default file finder, except that source and cached bytecode files are read
+    from the zip if they aren't on disk. Modules keep their usual `__file__`
+    paths, so data files next to them, which are extracted, can still be found.
+    """
+    # Only imported when needed, as they aren't otherwise loaded at startup.
+    import importlib.machinery
+    import zipfile
+
+    runfiles_root = os.path.normpath(_RUNFILES_ROOT)
+    zip_files = {}
+    # Runfiles-relative, "/"-separated, paths of the Python files in the zip.
+    archive_files = {}
+    # Runfiles-relative directories that contain Python files at any depth.
+    archive_dirs = set()
+    with zipfile.ZipFile(zip_path) as zip_file:
+        for info in zip_file.infolist():
+            name = info.filename
+            if not name.startswith("runfiles/") or not name.endswith((".py", ".pyc")):
+                continue
+            name = name[len("runfiles/") :]
+            archive_files[name] = info
+            while "/" in name:
+                name = name.rpartition("/")[0]
+                if name in archive_dirs:
+                    break
+                archive_dirs.add(name)
+    if archive_files:
+        archive_dirs.add("")
+
+    def relpath(path):
+        path = os.path.normpath(path)
+        if path == runfiles_root:
+            return ""
+        if not path.startswith(runfiles_root + os.sep):
+            return None
+        return path[len(runfiles_root) + 1 :].replace(os.sep, "/")
+
+    def read(name):
+        # A forked process must not share the file offset with its parent.
+        zip_file = zip_files.get(os.getpid())
+        if zip_file is None:
+            zip_file = zipfile.ZipFile(zip_path)
+            zip_files.clear()
+            zip_files[os.getpid()] = zip_file
+        return zip_file.read(archive_files[name])
+
+    def listdir(path):
+        try:
+            return set(os.listdir(path))
+        except OSError:
+            return set()
+
+    class ArchiveSourceLoader(importlib.machinery.SourceFileLoader):
+        def get_data(self, path):
+            name = relpath(path)
+            if name in archive_files:
+                return read(name)
+            return super().get_data(path)
+
+        def path_stats(self, path):
+            name = relpath(path)
+            if name in archive_files:
+                info = archive_files[name]
+                return {
+                    "mtime": time.mktime(info.date_time + (0, 0, -1)),
+                    "size": info.file_size,
+                }
+            return super().path_stats(path)
+
+        def set_data(self, path, data, *, _mode=0o666):
+            # Don't write bytecode for files that aren't on disk.
+            pass
+
+    # The loaders in the same order as the default file finder uses them, and
+    # whether the files can also be read from the zip.
+    loaders = [
+        (
+            importlib.machinery.ExtensionFileLoader,
+            importlib.machinery.EXTENSION_SUFFIXES,
+            False,
+        ),
+        (
+            importlib.machinery.SourceFileLoader,
+            importlib.machinery.SOURCE_SUFFIXES,
+            True,
+        ),
+        (
+            importlib.machinery.SourcelessFileLoader,
+            importlib.machinery.BYTECODE_SUFFIXES,
+            False,
+        ),
+    ]
+    all_suffixes = sorted(
+        (suffix for _, suffixes, _ in loaders for suffix in suffixes),
+        key=len,
+        reverse=True,
+    )
+
+    def module_name(filename):
+        for suffix in all_suffixes:
+            if filename.endswith(suffix):
+                return filename[: -len(suffix)]
+        return None
+
+    class ArchiveFinder:
+        def __init__(self, path, rel_dir):
+            self.path = path
+            self._rel_prefix = rel_dir + "/" if rel_dir else ""
+            self._disk_entries = None
+
+        def invalidate_caches(self):
+            self._disk_entries = None
+
+        def find_spec(self, fullname, target=None):
+            if self._disk_entries is None:
+                self._disk_entries = listdir(self.path)
+            tail = fullname.rpartition(".")[2]
+            base_path = os.path.join(self.path, tail)
+            rel_base = self._rel_prefix + tail
+            is_dir = rel_base in archive_dirs or (
+                tail in self._disk_entries and os.path.isdir(base_path)
+            )
+            if is_dir:
+                spec = self._find_file(
+                    fullname,
+                    base_path,
+                    rel_base + "/",
+                    "__init__",
+                    listdir(base_path),
+                    [base_path],
+                )
+                if spec is not None:
+                    return spec
+            spec = self._find_file(
+                fullname, self.path, self._rel_prefix, tail, self._disk_entries, None
+            )
+            if spec is None and is_dir:
+                spec = importlib.machinery.ModuleSpec(fullname, None)
+                spec.submodule_search_locations = [base_path]
+            return spec
+
+        def _find_file(
+            self, fullname, directory, rel_prefix, stem, disk_entries, search_locations
+        ):
+            for loader_class, suffixes, in_archive in loaders:
+                for suffix in suffixes:
+                    filename = stem + suffix
+                    if filename in disk_entries:
+                        file_loader_class = loader_class
+                    elif in_archive and rel_prefix + filename in archive_files:
+                        file_loader_class = ArchiveSourceLoader
+                    else:
+                        continue
+                    path = os.path.join(directory, filename)
+                    spec = importlib.machinery.ModuleSpec(
+                        fullname,
+                        file_loader_class(fullname, path),
+                        origin=path,
+                        is_package=search_locations is not None,
+                    )
+                    spec.has_location = True
+                    if search_locations is not None:
+                        spec.submodule_search_locations = search_locations
+                    return spec
+            return None
+
+        def iter_modules(self, prefix=""):
+            # Used by pkgutil.iter_modules and walk_packages. Like pkgutil does
+            # for the default file finder, directories are only listed if they
+            # have an __init__ file.
+            if self._disk_entries is None:
+                self._disk_entries = listdir(self.path)
+            entries = set(self._disk_entries)
+            for name in archive_files:
+                if name.startswith(self._rel_prefix):
+                    entries.add(name[len(self._rel_prefix) :].partition("/")[0])
+            yielded = set()
+            for entry in sorted(entries):
+                modname = module_name(entry)
+                is_package = False
+                if modname is None:
+                    base_path = os.path.join(self.path, entry)
+                    rel_base = self._rel_prefix + entry
+                    if "." in entry or not (
+                        rel_base in archive_dirs or os.path.isdir(base_path)
+                    ):
+                        continue
+                    init_spec = self._find_file(
+                        entry,
+                        base_path,
+                        rel_base + "/",
+                        "__init__",
+                        listdir(base_path),
+                        [base_path],
+                    )
+                    if init_spec is None:
+                        continue
+                    modname = entry
+                    is_package = True
+                if not modname or modname == "__init__" or "." in modname:
+                    continue
+                if modname not in yielded:
+                    yielded.add(modname)
+                    yield prefix + modname, is_package
+
+    def path_hook(path):
+        rel_dir = relpath(path)
+        if rel_dir is None or rel_dir not in archive_dirs:
+            raise ImportError("No Python files in the zip for: " + path)
+        return ArchiveFinder(path, rel_dir)
+
+    sys.path_hooks.insert(0, path_hook)
+    sys.path_importer_cache.clear()
+
+
+def _profile_now():
+    return time.time_ns() // 1000
+
+
+def _install_import_profiler():
+    """Records an event for every import statement that loads modules."""
+    import builtins
+
+    original_import = builtins.__import__
+
+    def profiled_import(name, *args, **kwargs):
+        num_modules = len(sys.modules)
+        start = _profile_now()
+        try:
+            return original_import(name, *args, **kwargs)
+        finally:
+            if len(sys.modules) != num_modules:
+                PROFILE_EVENTS.append(
+                    ("import " + name, "import", start, _profile_now())
+                )
+
+    builtins.__import__ = profiled_import
+
+
+_ZIP_ARCHIVE = getattr(sys, "_xoptions", {}).get("RULES_PYTHON_ZIP_ARCHIVE")
+if _ZIP_ARCHIVE:
+    _print_verbose("importing Python files from zip:", _ZIP_ARCHIVE)
+    _phase_start = _profile_now()
+    _install_zip_importer(_ZIP_ARCHIVE)
+    if _PROFILE:
+        PROFILE_EVENTS.append(
+            ("zip_importer", "bootstrap", _phase_start, _profile_now())
+        )
+
+_phase_start = _profile_now()
 COVERAGE_SETUP = _setup_sys_path()
+if _PROFILE:
+    PROFILE_EVENTS.append(("setup_sys_path", "bootstrap", _phase_start, _profile_now()))
+    PROFILE_EVENTS.append(("site_init", "bootstrap", _START, _profile_now()))
+    if os.environ.get("RULES_PYTHON_BOOTSTRAP_PROFILE_IMPORTS") == "1":
+        _install_import_profiler()
 _print_verbose("DONE")
@@ -6,6 +6,10 @@ if [[ -n "${RULES_PYTHON_BOOTSTRAP_VERBOSE:-}" ]]; then
   set -x
 fi
 
+# Microseconds since the epoch. Empty before Bash 5, which doesn't have
+# EPOCHREALTIME; stage 1 isn't profiled then.
+stage1_start=${EPOCHREALTIME/[.,]/}
+
 # runfiles-relative path
 STAGE2_BOOTSTRAP="%stage2_bootstrap%"
 
@@ -26,21 +30,137 @@ declare -a INTERPRETER_ARGS_FROM_TARGET=(
 %interpreter_args%
 )
 
+declare -a profile_events=()
+
+# Records that the bootstrap phase named $1 started at $2 and ends now, if
+# RULES_PYTHON_BOOTSTRAP_PROFILE is set.
+function profile_event() {
+  if [[ -n "${RULES_PYTHON_BOOTSTRAP_PROFILE:-}" && -n "$2" ]]; then
+    local now=${EPOCHREALTIME/[.,]/}
+    profile_events+=("{\"name\": \"$1\", \"cat\": \"bootstrap\", \"ph\": \"X\", \"ts\": $2, \"dur\": $((now - $2)), \"pid\": $$, \"tid\": 0}")
+  fi
+}
+
+# Appends the recorded events to the RULES_PYTHON_BOOTSTRAP_PROFILE trace. It
+# is a JSON array of Chrome trace events, which is created by the first stage
+# of the bootstrap that writes to it, and appended to by the later stages.
+function write_profile_events() {
+  local events
+  if (( ${#profile_events[@]} == 0 )); then
+    return
+  fi
+  printf -v events '%s,\n' "${profile_events[@]}"
+  events=${events%,$'\n'}
+  if [[ -z "${RULES_PYTHON_BOOTSTRAP_PROFILE_STARTED:-}" ]]; then
+    # Only marked as started once the trace exists, so a later stage doesn't
+    # append to a missing file, but tries to create it again.
+    if printf '[\n%s' "$events" 2>/dev/null > "$RULES_PYTHON_BOOTSTRAP_PROFILE"; then
+      export RULES_PYTHON_BOOTSTRAP_PROFILE_STARTED=1
+    else
+      echo >&2 "WARNING: Unable to write bootstrap profile: $RULES_PYTHON_BOOTSTRAP_PROFILE"
+    fi
+  else
+    printf ',\n%s' "$events" 2>/dev/null >> "$RULES_PYTHON_BOOTSTRAP_PROFILE" ||
+      echo >&2 "WARNING: Unable to write bootstrap profile: $RULES_PYTHON_BOOTSTRAP_PROFILE"
+  fi
+}
+
+# Prints a key that identifies the contents of the zip file $1. It is a
+# checksum of the zip's central directory, which has the name, size and CRC-32
+# of every member, so the whole file doesn't have to be read. If the end of
+# central directory record isn't found, e.g. because the zip has a comment,
+# the whole file is checksummed instead.
+# The Python zip bootstrap (zip_main_template.py) uses a sha256 key instead,
+# because sha256 tools differ between platforms. The formats never collide, so
+# each bootstrap keeps its own extracted tree.
+function zip_cache_key() {
+  local zip_file="$1"
+  local size
+  local checksum=""
+  local -a end_record
+  size=$(wc -c < "$zip_file")
+  size=$((size))
+  if (( size >= 22 )); then
+    end_record=($(od -An -tu1 -j $((size - 22)) -N 16 "$zip_file"))
+    if [[ "${end_record[*]:0:4}" == "80 75 5 6" ]]; then
+      local cd_size=$(( end_record[12] | end_record[13] << 8 |
+        end_record[14] << 16 | end_record[15] << 24 ))
+      if (( cd_size + 22 <= size )); then
+        checksum=$(tail -c $((cd_size + 22)) "$zip_file" | cksum)
+      fi
+    fi
+  fi
+  if [[ -z "$checksum" ]]; then
+    checksum=$(cksum < "$zip_file")
+  fi
+  echo "$size-${checksum%% *}"
+}
+
+# Extracts the zip file $1 into the directory $2, so that later runs can reuse
+# it. The zip is extracted into a temporary directory that is then renamed into
+# place, so a partially extracted tree is never used. Where `flock` is
+# available, it avoids extracting the same zip concurrently.
+function extract_zip_cached() {
+  local zip_file="$1"
+  local dest_dir="$2"
+  local tmp_dir
+  local unzip_exit_code=0
+  mkdir -p "$(dirname "$dest_dir")"
+  if command -v flock >/dev/null; then
+    exec 9>"$dest_dir.lock"
+    flock 9
+  fi
+  if [[ ! -d "$dest_dir" ]]; then
+    tmp_dir=$(mktemp -d "$dest_dir.XXXXXX")
+    # See below for why exit code 1 is ignored. Other errors are not, because
+    # the extracted tree is kept around.
+    unzip -q -d "$tmp_dir" "$zip_file" 2>/dev/null || unzip_exit_code=$?
+    if (( unzip_exit_code > 1 )); then
+      rm -fr "$tmp_dir"
+      echo >&2 "ERROR: Unable to extract $zip_file (unzip exit code $unzip_exit_code)"
+      exit 1
+    fi
+    # If another process renamed its tree into place first, mv moves ours
+    # inside of it instead; remove it in that case.
+    mv "$tmp_dir" "$dest_dir"
+    rm -fr "$dest_dir/$(basename "$tmp_dir")"
+  fi
+  # Later runs use the directory without taking the lock, and processes still
+  # waiting for the lock find the directory too, so the lock file can go.
+  rm -f "$dest_dir.lock"
+  exec 9>&-
+}
+
+phase_start=${EPOCHREALTIME/[.,]/}
 if [[ "$IS_ZIPFILE" == "1" ]]; then
-  # NOTE: Macs have an old version of mktemp, so we must use only the
-  # minimal functionality of it.
-  zip_dir=$(mktemp -d)
+  if [[ -n "${RULES_PYTHON_EXTRACT_ROOT:-}" ]]; then
+    # Use the contents of the zip as a unique, reusable, location for the
+    # extracted files. Nothing needs to be cleaned up afterwards, so exec can
+    # be used.
+    use_exec=1
+    zip_dir="$RULES_PYTHON_EXTRACT_ROOT/zipapps/$(zip_cache_key "$0")"
+    if [[ ! -d "$zip_dir" ]]; then
+      extract_zip_cached "$0" "$zip_dir"
+    fi
+  else
+    # Re-exec'ing can't be used because we have to clean up the temporary
+    # directory the zip is extracted into.
+    use_exec=0
+    # NOTE: Macs have an old version of mktemp, so we must use only the
+    # minimal functionality of it.
+    zip_dir=$(mktemp -d)
 
-  if [[ -n "$zip_dir" && -z "${RULES_PYTHON_BOOTSTRAP_VERBOSE:-}" ]]; then
-    trap 'rm -fr "$zip_dir"' EXIT
+    if [[ -n "$zip_dir" && -z "${RULES_PYTHON_BOOTSTRAP_VERBOSE:-}" ]]; then
+      trap 'rm -fr "$zip_dir"' EXIT
+    fi
+    # unzip emits a warning and exits with code 1 when there is extraneous
+    # data, like this bootstrap prelude code, but otherwise successfully
+    # extracts, so we have to ignore its exit code and suppress stderr.
+    # The alternative requires having to copy ourselves elsewhere with the
+    # prelude stripped (because zip can't extract from a stream). We avoid that
+    # because it's wasteful.
+    ( unzip -q -d "$zip_dir" "$0" 2>/dev/null || true )
   fi
-  # unzip emits a warning and exits with code 1 when there is extraneous data,
-  # like this bootstrap prelude code, but otherwise successfully extracts, so
-  # we have to ignore its exit code and suppress stderr.
-  # The alternative requires having to copy ourselves elsewhere with the prelude
-  # stripped (because zip can't extract from a stream). We avoid that because
-  # it's wasteful.
-  ( unzip -q -d "$zip_dir" "$0" 2>/dev/null || true )
 
   RUNFILES_DIR="$zip_dir/runfiles"
   if [[ ! -d "$RUNFILES_DIR" ]]; then
@@ -88,6 +208,7 @@ else
   }
   RUNFILES_DIR=$(find_runfiles_root $0)
 fi
+profile_event find_runfiles "$phase_start"
 
 
 function find_python_interpreter() {
@@ -107,10 +228,11 @@ function find_python_interpreter() {
 
 python_exe=$(find_python_interpreter $RUNFILES_DIR $PYTHON_BINARY)
 
+phase_start=${EPOCHREALTIME/[.,]/}
+
 # Zip files have to re-create the venv bin/python3 symlink because they
 # don't contain it already.
 if [[ "$IS_ZIPFILE" == "1" ]]; then
-  use_exec=0
   # It should always be under runfiles, but double check this. We don't
   # want to accidentally create symlinks elsewhere.
   if [[ "$python_exe" != $RUNFILES_DIR/* ]]; then
@@ -134,7 +256,12 @@ if [[ "$IS_ZIPFILE" == "1" ]]; then
   fi
   # The bin/ directory may not exist if it is empty.
   mkdir -p "$(dirname $python_exe)"
-  ln -s "$symlink_to" "$python_exe"
+  # A reused extraction may already have the symlink. Other runs may be using
+  # it concurrently, so it is replaced atomically.
+  if [[ ! -L "$python_exe" || "$(readlink "$python_exe")" != "$symlink_to" ]]; then
+    ln -s "$symlink_to" "$python_exe.$$.tmp"
+    mv -f "$python_exe.$$.tmp" "$python_exe"
+  fi
 elif [[ "$RECREATE_VENV_AT_RUNTIME" == "1" ]]; then
   if [[ -n "$RULES_PYTHON_EXTRACT_ROOT" ]]; then
     use_exec=1
@@ -183,6 +310,7 @@ elif [[ "$RECREATE_VENV_AT_RUNTIME" == "1" ]]; then
 else
   use_exec=1
 fi
+profile_event create_venv "$phase_start"
 
 # At this point, we should have a valid reference to the interpreter.
 # Check that so we can give an nicer failure if things went wrong.
@@ -228,6 +356,9 @@ fi
 
 export RUNFILES_DIR
 
+profile_event stage1 "$stage1_start"
+write_profile_events
+
 command=(
   env
   "${interpreter_env[@]}"
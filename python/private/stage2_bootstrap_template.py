@@ -3,6 +3,11 @@
 # However, more setup is required to make the app's real main file runnable.
 
 import sys
+import time
+
+# Microseconds since the epoch, so that the phases of all the stages of the
+# bootstrap line up in the RULES_PYTHON_BOOTSTRAP_PROFILE trace.
+_STAGE2_START = time.time_ns() // 1000
 
 # By default the Python interpreter prepends the directory containing this
 # script (following symlinks) to the import path. This is the cause of #9239,
@@ -119,6 +124,65 @@ def is_verbose_coverage():
     return os.environ.get("VERBOSE_COVERAGE") or is_verbose()
 
 
+def profile_now():
+    """Returns the current time for RULES_PYTHON_BOOTSTRAP_PROFILE events."""
+    return time.time_ns() // 1000
+
+
+def write_profile_events(path, events, *, create, close):
+    # type: (str, list[tuple[str, str, int, int]], bool, bool) -> None
+    """Appends events to the RULES_PYTHON_BOOTSTRAP_PROFILE trace.
+
+    The trace is a JSON array of Chrome trace events. It is created by the first
+    stage of the bootstrap that writes to it, and appended to by the later
+    stages.
+
+    Args:
+      path: (str) The path of the trace file.
+      events: (list[tuple[str, str, int, int]]) The name, category, and start
+          and end times in microseconds of each event.
+      create: (bool) Whether to create the trace, instead of appending to it.
+      close: (bool) Whether to end the JSON array after the events.
+    """
+    import json
+
+    pid = os.getpid()
+    text = ",\n".join(
+        json.dumps(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start,
+                "dur": end - start,
+                "pid": pid,
+                "tid": 0,
+            }
+        )
+        for name, category, start, end in events
+    )
+    if create:
+        text = "[\n" + text
+    elif text:
+        text = ",\n" + text
+    if close:
+        text += "\n]\n"
+    try:
+        with open(path, "w" if create else "a") as f:
+            f.write(text)
+    except OSError as e:
+        print("WARNING: Unable to write bootstrap profile:", e, file=sys.stderr)
+
+
+def take_site_init_profile_events():
+    """Returns and clears the profile events recorded by _bazel_site_init."""
+    site_init = sys.modules.get("_bazel_site_init")
+    events = list(getattr(site_init, "PROFILE_EVENTS", ()))
+    if events:
+        del site_init.PROFILE_EVENTS[:]
+    return events
+
+
 def find_runfiles_root(main_rel_path):
     """Finds the runfiles tree."""
     # When the calling process used the runfiles manifest to resolve the
@@ -365,6 +429,11 @@ def main():
     print_verbose("initial environ:", mapping=os.environ)
     print_verbose("initial sys.path:", values=sys.path)
 
+    # Programs run by this one aren't profiled into the same trace.
+    profile_path = os.environ.pop("RULES_PYTHON_BOOTSTRAP_PROFILE", None)
+    profile_started = os.environ.pop("RULES_PYTHON_BOOTSTRAP_PROFILE_STARTED", None)
+
+    phase_start = profile_now()
     main_rel_path = None
     # todo: things happen to work because find_runfiles_root
     # ends up using stage2_bootstrap, and ends up computing the proper
@@ -383,6 +452,7 @@ def main():
     runfiles_envkey, runfiles_envvalue = runfiles_envvar(runfiles_root)
     if runfiles_envkey:
         os.environ[runfiles_envkey] = runfiles_envvalue
+    profile_events = [("find_runfiles", "bootstrap", phase_start, profile_now())]
 
     if MAIN_PATH:
         # Recreate the "add main's dir to sys.path[0]" behavior to match the
@@ -432,13 +502,39 @@ def main():
     else:
         coverage_enabled = False
 
-    with _maybe_collect_coverage(enable=coverage_enabled):
-        if MAIN_PATH:
-            # The first arg is this bootstrap, so drop that for the re-invocation.
-            _run_py_path(main_filename, args=sys.argv[1:])
-        else:
-            _run_py_module(MAIN_MODULE)
-        sys.exit(0)
+    if profile_path:
+        # Written before running the program, in case it never returns.
+        profile_events.append(("stage2", "bootstrap", _STAGE2_START, profile_now()))
+        write_profile_events(
+            profile_path,
+            take_site_init_profile_events() + profile_events,
+            create=not profile_started,
+            close=False,
+        )
+        profile_events = []
+
+    phase_start = profile_now()
+    try:
+        with _maybe_collect_coverage(enable=coverage_enabled):
+            if coverage_enabled:
+                profile_events.append(
+                    ("coverage_setup", "bootstrap", phase_start, profile_now())
+                )
+            if MAIN_PATH:
+                # The first arg is this bootstrap, so drop that for the re-invocation.
+                _run_py_path(main_filename, args=sys.argv[1:])
+            else:
+                _run_py_module(MAIN_MODULE)
+            sys.exit(0)
+    finally:
+        if profile_path:
+            profile_events.append(("main", "bootstrap", phase_start, profile_now()))
+            write_profile_events(
+                profile_path,
+                take_site_init_profile_events() + profile_events,
+                create=False,
+                close=True,
+            )
 
 
 main()
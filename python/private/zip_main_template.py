@@ -17,14 +17,31 @@ import sys
 # TODO(#7091): Remove this hack when no longer necessary.
 del sys.path[0]
 
+import hashlib
 import os
+import posixpath
 import shutil
+import struct
 import subprocess
 import tempfile
+import time
 import zipfile
 
+# Microseconds since the epoch, so that the phases of all the stages of the
+# bootstrap line up in the RULES_PYTHON_BOOTSTRAP_PROFILE trace.
+_STAGE1_START = time.time_ns() // 1000
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; extraction then relies on the atomic rename
+    # alone.
+    fcntl = None
+
 # runfiles-relative path
 _STAGE2_BOOTSTRAP = "%stage2_bootstrap%"
+# runfiles-relative path, empty if a main module is used
+_MAIN_PATH = "%main%"
 # runfiles-relative path
 _PYTHON_BINARY = "%python_binary%"
 # runfiles-relative path, absolute path, or single word
@@ -120,6 +137,52 @@ def print_verbose(*args, mapping=None, values=None):
             print("bootstrap: stage 1:", *args, file=sys.stderr, flush=True)
 
 
+def profile_now():
+    """Returns the current time for RULES_PYTHON_BOOTSTRAP_PROFILE events."""
+    return time.time_ns() // 1000
+
+
+def write_profile_events(path, events):
+    """Appends events to the RULES_PYTHON_BOOTSTRAP_PROFILE trace.
+
+    The trace is a JSON array of Chrome trace events. It is created by the first
+    stage of the bootstrap that writes to it, and appended to by the later
+    stages.
+
+    Args:
+        path: The path of the trace file.
+        events: List of tuples of the name, category, and start and end times
+            in microseconds of each event.
+    """
+    import json
+
+    pid = os.getpid()
+    text = ",\n".join(
+        json.dumps(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start,
+                "dur": end - start,
+                "pid": pid,
+                "tid": 0,
+            }
+        )
+        for name, category, start, end in events
+    )
+    create = not os.environ.get("RULES_PYTHON_BOOTSTRAP_PROFILE_STARTED")
+    try:
+        with open(path, "w" if create else "a") as f:
+            f.write(("[\n" if create else ",\n") + text)
+    except OSError as e:
+        print("WARNING: Unable to write bootstrap profile:", e, file=sys.stderr)
+    else:
+        # Only once the trace exists, so a later stage doesn't append to a
+        # missing file, but tries to create it again.
+        os.environ["RULES_PYTHON_BOOTSTRAP_PROFILE_STARTED"] = "1"
+
+
 def find_binary(module_space, bin_name):
     """Finds the real binary if it's not a normal absolute path."""
     if not bin_name:
@@ -141,7 +204,66 @@ def find_binary(module_space, bin_name):
         return search_path(bin_name)
 
 
-def extract_zip(zip_path, dest_dir):
+def get_zip_import_filter():
+    """Returns a filter for the zip members to extract when importing from it.
+
+    Pure Python source files and their cached bytecode are imported from the
+    zip in place, so only the directories they are in are created. The stage 2
+    bootstrap, the main file and the venv are always extracted, because they
+    are run before the importer for the zip is set up.
+    """
+    always_extract = set()
+    for path in (_STAGE2_BOOTSTRAP, _MAIN_PATH):
+        if path:
+            always_extract.add("runfiles/" + posixpath.normpath(path))
+    venv = posixpath.dirname(posixpath.dirname(_PYTHON_BINARY))
+
+    def should_extract(name):
+        if not name.startswith("runfiles/") or name in always_extract:
+            return True
+        if venv and name.startswith("runfiles/" + venv + "/"):
+            return True
+        if name.endswith(".py"):
+            return False
+        return not (name.endswith(".pyc") and "/__pycache__/" in name)
+
+    return should_extract
+
+
+# Members at least this large are extracted on a thread pool. Inflating and
+# writing them releases the GIL, whereas small members are dominated by
+# per-file overhead that threads don't help with.
+_THREADED_MEMBER_SIZE = 256 * 1024
+
+
+def _default_modes():
+    """Returns the modes of new files and directories under the current umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask, 0o777 & ~umask
+
+
+def _extract_member(zf, info, path, default_mode):
+    if not info.is_dir():
+        with zf.open(info) as src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+    # The Unix st_mode bits (see "man 7 inode") are stored in the upper 16
+    # bits of external_attr. Of those, we set the lower 12 bits, which are the
+    # file mode bits (since the file type bits can't be set by chmod anyway).
+    # Most members have the mode that new files get anyway.
+    attrs = info.external_attr >> 16
+    # Rumor has it these can be 0 for zips created on Windows.
+    if attrs != 0 and attrs & 0o7777 != default_mode:
+        os.chmod(path, attrs & 0o7777)
+
+
+def _extract_members(zip_path, members):
+    with zipfile.ZipFile(zip_path) as zf:
+        for member in members:
+            _extract_member(zf, *member)
+
+
+def extract_zip(zip_path, dest_dir, should_extract=None):
     """Extracts the contents of a zip file, preserving the unix file mode bits.
 
     These include the permission bits, and in particular, the executable bit.
@@ -149,30 +271,163 @@ def extract_zip(zip_path, dest_dir):
     Ideally the zipfile module should set these bits, but it doesn't. See:
     https://bugs.python.org/issue15795.
 
+    All directories are created up front. Large members are then extracted on a
+    thread pool while the small ones are extracted on this thread.
+
     Args:
         zip_path: The path to the zip file to extract
         dest_dir: The path to the destination directory
+        should_extract: Optional function that is passed the name of each zip
+            member, and returns whether to extract it. Only the directory is
+            created for members that aren't extracted.
     """
     zip_path = get_windows_path_with_unc_prefix(zip_path)
-    dest_dir = get_windows_path_with_unc_prefix(dest_dir)
+    # UNC-prefixed paths must be absolute/normalized. See
+    # https://docs.microsoft.com/en-us/windows/desktop/fileio/naming-a-file#maximum-path-length-limitation
+    dest_dir = os.path.abspath(get_windows_path_with_unc_prefix(dest_dir))
+    file_mode, dir_mode = _default_modes()
     with zipfile.ZipFile(zip_path) as zf:
+        dirs = set()
+        small = []
+        large = []
         for info in zf.infolist():
-            zf.extract(info, dest_dir)
-            # UNC-prefixed paths must be absolute/normalized. See
-            # https://docs.microsoft.com/en-us/windows/desktop/fileio/naming-a-file#maximum-path-length-limitation
-            file_path = os.path.abspath(os.path.join(dest_dir, info.filename))
-            # The Unix st_mode bits (see "man 7 inode") are stored in the upper 16
-            # bits of external_attr. Of those, we set the lower 12 bits, which are the
-            # file mode bits (since the file type bits can't be set by chmod anyway).
-            attrs = info.external_attr >> 16
-            if attrs != 0:  # Rumor has it these can be 0 for zips created on Windows.
-                os.chmod(file_path, attrs & 0o7777)
+            name = info.filename
+            if name.startswith("/") or ".." in name.split("/"):
+                raise AssertionError("Unsafe path in zip: {!r}".format(name))
+            if info.is_dir():
+                dirs.add(name.rstrip("/"))
+            else:
+                dirs.add(posixpath.dirname(name))
+            if should_extract and not should_extract(name):
+                continue
+            path = os.path.join(dest_dir, name.rstrip("/").replace("/", os.sep))
+            member = (info, path, dir_mode if info.is_dir() else file_mode)
+            if info.file_size >= _THREADED_MEMBER_SIZE:
+                large.append(member)
+            else:
+                small.append(member)
+
+        for name in dirs:
+            if name:
+                path = os.path.join(dest_dir, name.replace("/", os.sep))
+                os.makedirs(path, exist_ok=True)
+
+        jobs = min(len(large), os.cpu_count() or 1, 8)
+        if jobs < 2:
+            for member in small + large:
+                _extract_member(zf, *member)
+            return
+
+        # Imported here to not slow down the common case.
+        import concurrent.futures
+
+        # The largest members are spread over the threads first. Opening
+        # members of the same ZipFile isn't thread-safe, so each thread reads
+        # from its own.
+        large.sort(key=lambda member: member[0].file_size, reverse=True)
+        with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+            futures = [
+                executor.submit(_extract_members, zip_path, large[i::jobs])
+                for i in range(jobs)
+            ]
+            for member in small:
+                _extract_member(zf, *member)
+            for future in futures:
+                future.result()
+
+
+def zip_cache_key(zip_path):
+    """Returns a key that identifies the contents of a zip file.
+
+    The key is a hash of the zip's central directory, which has the name, size
+    and CRC-32 of every member, so it changes whenever the contents do without
+    having to read the whole file. If the end of central directory record can't
+    be found, e.g. because the zip has a comment, the whole file is hashed.
+
+    The shell bootstrap (stage1_bootstrap_template.sh) names its cached
+    extractions with a `size-cksum` key instead, because sha256 tools differ
+    between platforms. The formats never collide, so each bootstrap keeps its
+    own extracted tree and never reuses a tree extracted by the other.
+    """
+    digest = hashlib.sha256()
+    with open(zip_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        digest.update(str(size).encode("ascii"))
+        if size >= 22:
+            f.seek(size - 22)
+            end_record = f.read(22)
+            signature, cd_size = struct.unpack("<4s8xL6x", end_record)
+            if signature == b"PK\x05\x06" and cd_size + 22 <= size:
+                f.seek(size - 22 - cd_size)
+                digest.update(f.read(cd_size + 22))
+                return digest.hexdigest()
+        f.seek(0)
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_zip_cached(zip_path, extract_root, should_extract=None):
+    """Extracts a zip file into a directory reused by later runs.
+
+    The directory is named after the contents of the zip file. The zip is
+    extracted into a temporary directory next to it, which is then renamed into
+    place, so a partially extracted tree is never used. A lock file avoids
+    extracting the same zip concurrently, where supported.
+
+    Args:
+        zip_path: The path to the zip file to extract
+        extract_root: The directory to create the extracted trees in
+        should_extract: Optional filter for the members to extract; see
+            extract_zip().
+
+    Returns:
+        The path to the directory the zip was extracted into.
+    """
+    zips_dir = os.path.join(os.path.abspath(extract_root), "zipapps")
+    dest_dir = os.path.join(zips_dir, zip_cache_key(zip_path))
+    if should_extract:
+        # Keep partial extractions apart from full ones.
+        dest_dir += "-zipimport"
+    if os.path.isdir(dest_dir):
+        return dest_dir
+
+    os.makedirs(zips_dir, exist_ok=True)
+    lock_path = dest_dir + ".lock"
+    with open(lock_path, "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # Another process may have extracted it while we waited for the lock.
+        if not os.path.isdir(dest_dir):
+            temp_dir = tempfile.mkdtemp(".tmp", os.path.basename(dest_dir), zips_dir)
+            try:
+                extract_zip(zip_path, temp_dir, should_extract)
+                os.rename(temp_dir, dest_dir)
+            except OSError:
+                shutil.rmtree(temp_dir, True)
+                # Without a lock, another process may have won the race.
+                if not os.path.isdir(dest_dir):
+                    raise
+    # Once the directory exists, later runs use it without taking the lock,
+    # and processes still waiting for the lock find it too, so the lock file
+    # can go. It can't be removed while it is open on Windows; that's fine.
+    try:
+        os.remove(lock_path)
+    except OSError:
+        pass
+    return dest_dir
 
 
 # Create the runfiles tree by extracting the zip file
-def create_module_space():
+def create_module_space(extract_root, should_extract=None):
+    if extract_root:
+        zip_dir = extract_zip_cached(
+            os.path.dirname(__file__), extract_root, should_extract
+        )
+        return os.path.join(zip_dir, "runfiles")
     temp_dir = tempfile.mkdtemp("", "Bazel.runfiles_")
-    extract_zip(os.path.dirname(__file__), temp_dir)
+    extract_zip(os.path.dirname(__file__), temp_dir, should_extract)
     # IMPORTANT: Later code does `rm -fr` on dirname(module_space) -- it's
     # important that deletion code be in sync with this directory structure
     return os.path.join(temp_dir, "runfiles")
@@ -185,8 +440,10 @@ def execute_file(
     env,
     module_space,
     workspace,
+    delete_module_space,
+    interpreter_args=(),
 ):
-    # type: (str, str, list[str], dict[str, str], str, str|None, str|None) -> ...
+    # type: (str, str, list[str], dict[str, str], str, str|None, bool, list[str]) -> ...
     """Executes the given Python file using the various environment settings.
 
     This will not return, and acts much like os.execv, except is much
@@ -200,6 +457,9 @@ def execute_file(
       module_space: (str) Path to the module space/runfiles tree directory
       workspace: (str|None) Name of the workspace to execute in. This is expected to be a
           directory under the runfiles tree.
+      delete_module_space: (bool) Whether the module space is temporary and has
+          to be deleted once the program finishes.
+      interpreter_args: (list[str]) Arguments for the Python interpreter
     """
     # We want to use os.execv instead of subprocess.call, which causes
     # problems with signal passing (making it difficult to kill
@@ -211,18 +471,27 @@ def execute_file(
     #   subprocess.call.
     # - When running in a workspace or zip file, we need to clean up the
     #   workspace after the process finishes so control must return here.
+    #   This doesn't apply when the zip was extracted into a reusable location.
+    subprocess_argv = [python_program] + list(interpreter_args) + [main_filename] + args
+    print_verbose("subprocess argv:", values=subprocess_argv)
+    print_verbose("subprocess env:", mapping=env)
+    print_verbose("subprocess cwd:", workspace)
+    if not delete_module_space and not is_windows():
+        if workspace:
+            os.chdir(workspace)
+        os.execve(python_program, subprocess_argv, env)
     try:
-        subprocess_argv = [python_program, main_filename] + args
-        print_verbose("subprocess argv:", values=subprocess_argv)
-        print_verbose("subprocess env:", mapping=env)
-        print_verbose("subprocess cwd:", workspace)
         ret_code = subprocess.call(subprocess_argv, env=env, cwd=workspace)
         sys.exit(ret_code)
     finally:
-        # NOTE: dirname() is called because create_module_space() creates a
-        # sub-directory within a temporary directory, and we want to remove the
-        # whole temporary directory.
-        shutil.rmtree(os.path.dirname(module_space), True)
+        # A module space extracted into RULES_PYTHON_EXTRACT_ROOT is reused by
+        # later runs, so it must be kept. That only gets here on Windows,
+        # which can't exec.
+        if delete_module_space:
+            # NOTE: dirname() is called because create_module_space() creates a
+            # sub-directory within a temporary directory, and we want to remove
+            # the whole temporary directory.
+            shutil.rmtree(os.path.dirname(module_space), True)
 
 
 def main():
@@ -243,7 +512,16 @@ def main():
     if is_windows():
         main_rel_path = main_rel_path.replace("/", os.sep)
 
-    module_space = create_module_space()
+    # When set, the zip is extracted into a reusable location under it instead
+    # of a temporary directory.
+    extract_root = os.environ.get("RULES_PYTHON_EXTRACT_ROOT")
+    # When set, pure Python files are imported from the zip in place instead of
+    # being extracted.
+    zip_import = os.environ.get("RULES_PYTHON_ZIP_IMPORT") == "1"
+    should_extract = get_zip_import_filter() if zip_import else None
+    phase_start = profile_now()
+    module_space = create_module_space(extract_root, should_extract)
+    profile_events = [("extract_zip", "bootstrap", phase_start, profile_now())]
     print_verbose("extracted runfiles to:", module_space)
 
     new_env["RUNFILES_DIR"] = module_space
@@ -283,14 +561,28 @@ def main():
                 f"Python interpreter to use not found on PATH: {_PYTHON_BINARY_ACTUAL}"
             )
 
+    phase_start = profile_now()
     # The bin/ directory may not exist if it is empty.
     os.makedirs(os.path.dirname(python_program), exist_ok=True)
-    try:
-        os.symlink(symlink_to, python_program)
-    except OSError as e:
-        raise Exception(
-            f"Unable to create venv python interpreter symlink: {python_program} -> {symlink_to}"
-        ) from e
+    # A reused extraction may already have the symlink. Other runs may be using
+    # it concurrently, so it is replaced atomically.
+    if not (
+        os.path.islink(python_program) and os.readlink(python_program) == symlink_to
+    ):
+        try:
+            temp_link = "{}.{}.tmp".format(python_program, os.getpid())
+            os.symlink(symlink_to, temp_link)
+            os.replace(temp_link, python_program)
+        except OSError as e:
+            raise Exception(
+                f"Unable to create venv python interpreter symlink: {python_program} -> {symlink_to}"
+            ) from e
+    profile_events.append(("create_venv", "bootstrap", phase_start, profile_now()))
+
+    profile_path = os.environ.get("RULES_PYTHON_BOOTSTRAP_PROFILE")
+    if profile_path:
+        profile_events.append(("stage1", "bootstrap", _STAGE1_START, profile_now()))
+        write_profile_events(profile_path, profile_events)
 
     # Some older Python versions on macOS (namely Python 3.7) may unintentionally
     # leave this environment variable set after starting the interpreter, which
@@ -308,6 +600,12 @@ def main():
     if os.environ.get("RUN_UNDER_RUNFILES") == "1":
         workspace = os.path.join(module_space, _WORKSPACE_NAME)
 
+    interpreter_args = []
+    if zip_import:
+        # Tells the site initialization of the program which zip to import from.
+        zip_path = os.path.abspath(os.path.dirname(__file__))
+        interpreter_args.append("-XRULES_PYTHON_ZIP_ARCHIVE=" + zip_path)
+
     sys.stdout.flush()
     execute_file(
         python_program,
@@ -316,6 +614,8 @@ def main():
         new_env,
         module_space,
         workspace,
+        delete_module_space=not extract_root,
+        interpreter_args=interpreter_args,
     )
 
 
@@ -16,26 +16,173 @@
 
 See @rules_python//python/runfiles/README.md for usage instructions.
 """
+import bisect
+import fnmatch
+import hashlib
 import inspect
+import marshal
+import mmap
 import os
 import posixpath
 import sys
-from typing import Dict, Optional, Tuple, Union
+import tempfile
+import types
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+# The values _LoadCached can cache; they must be marshallable.
+_T = TypeVar("_T", Dict[str, str], Dict[Tuple[str, str], str])
+
+
+class _SortedManifest:
+    """Read-only view of a runfiles manifest that looks up entries lazily.
+
+    The manifest is memory-mapped and each lookup binary searches its lines,
+    so creating the view costs the same no matter how many entries the
+    manifest has. This relies on the manifest being sorted by link path,
+    which is how Bazel writes it.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            try:
+                self._buf: Union[mmap.mmap, bytes] = mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            except ValueError:
+                # Empty files can't be memory-mapped.
+                self._buf = b""
+
+    def get(self, link: str) -> Optional[str]:
+        """Returns the target of `link`, or None if it isn't in the manifest."""
+        for current, target in self._Entries(self._LowerBound(link)):
+            if current == link:
+                return target
+            break
+        return None
+
+    def LinksWithPrefix(self, prefix: str) -> Iterator[str]:
+        """Yields the links starting with `prefix`, in sorted order."""
+        for link, _ in self._Entries(self._LowerBound(prefix)):
+            if not link.startswith(prefix):
+                return
+            yield link
+
+    def _LowerBound(self, link: str) -> int:
+        """Returns the offset of the first line whose link is not less than `link`."""
+        buf = self._buf
+        # Both bounds are always at the start of a line (or the end of the
+        # buffer), so [lo, hi) is a run of whole lines left to search.
+        lo = 0
+        hi = len(buf)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = buf.rfind(b"\n", 0, mid) + 1
+            end = buf.find(b"\n", start)
+            if end == -1:
+                end = len(buf)
+            current, _ = _ParseManifestLine(buf[start:end].decode("utf-8"))
+            if current < link:
+                lo = end + 1
+            else:
+                hi = start
+        return lo
+
+    def _Entries(self, offset: int) -> Iterator[Tuple[str, str]]:
+        """Yields the (link, target) pairs of the lines starting at `offset`."""
+        buf = self._buf
+        while offset < len(buf):
+            end = buf.find(b"\n", offset)
+            if end == -1:
+                end = len(buf)
+            yield _ParseManifestLine(buf[offset:end].decode("utf-8"))
+            offset = end + 1
 
 
 class _ManifestBased:
     """`Runfiles` strategy that parses a runfiles-manifest to look up runfiles."""
 
-    def __init__(self, path: str) -> None:
+    def __init__(
+        self, path: str, lazy: bool = False, cache_dir: Optional[str] = None
+    ) -> None:
         if not path:
             raise ValueError()
         if not isinstance(path, str):
             raise TypeError()
         self._path = path
-        self._runfiles = _ManifestBased._LoadRunfiles(path)
+        # Sorted links of an eagerly loaded manifest, computed on first use by
+        # `ListDirChecked`.
+        self._sorted_links: Optional[List[str]] = None
+        self._runfiles: Union[Dict[str, str], _SortedManifest]
+        if lazy:
+            self._runfiles = _SortedManifest(path)
+        elif cache_dir:
+            self._runfiles = _LoadCached(
+                cache_dir, "manifest", path, _ManifestBased._LoadRunfiles
+            )
+        else:
+            self._runfiles = _ManifestBased._LoadRunfiles(path)
 
     def RlocationChecked(self, path: str) -> Optional[str]:
         """Returns the runtime path of a runfile."""
+        return self._RlocationChecked(path, self._runfiles.get)
+
+    def RlocationsChecked(self, paths: List[str]) -> List[Optional[str]]:
+        """Returns the runtime paths of many runfiles."""
+        # Paths looked up together commonly share parent directories, so only
+        # look up each directory prefix in the manifest once.
+        prefix_matches: Dict[str, Optional[str]] = {}
+
+        def lookup_prefix(prefix: str) -> Optional[str]:
+            if prefix not in prefix_matches:
+                prefix_matches[prefix] = self._runfiles.get(prefix)
+            return prefix_matches[prefix]
+
+        return [self._RlocationChecked(path, lookup_prefix) for path in paths]
+
+    def ListDirChecked(self, path: str) -> List[str]:
+        """Returns the sorted names of the entries of a runfiles directory.
+
+        An empty `path` refers to the runfiles root.
+        """
+        prefix = path + "/" if path else ""
+        names = set()
+        for link in self._LinksWithPrefix(prefix):
+            names.add(link[len(prefix) :].split("/", 1)[0])
+        if names or not path:
+            return sorted(names)
+        # The directory may itself be a runfile (or lie under one), in which
+        # case the manifest only lists the directory and not its contents.
+        directory = self.RlocationChecked(path)
+        if directory:
+            return _ListDir(directory)
+        return []
+
+    def _LinksWithPrefix(self, prefix: str) -> Iterator[str]:
+        if isinstance(self._runfiles, _SortedManifest):
+            yield from self._runfiles.LinksWithPrefix(prefix)
+            return
+        if self._sorted_links is None:
+            self._sorted_links = sorted(self._runfiles)
+        links = self._sorted_links
+        for i in range(bisect.bisect_left(links, prefix), len(links)):
+            if not links[i].startswith(prefix):
+                return
+            yield links[i]
+
+    def _RlocationChecked(
+        self, path: str, lookup_prefix: Callable[[str], Optional[str]]
+    ) -> Optional[str]:
         exact_match = self._runfiles.get(path)
         if exact_match:
             return exact_match
@@ -48,7 +195,7 @@ class _ManifestBased:
             prefix_end = path.rfind("/", 0, prefix_end - 1)
             if prefix_end == -1:
                 return None
-            prefix_match = self._runfiles.get(path[0:prefix_end])
+            prefix_match = lookup_prefix(path[0:prefix_end])
             if prefix_match:
                 return prefix_match + "/" + path[prefix_end + 1 :]
 
@@ -58,24 +205,8 @@ class _ManifestBased:
         result = {}
         with open(path, "r", encoding="utf-8", newline="\n") as f:
             for line in f:
-                line = line.rstrip("\n")
-                if line.startswith(" "):
-                    # In lines that start with a space, spaces, newlines, and backslashes are escaped as \s, \n, and \b in
-                    # link and newlines and backslashes are escaped in target.
-                    escaped_link, escaped_target = line[1:].split(" ", maxsplit=1)
-                    link = (
-                        escaped_link.replace(r"\s", " ")
-                        .replace(r"\n", "\n")
-                        .replace(r"\b", "\\")
-                    )
-                    target = escaped_target.replace(r"\n", "\n").replace(r"\b", "\\")
-                else:
-                    link, target = line.split(" ", maxsplit=1)
-
-                if target:
-                    result[link] = target
-                else:
-                    result[link] = link
+                link, target = _ParseManifestLine(line.rstrip("\n"))
+                result[link] = target
         return result
 
     def _GetRunfilesDir(self) -> str:
@@ -112,6 +243,12 @@ class _DirectoryBased:
         # runfiles strategy on those platforms.
         return posixpath.join(self._runfiles_root, path)
 
+    def RlocationsChecked(self, paths: List[str]) -> List[Optional[str]]:
+        return [posixpath.join(self._runfiles_root, path) for path in paths]
+
+    def ListDirChecked(self, path: str) -> List[str]:
+        return _ListDir(posixpath.join(self._runfiles_root, path))
+
     def EnvVars(self) -> Dict[str, str]:
         return {
             "RUNFILES_DIR": self._runfiles_root,
@@ -127,12 +264,23 @@ class Runfiles:
     Runfiles are data-dependencies of Bazel-built binaries and tests.
     """
 
-    def __init__(self, strategy: Union[_ManifestBased, _DirectoryBased]) -> None:
+    def __init__(
+        self,
+        strategy: Union[_ManifestBased, _DirectoryBased],
+        cache_dir: Optional[str] = None,
+    ) -> None:
         self._strategy = strategy
         self._python_runfiles_root = _FindPythonRunfilesRoot()
-        self._repo_mapping = _ParseRepoMapping(
-            strategy.RlocationChecked("_repo_mapping")
-        )
+        # Maps the code object of a caller to the canonical name of the
+        # repository containing it, see `CurrentRepository`.
+        self._caller_repositories: Dict[types.CodeType, str] = {}
+        repo_mapping_path = strategy.RlocationChecked("_repo_mapping")
+        if cache_dir and repo_mapping_path:
+            self._repo_mapping = _LoadCached(
+                cache_dir, "repo_mapping", repo_mapping_path, _ParseRepoMapping
+            )
+        else:
+            self._repo_mapping = _ParseRepoMapping(repo_mapping_path)
 
     def Rlocation(self, path: str, source_repo: Optional[str] = None) -> Optional[str]:
         """Returns the runtime path of a runfile.
@@ -161,21 +309,7 @@ class Runfiles:
           TypeError: if `path` is not a string
           ValueError: if `path` is None or empty, or it's absolute or not normalized
         """
-        if not path:
-            raise ValueError()
-        if not isinstance(path, str):
-            raise TypeError()
-        if (
-            path.startswith("../")
-            or "/.." in path
-            or path.startswith("./")
-            or "/./" in path
-            or path.endswith("/.")
-            or "//" in path
-        ):
-            raise ValueError('path is not normalized: "%s"' % path)
-        if path[0] == "\\":
-            raise ValueError('path is absolute without a drive letter: "%s"' % path)
+        _CheckRlocationPath(path)
         if os.path.isabs(path):
             return path
 
@@ -185,10 +319,134 @@ class Runfiles:
             # name is not necessary.
             source_repo = self.CurrentRepository(frame=2)
 
+        return self._strategy.RlocationChecked(self._MapPath(path, source_repo))
+
+    def Rlocations(
+        self, paths: Iterable[str], source_repo: Optional[str] = None
+    ) -> List[Optional[str]]:
+        """Returns the runtime paths of many runfiles.
+
+        This is equivalent to calling `Rlocation` for each path, but determines
+        the caller's repository only once and shares manifest lookups between
+        paths in the same directories, which makes it considerably faster for
+        large numbers of paths.
+
+        Args:
+          paths: iterable of strings; runfiles-root-relative paths of the
+            runfiles
+          source_repo: string; optional; see `Rlocation`.
+        Returns:
+          a list with the result of `Rlocation` for each path, in the order of
+          `paths`
+        Raises:
+          TypeError: if any path is not a string
+          ValueError: if any path is None or empty, or it's absolute or not
+            normalized
+        """
+        paths = list(paths)
+        for path in paths:
+            _CheckRlocationPath(path)
+
+        if source_repo is None and self._repo_mapping:
+            source_repo = self.CurrentRepository(frame=2)
+
+        results: List[Optional[str]] = []
+        relative_indexes = []
+        relative_paths = []
+        for path in paths:
+            if os.path.isabs(path):
+                results.append(path)
+            else:
+                relative_indexes.append(len(results))
+                relative_paths.append(self._MapPath(path, source_repo))
+                results.append(None)
+
+        resolved = self._strategy.RlocationsChecked(relative_paths)
+        for index, result in zip(relative_indexes, resolved):
+            results[index] = result
+        return results
+
+    def ListDir(self, path: str, source_repo: Optional[str] = None) -> List[str]:
+        """Returns the names of the entries of a runfiles directory.
+
+        In manifest-based runfiles, directories are inferred from the paths of
+        the runfiles listed in the manifest. Directories that are themselves
+        runfiles are listed from the filesystem.
+
+        Args:
+          path: string; runfiles-root-relative path of the directory
+          source_repo: string; optional; see `Rlocation`.
+        Returns:
+          the sorted names of the entries of the directory, or an empty list if
+          the directory doesn't exist
+        Raises:
+          TypeError: if `path` is not a string
+          ValueError: if `path` is None or empty, or it's absolute or not normalized
+        """
+        _CheckRlocationPath(path)
+        if os.path.isabs(path):
+            return _ListDir(path)
+
+        if source_repo is None and self._repo_mapping:
+            source_repo = self.CurrentRepository(frame=2)
+
+        return self._strategy.ListDirChecked(self._MapPath(path, source_repo))
+
+    def Glob(self, pattern: str, source_repo: Optional[str] = None) -> List[str]:
+        """Returns the runfiles paths that match a glob pattern.
+
+        Each component of `pattern` is matched with `fnmatch`, so wildcards
+        never match across a "/". An apparent repository name in the first
+        component is mapped to its canonical name, as in `Rlocation`, and the
+        returned paths use the canonical name.
+
+        Args:
+          pattern: string; runfiles-root-relative glob pattern, for example
+            "my_workspace/data/*.csv"
+          source_repo: string; optional; see `Rlocation`.
+        Returns:
+          the sorted runfiles-root-relative paths of the matching runfiles,
+          which can be passed to `Rlocation`
+        Raises:
+          TypeError: if `pattern` is not a string
+          ValueError: if `pattern` is None or empty, or it's absolute or not
+            normalized
+        """
+        _CheckRlocationPath(pattern)
+        if os.path.isabs(pattern):
+            raise ValueError('pattern is absolute: "%s"' % pattern)
+
+        if source_repo is None and self._repo_mapping:
+            source_repo = self.CurrentRepository(frame=2)
+
+        segments = self._MapPath(pattern, source_repo).split("/")
+        matches = [""]
+        for i, segment in enumerate(segments):
+            last = i == len(segments) - 1
+            if not last and not _HasWildcard(segment):
+                # Directories are checked for existence when they're listed.
+                matches = [posixpath.join(match, segment) for match in matches]
+                continue
+            next_matches: List[str] = []
+            for match in matches:
+                names = self._strategy.ListDirChecked(match)
+                next_matches.extend(
+                    posixpath.join(match, name)
+                    for name in names
+                    if fnmatch.fnmatchcase(name, segment)
+                )
+            matches = next_matches
+        return sorted(matches)
+
+    def _MapPath(self, path: str, source_repo: Optional[str]) -> str:
+        """Maps the apparent repository name in `path` to its canonical name."""
         # Split off the first path component, which contains the repository
         # name (apparent or canonical).
         target_repo, _, remainder = path.partition("/")
-        if not remainder or (source_repo, target_repo) not in self._repo_mapping:
+        target_canonical = None
+        if remainder and source_repo is not None:
+            target_canonical = self._repo_mapping.get((source_repo, target_repo))
+        if target_canonical is None:
             # One of the following is the case:
             # - not using Bzlmod, so the repository mapping is empty and
             #   apparent and canonical repository names are the same
@@ -196,17 +454,12 @@ class Runfiles:
             #   have to be mapped.
             # - path did not contain a slash and referred to a root symlink,
             #   which also should not be mapped.
-            return self._strategy.RlocationChecked(path)
-
-        assert (
-            source_repo is not None
-        ), "BUG: if the `source_repo` is None, we should never go past the `if` statement above"
+            return path
 
-        # target_repo is an apparent repository name. Look up the corresponding
-        # canonical repository name with respect to the current repository,
-        # identified by its canonical name.
-        target_canonical = self._repo_mapping[(source_repo, target_repo)]
-        return self._strategy.RlocationChecked(target_canonical + "/" + remainder)
+        # target_repo is an apparent repository name, which the repository
+        # mapping of the current repository (identified by its canonical name)
+        # resolved to target_canonical above.
+        return target_canonical + "/" + remainder
 
     def EnvVars(self) -> Dict[str, str]:
         """Returns environment variables for subprocesses.
@@ -253,9 +506,22 @@ class Runfiles:
         """
         try:
             # pylint: disable-next=protected-access
-            caller_path = inspect.getfile(sys._getframe(frame))
-        except (TypeError, ValueError) as exc:
+            caller_frame = sys._getframe(frame)
+        except ValueError as exc:
+            raise ValueError("failed to determine caller's file path") from exc
+        # Resolving the repository is comparatively expensive and Rlocation
+        # calls this method for every lookup, so remember the result per code
+        # object of the caller.
+        caller_code = caller_frame.f_code
+        repository = self._caller_repositories.get(caller_code)
+        if repository is not None:
+            return repository
+
+        try:
+            caller_path = inspect.getfile(caller_frame)
+        except TypeError as exc:
             raise ValueError("failed to determine caller's file path") from exc
+
         caller_runfiles_path = os.path.relpath(caller_path, self._python_runfiles_root)
         if caller_runfiles_path.startswith(".." + os.path.sep):
             # With Python 3.10 and earlier, sys.path contains the directory
@@ -287,27 +553,39 @@ class Runfiles:
         if caller_runfiles_directory == "_main":
             # The canonical name of the main repository (also known as the
             # workspace) is the empty string.
-            return ""
-        # For all other repositories, the name of the runfiles directory is the
-        # canonical name.
-        return caller_runfiles_directory
+            repository = ""
+        else:
+            # For all other repositories, the name of the runfiles directory is
+            # the canonical name.
+            repository = caller_runfiles_directory
+        self._caller_repositories[caller_code] = repository
+        return repository
 
     # TODO: Update return type to Self when 3.11 is the min version
     # https://peps.python.org/pep-0673/
     @staticmethod
-    def CreateManifestBased(manifest_path: str) -> "Runfiles":
-        return Runfiles(_ManifestBased(manifest_path))
+    def CreateManifestBased(
+        manifest_path: str, lazy: bool = False, cache_dir: Optional[str] = None
+    ) -> "Runfiles":
+        return Runfiles(
+            _ManifestBased(manifest_path, lazy=lazy, cache_dir=cache_dir),
+            cache_dir=cache_dir,
+        )
 
     # TODO: Update return type to Self when 3.11 is the min version
     # https://peps.python.org/pep-0673/
     @staticmethod
-    def CreateDirectoryBased(runfiles_dir_path: str) -> "Runfiles":
-        return Runfiles(_DirectoryBased(runfiles_dir_path))
+    def CreateDirectoryBased(
+        runfiles_dir_path: str, cache_dir: Optional[str] = None
+    ) -> "Runfiles":
+        return Runfiles(_DirectoryBased(runfiles_dir_path), cache_dir=cache_dir)
 
     # TODO: Update return type to Self when 3.11 is the min version
     # https://peps.python.org/pep-0673/
     @staticmethod
-    def Create(env: Optional[Dict[str, str]] = None) -> Optional["Runfiles"]:
+    def Create(
+        env: Optional[Dict[str, str]] = None, lazy: bool = False
+    ) -> Optional["Runfiles"]:
         """Returns a new `Runfiles` instance.
 
         The returned object is either:
@@ -316,29 +594,39 @@ class Runfiles:
         path
 
         If `env` contains "RUNFILES_MANIFEST_FILE" with non-empty value, this method
-        returns a manifest-based implementation. The object eagerly reads and caches
-        the whole manifest file upon instantiation; this may be relevant for
-        performance consideration.
+        returns a manifest-based implementation. Unless `lazy` is set, the object
+        eagerly reads and caches the whole manifest file upon instantiation; this
+        may be relevant for performance consideration.
 
         Otherwise, if `env` contains "RUNFILES_DIR" with non-empty value (checked in
         this priority order), this method returns a directory-based implementation.
 
         If neither cases apply, this method returns null.
 
+        If `env` contains "RUNFILES_CACHE_DIR" with non-empty value, the parsed
+        manifest and repository mapping are cached in that directory, keyed by
+        the path, size and modification time of the parsed file, so that other
+        processes using the same runfiles can skip parsing them.
+
         Args:
         env: {string: string}; optional; the map of environment variables. If None,
             this function uses the environment variable map of this process.
+        lazy: bool; optional; if True, a manifest-based implementation
+            memory-maps the manifest and looks up entries on demand instead of
+            reading it upfront. The manifest must be sorted by link path, as
+            written by Bazel.
         Raises:
         IOError: if some IO error occurs.
         """
         env_map = os.environ if env is None else env
+        cache_dir = env_map.get("RUNFILES_CACHE_DIR") or None
         manifest = env_map.get("RUNFILES_MANIFEST_FILE")
         if manifest:
-            return CreateManifestBased(manifest)
+            return CreateManifestBased(manifest, lazy=lazy, cache_dir=cache_dir)
 
         directory = env_map.get("RUNFILES_DIR")
         if directory:
-            return CreateDirectoryBased(directory)
+            return CreateDirectoryBased(directory, cache_dir=cache_dir)
 
         return None
 
@@ -359,6 +647,56 @@ def _FindPythonRunfilesRoot() -> str:
     return root
 
 
+def _ListDir(path: str) -> List[str]:
+    """Returns the sorted entry names of a directory, or [] if there is none."""
+    try:
+        with os.scandir(path) as entries:
+            return sorted(entry.name for entry in entries)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def _HasWildcard(pattern: str) -> bool:
+    return "*" in pattern or "?" in pattern or "[" in pattern
+
+
+def _CheckRlocationPath(path: str) -> None:
+    """Raises if `path` is not a valid argument for `Runfiles.Rlocation`."""
+    if not path:
+        raise ValueError()
+    if not isinstance(path, str):
+        raise TypeError()
+    if (
+        path.startswith("../")
+        or "/.." in path
+        or path.startswith("./")
+        or "/./" in path
+        or path.endswith("/.")
+        or "//" in path
+    ):
+        raise ValueError('path is not normalized: "%s"' % path)
+    if path[0] == "\\":
+        raise ValueError('path is absolute without a drive letter: "%s"' % path)
+
+
+def _ParseManifestLine(line: str) -> Tuple[str, str]:
+    """Parses a runfiles manifest line into a (link, target) pair."""
+    if line.startswith(" "):
+        # In lines that start with a space, spaces, newlines, and backslashes are escaped as \s, \n, and \b in
+        # link and newlines and backslashes are escaped in target.
+        escaped_link, escaped_target = line[1:].split(" ", maxsplit=1)
+        link = (
+            escaped_link.replace(r"\s", " ").replace(r"\n", "\n").replace(r"\b", "\\")
+        )
+        target = escaped_target.replace(r"\n", "\n").replace(r"\b", "\\")
+    else:
+        link, target = line.split(" ", maxsplit=1)
+
+    if not target:
+        target = link
+    return link, target
+
+
 def _ParseRepoMapping(repo_mapping_path: Optional[str]) -> Dict[Tuple[str, str], str]:
     """Parses the repository mapping manifest."""
     # If the repository mapping file can't be found, that is not an error: We
@@ -383,13 +721,75 @@ def _ParseRepoMapping(repo_mapping_path: Optional[str]) -> Dict[Tuple[str, str],
     return repo_mapping
 
 
-def CreateManifestBased(manifest_path: str) -> Runfiles:
-    return Runfiles.CreateManifestBased(manifest_path)
-
-
-def CreateDirectoryBased(runfiles_dir_path: str) -> Runfiles:
-    return Runfiles.CreateDirectoryBased(runfiles_dir_path)
+def _LoadCached(
+    cache_dir: str, kind: str, path: str, loader: Callable[[str], _T]
+) -> _T:
+    """Returns `loader(path)`, reusing a result cached in `cache_dir`.
 
-
-def Create(env: Optional[Dict[str, str]] = None) -> Optional[Runfiles]:
-    return Runfiles.Create(env)
+    There is one cache entry per kind and path of the parsed file, so the cache
+    doesn't grow when the file changes. The entry is a marshal blob that also
+    stores the size, inode and mtime of the file, and the marshal format of the
+    running interpreter. A stale or unreadable entry is ignored and
+    overwritten. Entries are written to a temporary file and renamed into
+    place, so concurrent writers never expose a partial entry to readers.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return loader(path)
+    key: Any = (
+        kind,
+        os.path.abspath(path),
+        stat.st_size,
+        stat.st_ino,
+        stat.st_mtime_ns,
+        sys.implementation.cache_tag,
+        marshal.version,
+    )
+    name = hashlib.sha256(repr(key[:2]).encode("utf-8")).hexdigest()
+    cache_path = os.path.join(cache_dir, name)
+    try:
+        with open(cache_path, "rb") as f:
+            cached_key, value = marshal.load(f)
+        if cached_key == key:
+            return value  # type: ignore[no-any-return]
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    value = loader(path)
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=name + ".")
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump((key, value), f)
+        os.replace(tmp_path, cache_path)
+        tmp_path = None
+    except OSError:
+        # The cache is best-effort; failing to write it must not fail lookups.
+        pass
+    finally:
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return value
+
+
+def CreateManifestBased(
+    manifest_path: str, lazy: bool = False, cache_dir: Optional[str] = None
+) -> Runfiles:
+    return Runfiles.CreateManifestBased(manifest_path, lazy=lazy, cache_dir=cache_dir)
+
+
+def CreateDirectoryBased(
+    runfiles_dir_path: str, cache_dir: Optional[str] = None
+) -> Runfiles:
+    return Runfiles.CreateDirectoryBased(runfiles_dir_path, cache_dir=cache_dir)
+
+
+def Create(
+    env: Optional[Dict[str, str]] = None, lazy: bool = False
+) -> Optional[Runfiles]:
+    return Runfiles.Create(env, lazy=lazy)
@@ -30,6 +30,7 @@ load(
     "CC_TOOLCHAIN",
     "EXEC_TOOLS_TOOLCHAIN",
     "PRECOMPILE",
+    "PRECOMPILE_BATCH_SIZE",
     "PY_TOOLCHAINS",
 )
 
@@ -268,6 +269,36 @@ def _test_precompiler_action_impl(env, target):
         "PYTHONSAFEPATH": "1",
     })
 
+def _test_precompiler_action_batched(name):
+    if not rp_config.enable_pystar:
+        rt_util.skip_test(name = name)
+        return
+    rt_util.helper_target(
+        py_library,
+        name = name + "_subject",
+        srcs = ["batch_a.py", "batch_b.py", "batch_c.py"],
+        precompile = "enabled",
+    )
+    analysis_test(
+        name = name,
+        impl = _test_precompiler_action_batched_impl,
+        target = name + "_subject",
+        config_settings = _COMMON_CONFIG_SETTINGS | {
+            PRECOMPILE_BATCH_SIZE: 0,
+        },
+    )
+
+_tests.append(_test_precompiler_action_batched)
+
+def _test_precompiler_action_batched_impl(env, target):
+    # action_named() fails unless there is exactly one matching action.
+    action = env.expect.that_target(target).action_named("PyCompile")
+    action.inputs().contains_at_least_predicates([
+        matching.file_basename_equals("batch_a.py"),
+        matching.file_basename_equals("batch_b.py"),
+        matching.file_basename_equals("batch_c.py"),
+    ])
+
 def _setup_precompile_flag_pyc_collection_attr_interaction(
         *,
         name,
@@ -24,7 +24,7 @@ load("//python/private:util.bzl", "IS_BAZEL_7_OR_HIGHER")  # buildifier: disable
 load("//tests/base_rules:base_tests.bzl", "create_base_tests")
 load("//tests/base_rules:util.bzl", "WINDOWS_ATTR", pt_util = "util")
 load("//tests/support:py_executable_info_subject.bzl", "PyExecutableInfoSubject")
-load("//tests/support:support.bzl", "CC_TOOLCHAIN", "CROSSTOOL_TOP", "LINUX_X86_64", "WINDOWS_X86_64")
+load("//tests/support:support.bzl", "CC_TOOLCHAIN", "CROSSTOOL_TOP", "LINUX_X86_64", "WINDOWS_X86_64", "ZIP_COMPRESSION")
 
 _tests = []
 
@@ -113,6 +113,76 @@ def _test_basic_zip_impl(env, target):
 
 _tests.append(_test_basic_zip)
 
+def _test_zip_compression_setup(name, config, impl, zip_compression_flag, **kwargs):
+    if rp_config.enable_pystar:
+        target_compatible_with = []
+    else:
+        target_compatible_with = ["@platforms//:incompatible"]
+
+        # The builtin rules don't have the zip_compression attribute.
+        kwargs = {}
+    rt_util.helper_target(
+        config.rule,
+        name = name + "_subject",
+        srcs = ["main.py"],
+        main = "main.py",
+        **kwargs
+    )
+    analysis_test(
+        name = name,
+        impl = impl,
+        target = name + "_subject",
+        config_settings = {
+            "//command_line_option:build_python_zip": "true",
+            "//command_line_option:cpu": "linux_x86_64",
+            "//command_line_option:crosstool_top": CROSSTOOL_TOP,
+            "//command_line_option:extra_toolchains": [CC_TOOLCHAIN],
+            "//command_line_option:platforms": [LINUX_X86_64],
+            ZIP_COMPRESSION: zip_compression_flag,
+        },
+        attr_values = {"target_compatible_with": target_compatible_with},
+    )
+
+def _test_zip_compression_default(name, config):
+    _test_zip_compression_setup(
+        name,
+        config,
+        _test_zip_compression_default_impl,
+        zip_compression_flag = "deflated",
+    )
+
+def _test_zip_compression_default_impl(env, target):
+    action = env.expect.that_target(target).action_named("PythonZipper")
+    action.argv().contains("cC")
+
+_tests.append(_test_zip_compression_default)
+
+def _test_zip_compression_flag_stored(name, config):
+    _test_zip_compression_setup(
+        name,
+        config,
+        _test_zip_compression_stored_impl,
+        zip_compression_flag = "stored",
+    )
+
+def _test_zip_compression_stored_impl(env, target):
+    action = env.expect.that_target(target).action_named("PythonZipper")
+    action.argv().contains("c")
+    action.argv().not_contains("cC")
+
+_tests.append(_test_zip_compression_flag_stored)
+
+def _test_zip_compression_attr_overrides_flag(name, config):
+    _test_zip_compression_setup(
+        name,
+        config,
+        _test_zip_compression_stored_impl,
+        zip_compression_flag = "deflated",
+        zip_compression = "stored",
+    )
+
+_tests.append(_test_zip_compression_attr_overrides_flag)
+
 def _test_executable_in_runfiles(name, config):
     rt_util.helper_target(
         config.rule,
@@ -21,5 +21,9 @@ print(
 )
 print("PYTHONSAFEPATH:", os.environ.get("PYTHONSAFEPATH", "UNSET") or "EMPTY")
 print("sys.flags.safe_path:", sys.flags.safe_path)
+print(
+    "RULES_PYTHON_BOOTSTRAP_PROFILE:",
+    os.environ.get("RULES_PYTHON_BOOTSTRAP_PROFILE", "UNSET"),
+)
 print("file:", __file__)
 print("sys.executable:", sys.executable)
@@ -0,0 +1,86 @@
+# Copyright 2025 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# --- begin runfiles.bash initialization v3 ---
+# Copy-pasted from the Bazel Bash runfiles library v3.
+set -uo pipefail; set +e; f=bazel_tools/tools/bash/runfiles/runfiles.bash
+source "${RUNFILES_DIR:-/dev/null}/$f" 2>/dev/null || \
+  source "$(grep -sm1 "^$f " "${RUNFILES_MANIFEST_FILE:-/dev/null}" | cut -f2- -d' ')" 2>/dev/null || \
+  source "$0.runfiles/$f" 2>/dev/null || \
+  source "$(grep -sm1 "^$f " "$0.runfiles_manifest" | cut -f2- -d' ')" 2>/dev/null || \
+  source "$(grep -sm1 "^$f " "$0.exe.runfiles_manifest" | cut -f2- -d' ')" 2>/dev/null || \
+  { echo>&2 "ERROR: cannot find $f"; exit 1; }; f=; set -e
+# --- end runfiles.bash initialization v3 ---
+set +e
+
+bin=$(rlocation $BIN_RLOCATION)
+if [[ -z "$bin" ]]; then
+  echo "Unable to locate test binary: $BIN_RLOCATION"
+  exit 1
+fi
+
+function expect_match() {
+  local expected_pattern=$1
+  local actual=$2
+  if ! (echo "$actual" | grep "$expected_pattern" ) >/dev/null; then
+    echo "expected to match: $expected_pattern"
+    echo "===== actual START ====="
+    echo "$actual"
+    echo "===== actual END ====="
+    echo
+    touch EXPECTATION_FAILED
+    return 1
+  fi
+}
+
+function expect_no_match() {
+  local unexpected_pattern=$1
+  local actual=$2
+  if (echo "$actual" | grep "$unexpected_pattern" ) >/dev/null; then
+    echo "expected not to match: $unexpected_pattern"
+    echo "===== actual START ====="
+    echo "$actual"
+    echo "===== actual END ====="
+    echo
+    touch EXPECTATION_FAILED
+    return 1
+  fi
+}
+
+profile="$TEST_TMPDIR/profile.json"
+
+echo "Check the phases of all stages are recorded"
+actual=$(RULES_PYTHON_BOOTSTRAP_PROFILE=$profile $bin 2>&1)
+expect_match "Hello" "$actual"
+# Programs run by the binary aren't profiled into the same trace.
+expect_match "RULES_PYTHON_BOOTSTRAP_PROFILE: UNSET" "$actual"
+trace=$(cat "$profile")
+expect_match '^\[$' "$trace"
+expect_match '^\]$' "$trace"
+# Stage 1 is only profiled by Bash 5 and later.
+if (( BASH_VERSINFO[0] >= 5 )); then
+  expect_match '"name": "stage1", "cat": "bootstrap", "ph": "X"' "$trace"
+fi
+expect_match '"name": "site_init", "cat": "bootstrap", "ph": "X"' "$trace"
+expect_match '"name": "stage2", "cat": "bootstrap", "ph": "X"' "$trace"
+expect_match '"name": "main", "cat": "bootstrap", "ph": "X"' "$trace"
+expect_no_match '"cat": "import"' "$trace"
+
+echo "Check imports are recorded when requested"
+actual=$(RULES_PYTHON_BOOTSTRAP_PROFILE=$profile RULES_PYTHON_BOOTSTRAP_PROFILE_IMPORTS=1 $bin 2>&1)
+expect_match "Hello" "$actual"
+expect_match '"cat": "import"' "$(cat "$profile")"
+
+# Exit if any of the expects failed
+[[ ! -e EXPECTATION_FAILED ]]
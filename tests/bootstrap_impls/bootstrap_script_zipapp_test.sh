@@ -44,4 +44,13 @@ if ! (echo "$actual" | grep "$expected_pattern" ) >/dev/null; then
   exit 1
 fi
 
+# Importing the pure Python files from the zip in place should work the same.
+actual=$(RULES_PYTHON_ZIP_IMPORT=1 python3 $bin)
+if ! (echo "$actual" | grep "$expected_pattern" ) >/dev/null; then
+  echo "Test case failed: RULES_PYTHON_ZIP_IMPORT=1"
+  echo "expected output to match: $expected_pattern"
+  echo "but got:\n$actual"
+  exit 1
+fi
+
 exit 0
@@ -42,3 +42,26 @@ if ! (echo "$actual" | grep "$expected_pattern" ) >/dev/null; then
   exit 1
 fi
 
+# Now test that extracting into a reusable location works, both when the zip
+# is first extracted and when the extracted files are reused.
+extract_root=$(mktemp -d)
+for run in first second; do
+  actual=$(RULES_PYTHON_EXTRACT_ROOT=$extract_root $bin)
+  expected_pattern="RULES_PYTHON_ZIP_DIR:$extract_root/zipapps/\|file:$extract_root/zipapps/"
+  if ! (echo "$actual" | grep "$expected_pattern" ) >/dev/null; then
+    echo "expected output of $run run to match: $expected_pattern"
+    echo "but got: $actual"
+    exit 1
+  fi
+done
+
+# The extracted files are kept for later runs, but the lock files aren't.
+if ! compgen -G "$extract_root/zipapps/*/" >/dev/null; then
+  echo "expected the extracted files to be kept in: $extract_root/zipapps"
+  exit 1
+fi
+if compgen -G "$extract_root/zipapps/*.lock" >/dev/null; then
+  echo "expected no lock files to be left in: $extract_root/zipapps"
+  ls -a "$extract_root/zipapps"
+  exit 1
+fi
@@ -0,0 +1,118 @@
+# Copyright 2025 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import importlib.util
+import os
+import pathlib
+import pkgutil
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+
+from python.runfiles import runfiles
+
+
+def _load_site_init():
+    rfiles = runfiles.Create()
+    assert rfiles is not None, "rfiles creation failed"
+    path = rfiles.Rlocation(os.environ["SITE_INIT_TEMPLATE"])
+    spec = importlib.util.spec_from_file_location("site_init_template", path)
+    module = importlib.util.module_from_spec(spec)
+    # Loading the template sets up sys.path for the (unexpanded) imports.
+    sys_path = list(sys.path)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path[:] = sys_path
+    return module
+
+
+class ZipImporterTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.site_init = _load_site_init()
+
+    def setUp(self):
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.runfiles_root = self.tmpdir / "runfiles"
+        self.site_packages = self.runfiles_root / "site-packages"
+
+        zip_path = self.tmpdir / "app.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("runfiles/site-packages/zipped.py", "VALUE = 'zipped'\n")
+            zf.writestr("runfiles/site-packages/pkg/__init__.py", "")
+            zf.writestr("runfiles/site-packages/pkg/mod.py", "VALUE = 'mod'\n")
+            zf.writestr("runfiles/site-packages/pkg/sub/__init__.py", "")
+            zf.writestr("runfiles/site-packages/nopkg/helper.py", "")
+            zf.writestr("runfiles/site-packages/data.txt", "not a module")
+        # Only the directories and the files that aren't Python are extracted.
+        (self.site_packages / "pkg" / "sub").mkdir(parents=True)
+        (self.site_packages / "nopkg").mkdir()
+        (self.site_packages / "data.txt").write_text("not a module")
+        (self.site_packages / "ondisk.py").write_text("VALUE = 'ondisk'\n")
+        (self.site_packages / "pkg" / "data.txt").write_text("data")
+
+        self._save_import_state()
+        self.site_init._RUNFILES_ROOT = str(self.runfiles_root)
+        self.site_init._install_zip_importer(str(zip_path))
+        sys.path.insert(0, str(self.site_packages))
+
+    def _save_import_state(self):
+        sys_path = list(sys.path)
+        path_hooks = list(sys.path_hooks)
+        modules = set(sys.modules)
+
+        def restore():
+            sys.path[:] = sys_path
+            sys.path_hooks[:] = path_hooks
+            sys.path_importer_cache.clear()
+            for name in set(sys.modules) - modules:
+                del sys.modules[name]
+
+        self.addCleanup(restore)
+
+    def test_imports_modules_from_zip_and_disk(self):
+        import ondisk
+        import pkg.mod
+        import zipped
+
+        self.assertEqual(zipped.VALUE, "zipped")
+        self.assertEqual(ondisk.VALUE, "ondisk")
+        self.assertEqual(pkg.mod.VALUE, "mod")
+        self.assertEqual(
+            pathlib.Path(pkg.mod.__file__), self.site_packages / "pkg" / "mod.py"
+        )
+        data = pathlib.Path(pkg.__file__).parent / "data.txt"
+        self.assertEqual(data.read_text(), "data")
+
+    def test_iter_modules(self):
+        modules = pkgutil.iter_modules([str(self.site_packages)])
+        self.assertEqual(
+            sorted((m.name, m.ispkg) for m in modules),
+            [("ondisk", False), ("pkg", True), ("zipped", False)],
+        )
+
+    def test_walk_packages(self):
+        modules = pkgutil.walk_packages([str(self.site_packages)])
+        self.assertEqual(
+            sorted(m.name for m in modules),
+            ["ondisk", "pkg", "pkg.mod", "pkg.sub", "zipped"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
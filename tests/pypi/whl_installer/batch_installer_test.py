@@ -0,0 +1,153 @@
+# Copyright 2025 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import concurrent.futures
+import concurrent.futures.process
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from python.private.pypi.whl_installer import batch_installer
+
+
+class BatchInstallerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.wheel_name = "example_minimal_package-0.0.1-py3-none-any.whl"
+        self.wheel_path = os.path.abspath(
+            os.path.join("examples", "wheel", self.wheel_name)
+        )
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmpdir)
+
+    def _request(self, request_id, repo_dir):
+        return {
+            "requestId": request_id,
+            "arguments": [
+                "--requirement",
+                "example_minimal_package",
+                "--whl-file",
+                self.wheel_path,
+            ],
+            "sandboxDir": repo_dir,
+        }
+
+    def test_extracts_wheel_into_sandbox_dir(self) -> None:
+        response = batch_installer._process_request(self._request(7, self.tmpdir))
+
+        self.assertEqual({"requestId": 7, "exitCode": 0, "output": ""}, response)
+        self.assertEqual(
+            ["metadata.json", "site-packages"], sorted(os.listdir(self.tmpdir))
+        )
+
+    def test_reports_invalid_arguments(self) -> None:
+        response = batch_installer._process_request(
+            {"requestId": 1, "arguments": ["--whl-file", self.wheel_path]}
+        )
+
+        self.assertEqual(2, response["exitCode"])
+        self.assertIn("--requirement", response["output"])
+
+    def test_reports_extraction_errors(self) -> None:
+        request = self._request(1, self.tmpdir)
+        request["arguments"][-1] = os.path.join(self.tmpdir, "missing.whl")
+
+        response = batch_installer._process_request(request)
+
+        self.assertEqual(1, response["exitCode"])
+        self.assertIn("missing.whl", response["output"])
+
+    def test_run_answers_every_request(self) -> None:
+        repo_dirs = [os.path.join(self.tmpdir, str(i)) for i in range(3)]
+        instream = io.StringIO(
+            "".join(
+                json.dumps(self._request(i, repo_dir)) + "\n"
+                for i, repo_dir in enumerate(repo_dirs)
+            )
+        )
+        outstream = io.StringIO()
+
+        batch_installer.BatchInstaller(instream, outstream, jobs=2).run()
+
+        responses = [json.loads(line) for line in outstream.getvalue().splitlines()]
+        self.assertEqual(
+            [0, 1, 2], sorted(response["requestId"] for response in responses)
+        )
+        self.assertEqual([0, 0, 0], [response["exitCode"] for response in responses])
+        for repo_dir in repo_dirs:
+            self.assertTrue(os.path.exists(os.path.join(repo_dir, "metadata.json")))
+
+
+class _BreakingExecutor(concurrent.futures.ThreadPoolExecutor):
+    """Fails the requests in flight like a pool whose process died."""
+
+    def __init__(self, broken_requests):
+        super().__init__(1)
+        self._broken_requests = broken_requests
+
+    def submit(self, fn, request):
+        if self._broken_requests:
+            self._broken_requests -= 1
+            future = concurrent.futures.Future()
+            future.set_exception(
+                concurrent.futures.process.BrokenProcessPool("a process died")
+            )
+            return future
+        return super().submit(fn, request)
+
+
+class BatchInstallerBrokenPoolTest(unittest.TestCase):
+    def _run(self, *executors):
+        instream = io.StringIO(
+            "".join(
+                json.dumps({"requestId": i, "arguments": []}) + "\n" for i in range(3)
+            )
+        )
+        outstream = io.StringIO()
+        installer = batch_installer.BatchInstaller(instream, outstream, jobs=1)
+        with mock.patch.object(
+            installer, "_create_executor", side_effect=executors
+        ), mock.patch.object(
+            batch_installer,
+            "_process_request",
+            side_effect=lambda request: {
+                "requestId": request["requestId"],
+                "exitCode": 0,
+                "output": "",
+            },
+        ):
+            installer.run()
+        responses = [json.loads(line) for line in outstream.getvalue().splitlines()]
+        return {response["requestId"]: response["exitCode"] for response in responses}
+
+    def test_requests_are_retried_in_a_new_pool(self) -> None:
+        self.assertEqual(
+            {0: 0, 1: 0, 2: 0},
+            self._run(_BreakingExecutor(2), _BreakingExecutor(0)),
+        )
+
+    def test_requests_are_only_retried_once(self) -> None:
+        self.assertEqual(
+            {0: 3, 1: 0, 2: 0},
+            self._run(_BreakingExecutor(1), _BreakingExecutor(1), _BreakingExecutor(0)),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+# Copyright 2025 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Shared scaffolding for the whl_installer benchmarks."""
+
+import argparse
+import timeit
+from typing import Callable
+
+
+def argument_parser(doc: str, repeat: int) -> argparse.ArgumentParser:
+    """Returns a parser described by the first line of doc, with --repeat."""
+    parser = argparse.ArgumentParser(description=doc.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=repeat)
+    return parser
+
+
+def run(func: Callable[[], object], repeat: int) -> str:
+    """Calls func repeat times and returns its best and mean times."""
+    times = timeit.repeat(func, number=1, repeat=repeat)
+    return "best {:.3f}s, mean {:.3f}s".format(min(times), sum(times) / len(times))
@@ -0,0 +1,91 @@
+# Copyright 2025 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks resolving dependencies from a large synthetic METADATA.
+
+The requirements mimic packages like apache-airflow, which have hundreds of
+`Requires-Dist` lines conditional on extras, platforms and Python versions.
+
+Usage:
+    bazel run //tests/pypi/whl_installer:deps_benchmark -- --requirements=500
+"""
+
+from python.private.pypi.whl_installer import wheel
+from python.private.pypi.whl_installer.platform import Platform
+from tests.pypi.whl_installer import benchmark
+
+_MARKERS = [
+    "",
+    "; sys_platform == 'linux'",
+    "; sys_platform == 'darwin' and platform_machine == 'arm64'",
+    "; os_name == 'nt'",
+    "; python_version >= '3.10'",
+    "; python_version < '3.11' and platform_system == 'Linux'",
+    "; extra == 'extra{extra}'",
+    "; extra == 'extra{extra}' and python_version >= '3.11'",
+    "; (sys_platform == 'linux' or sys_platform == 'darwin') and extra == 'extra{extra}'",
+]
+
+
+def _requires_dist(num_requirements: int, num_extras: int):
+    return [
+        "dep{}>=1.0{}".format(
+            i, _MARKERS[i % len(_MARKERS)].format(extra=i % num_extras)
+        )
+        for i in range(num_requirements)
+    ]
+
+
+def main() -> None:
+    parser = benchmark.argument_parser(__doc__, repeat=5)
+    parser.add_argument("--requirements", type=int, default=500)
+    parser.add_argument("--extras", type=int, default=10)
+    args = parser.parse_args()
+
+    requires_dist = _requires_dist(args.requirements, args.extras)
+    # 12 target platforms: 4 os/arch pairs for 3 Python versions.
+    platforms = Platform.from_string(
+        [
+            "cp{}_{}".format(version, plat)
+            for version in ("310", "311", "312")
+            for plat in (
+                "linux_x86_64",
+                "linux_aarch64",
+                "osx_aarch64",
+                "windows_x86_64",
+            )
+        ]
+    )
+    extras = {"extra{}".format(i) for i in range(args.extras)}
+
+    def build():
+        wheel.Deps(
+            "benchmark",
+            requires_dist=requires_dist,
+            extras=extras,
+            platforms=platforms,
+        ).build()
+
+    print(
+        "{} requirements, {} platforms, {} extras: {}".format(
+            len(requires_dist),
+            len(platforms),
+            len(extras),
+            benchmark.run(build, args.repeat),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Copyright 2025 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks namespace package detection on a synthetic extracted wheel.
+
+The tree mimics large namespace distributions such as the google-cloud-*
+family: a few levels of namespace packages above many standard packages.
+
+Usage:
+    bazel run //tests/pypi/whl_installer:namespace_pkgs_benchmark -- --files=100000
+"""
+
+import os
+import shutil
+import tempfile
+
+from python.private.pypi.whl_installer import namespace_pkgs
+from tests.pypi.whl_installer import benchmark
+
+
+def _make_tree(root: str, num_files: int, files_per_dir: int, depth: int) -> None:
+    """Creates num_files files, files_per_dir per directory, nested depth deep."""
+    os.makedirs(os.path.join(root, "bin"))
+    for i in range(0, num_files, files_per_dir):
+        pkg = i // files_per_dir
+        parts = ["ns%d" % (pkg % 3)] + [
+            "sub%d" % ((pkg // 3**level) % 4) for level in range(1, depth)
+        ]
+        dirpath = os.path.join(root, *parts, "pkg%d" % pkg)
+        os.makedirs(dirpath)
+        for j in range(min(files_per_dir, num_files - i)):
+            # Make every other package a standard one.
+            name = "__init__.py" if j == 0 and pkg % 2 else "module%d.py" % j
+            open(os.path.join(dirpath, name), "w").close()
+
+
+def main() -> None:
+    parser = benchmark.argument_parser(__doc__, repeat=5)
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--files_per_dir", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=4)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        _make_tree(root, args.files, args.files_per_dir, args.depth)
+
+        def detect():
+            return namespace_pkgs.implicit_namespace_packages(
+                root, ignored_dirnames=["%s/bin" % root]
+            )
+
+        found = detect()
+        timings = benchmark.run(detect, args.repeat)
+    finally:
+        shutil.rmtree(root)
+
+    print("{} files, {} namespace packages: {}".format(args.files, len(found), timings))
+
+
+if __name__ == "__main__":
+    main()
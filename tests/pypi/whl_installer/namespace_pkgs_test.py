@@ -155,6 +155,18 @@ class TestImplicitNamespacePackages(unittest.TestCase):
         actual = namespace_pkgs.implicit_namespace_packages(directory.root())
         self.assertPathsEqual(actual, expected)
 
+    def test_namespace_pkgs_nested_in_standard_pkg(self):
+        directory = TempDir()
+        directory.add_file("foo/__init__.py")
+        directory.add_file("foo/bar/baz/my_module.py")
+
+        expected = {
+            directory.root() + "/foo/bar",
+            directory.root() + "/foo/bar/baz",
+        }
+        actual = namespace_pkgs.implicit_namespace_packages(directory.root())
+        self.assertPathsEqual(actual, expected)
+
     def test_recognized_all_nonstandard_module_types(self):
         directory = TempDir()
         directory.add_file("ayy/my_module.pyc")
@@ -187,6 +199,21 @@ class TestImplicitNamespacePackages(unittest.TestCase):
         )
         self.assertPathsEqual(actual, expected)
 
+    def test_skips_children_of_ignored_directories(self):
+        directory = TempDir()
+        directory.add_file("bin/__init__.py")
+        directory.add_file("bin/foo/my_module.py")
+        directory.add_file("baz/another_module.py")
+
+        expected = {
+            directory.root() + "/baz",
+        }
+        actual = namespace_pkgs.implicit_namespace_packages(
+            directory.root(),
+            ignored_dirnames=[directory.root() + "/bin/"],
+        )
+        self.assertPathsEqual(actual, expected)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,103 @@
+# Copyright 2025 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compares extracting wheels with and without `installer.install`.
+
+Pass real wheels, e.g. a botocore wheel downloaded with `pip download`, or
+leave them out to use a synthetic pure-Python wheel.
+
+Usage:
+    bazel run //tests/pypi/whl_installer:unzip_benchmark -- [WHEEL...]
+"""
+
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+
+from python.private.pypi.whl_installer import wheel
+from tests.pypi.whl_installer import benchmark
+
+
+def _make_wheel(directory: str, num_files: int) -> str:
+    """Writes a pure-Python wheel with num_files modules."""
+    path = os.path.join(directory, "synthetic-1.0-py3-none-any.whl")
+    files = {
+        "synthetic/pkg%d/module%d.py" % (i // 50, i): b"x = %d\n" % i * 200
+        for i in range(num_files)
+    }
+    files[
+        "synthetic-1.0.dist-info/WHEEL"
+    ] = b"Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n"
+    files[
+        "synthetic-1.0.dist-info/METADATA"
+    ] = b"Metadata-Version: 2.1\nName: synthetic\nVersion: 1.0\n"
+    record = []
+    for name, contents in files.items():
+        digest = base64.urlsafe_b64encode(hashlib.sha256(contents).digest())
+        record.append(
+            "{},sha256={},{}".format(name, digest.decode().rstrip("="), len(contents))
+        )
+    record.append("synthetic-1.0.dist-info/RECORD,,")
+    files["synthetic-1.0.dist-info/RECORD"] = "\n".join(record).encode()
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, contents in files.items():
+            zf.writestr(name, contents)
+    return path
+
+
+def _time_unzip(wheel_path: str, repeat: int, use_installer: bool) -> str:
+    def unzip():
+        directory = tempfile.mkdtemp()
+        try:
+            if use_installer:
+                with mock.patch.object(
+                    wheel, "_install_root_files", return_value=False
+                ):
+                    wheel.Wheel(wheel_path).unzip(directory)
+            else:
+                wheel.Wheel(wheel_path).unzip(directory)
+        finally:
+            shutil.rmtree(directory)
+
+    return benchmark.run(unzip, repeat)
+
+
+def main() -> None:
+    parser = benchmark.argument_parser(__doc__, repeat=3)
+    parser.add_argument("wheels", nargs="*")
+    parser.add_argument("--files", type=int, default=5000)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        wheels = args.wheels or [_make_wheel(tmpdir, args.files)]
+        for wheel_path in wheels:
+            print(
+                "{}: installer {}; fast path {}".format(
+                    os.path.basename(wheel_path),
+                    _time_unzip(wheel_path, args.repeat, use_installer=True),
+                    _time_unzip(wheel_path, args.repeat, use_installer=False),
+                )
+            )
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
+import base64
+import hashlib
+import os
+import stat
+import tempfile
 import unittest
+import zipfile
 from unittest import mock
 
+import installer
+
 from python.private.pypi.whl_installer import wheel
 from python.private.pypi.whl_installer.platform import OS, Arch, Platform
 
@@ -366,6 +374,193 @@ class DepsTest(unittest.TestCase):
         self.assertEqual(["bar"], got.deps)
         self.assertEqual({}, got.deps_select)
 
+    def test_marker_evaluation_is_memoized(self):
+        platforms = {
+            Platform(os=OS.linux, arch=Arch.x86_64),
+            Platform(os=OS.windows, arch=Arch.x86_64),
+        }
+        with mock.patch.object(
+            Platform, "env_markers", autospec=True, side_effect=Platform.env_markers
+        ) as mock_env_markers:
+            deps = wheel.Deps(
+                "foo",
+                requires_dist=[
+                    "bar; sys_platform=='linux'",
+                    "baz; sys_platform=='linux'",
+                    "qux; sys_platform=='linux' and extra=='ex'",
+                ],
+                extras={"ex"},
+                platforms=platforms,
+            )
+            got = deps.build()
+
+        self.assertEqual(
+            {"@platforms//os:linux": ["bar", "baz", "qux"]}, got.deps_select
+        )
+        # Once per platform and extra, not once per requirement.
+        self.assertEqual(2, mock_env_markers.call_count)
+
+
+class WheelTest(unittest.TestCase):
+    def setUp(self):
+        self.wheel_path = os.path.join(
+            "examples", "wheel", "example_minimal_package-0.0.1-py3-none-any.whl"
+        )
+
+    def test_reads_wheel_once_when_used_as_context_manager(self):
+        with mock.patch.object(
+            wheel.zipfile, "ZipFile", wraps=zipfile.ZipFile
+        ) as mock_open:
+            with wheel.Wheel(self.wheel_path) as whl:
+                with tempfile.TemporaryDirectory() as directory:
+                    whl.unzip(directory)
+                self.assertEqual("example-minimal-package", whl.name)
+                self.assertEqual("0.0.1", whl.version)
+                self.assertEqual({}, whl.entry_points())
+                whl.dependencies()
+
+        mock_open.assert_called_once()
+
+    def test_parses_metadata_once(self):
+        whl = wheel.Wheel(self.wheel_path)
+        with mock.patch.object(
+            installer.utils,
+            "parse_metadata_file",
+            wraps=installer.utils.parse_metadata_file,
+        ) as mock_parse:
+            self.assertEqual("example-minimal-package", whl.name)
+            self.assertEqual("0.0.1", whl.version)
+
+        mock_parse.assert_called_once()
+
+
+def _write_wheel(path, files, record_overrides=None):
+    """Writes a wheel for "pkg 1.0" with the given {name: (contents, mode)}.
+
+    record_overrides maps file names to RECORD lines to use instead of the
+    generated ones, or to None to leave them out of RECORD.
+    """
+    files = dict(files)
+    files["pkg-1.0.dist-info/WHEEL"] = (
+        b"Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+        0o644,
+    )
+    files["pkg-1.0.dist-info/METADATA"] = (
+        b"Metadata-Version: 2.1\nName: pkg\nVersion: 1.0\n",
+        0o644,
+    )
+    record = {}
+    for name, (contents, _) in files.items():
+        digest = base64.urlsafe_b64encode(hashlib.sha256(contents).digest())
+        record[name] = "{},sha256={},{}".format(
+            name, digest.decode().rstrip("="), len(contents)
+        )
+    record.update(record_overrides or {})
+    record["pkg-1.0.dist-info/RECORD"] = "pkg-1.0.dist-info/RECORD,,"
+    files["pkg-1.0.dist-info/RECORD"] = (
+        "\n".join(line for line in record.values() if line is not None).encode(),
+        0o644,
+    )
+
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, (contents, mode) in files.items():
+            zinfo = zipfile.ZipInfo(name)
+            zinfo.external_attr = (stat.S_IFREG | mode) << 16
+            zf.writestr(zinfo, contents)
+
+
+def _read_tree(directory):
+    tree = {}
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            with open(path, "rb") as f:
+                tree[os.path.relpath(path, directory)] = (
+                    f.read(),
+                    stat.S_IMODE(os.stat(path).st_mode),
+                )
+    return tree
+
+
+class WheelUnzipTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.wheel_path = os.path.join(self.tmpdir.name, "pkg-1.0-py3-none-any.whl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _unzip(self, use_installer):
+        directory = os.path.join(
+            self.tmpdir.name, "installer" if use_installer else "fast"
+        )
+        if use_installer:
+            with mock.patch.object(wheel, "_install_root_files", return_value=False):
+                wheel.Wheel(self.wheel_path).unzip(directory)
+        else:
+            wheel.Wheel(self.wheel_path).unzip(directory)
+        return _read_tree(directory)
+
+    def test_fast_path_matches_installer(self):
+        _write_wheel(
+            self.wheel_path,
+            {
+                "pkg/__init__.py": (b"", 0o644),
+                "pkg/sub/module.py": (b"x = 1\n" * 1000, 0o644),
+                "pkg/tool.sh": (b"#!/bin/sh\n", 0o755),
+                "pkg-1.0.dist-info/entry_points.txt": (
+                    b"[console_scripts]\npkg = pkg.sub.module:main\n",
+                    0o644,
+                ),
+            },
+        )
+
+        got = self._unzip(use_installer=False)
+
+        self.assertIn(os.path.join("site-packages", "pkg", "sub", "module.py"), got)
+        self.assertIn(os.path.join("bin", "pkg"), got)
+        self.assertEqual(self._unzip(use_installer=True), got)
+
+    def test_data_files_use_installer(self):
+        _write_wheel(
+            self.wheel_path,
+            {
+                "pkg/__init__.py": (b"", 0o644),
+                "pkg-1.0.data/scripts/tool": (b"#!python\n", 0o755),
+            },
+        )
+
+        got = self._unzip(use_installer=False)
+
+        self.assertIn(os.path.join("bin", "tool"), got)
+        self.assertEqual(self._unzip(use_installer=True), got)
+
+    def test_fast_path_checks_record(self):
+        _write_wheel(
+            self.wheel_path,
+            {"pkg/__init__.py": (b"x = 1\n", 0o644)},
+            record_overrides={"pkg/__init__.py": "pkg/__init__.py,sha256=bad,6"},
+        )
+
+        with self.assertRaises(ValueError):
+            self._unzip(use_installer=False)
+
+    def test_fast_path_warns_about_files_missing_from_record(self):
+        _write_wheel(
+            self.wheel_path,
+            {
+                "pkg/__init__.py": (b"", 0o644),
+                "pkg/extra.py": (b"x = 1\n", 0o644),
+            },
+            record_overrides={"pkg/extra.py": None},
+        )
+
+        with self.assertWarnsRegex(RuntimeWarning, "pkg/extra.py .* not mentioned"):
+            got = self._unzip(use_installer=False)
+
+        self.assertIn(os.path.join("site-packages", "pkg", "extra.py"), got)
+        self.assertEqual(self._unzip(use_installer=True), got)
+
 
 if __name__ == "__main__":
     unittest.main()
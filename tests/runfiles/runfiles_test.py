@@ -16,6 +16,7 @@ import os
 import tempfile
 import unittest
 from typing import Any, List, Optional
+from unittest import mock
 
 from python.runfiles import runfiles
 
@@ -217,6 +218,189 @@ class RunfilesTest(unittest.TestCase):
             else:
                 self.assertEqual(r.Rlocation("/foo"), "/foo")
 
+    def testLazyManifestBasedRlocation(self) -> None:
+        with _MockFile(
+            contents=[
+                " Foo\\sBar\\bDir\\nNewline/runfile5 F:\\bActual Path\\bwith\\nnewline/runfile5",
+                "Foo/Bar/Dir E:\\Actual Path\\Directory",
+                "Foo/Bar/runfile3 D:\\the path\\run file 3.txt",
+                "Foo/runfile1 ",
+                "Foo/runfile2 C:/Actual Path\\runfile2",
+            ]
+        ) as mf:
+            r = runfiles.CreateManifestBased(mf.Path(), lazy=True)
+            self.assertEqual(r.Rlocation("Foo/runfile1"), "Foo/runfile1")
+            self.assertEqual(r.Rlocation("Foo/runfile2"), "C:/Actual Path\\runfile2")
+            self.assertEqual(
+                r.Rlocation("Foo/Bar/runfile3"), "D:\\the path\\run file 3.txt"
+            )
+            self.assertEqual(
+                r.Rlocation("Foo/Bar/Dir/Deeply/Nested/runfile4"),
+                "E:\\Actual Path\\Directory/Deeply/Nested/runfile4",
+            )
+            self.assertEqual(
+                r.Rlocation("Foo Bar\\Dir\nNewline/runfile5"),
+                "F:\\Actual Path\\with\nnewline/runfile5",
+            )
+            self.assertIsNone(r.Rlocation("Foo"))
+            self.assertIsNone(r.Rlocation("Foo/runfile0"))
+            self.assertIsNone(r.Rlocation("Goo/runfile1"))
+            self.assertIsNone(r.Rlocation("unknown"))
+
+    def testLazyManifestBasedRlocationEmptyManifest(self) -> None:
+        with _MockFile() as mf:
+            r = runfiles.CreateManifestBased(mf.Path(), lazy=True)
+            self.assertIsNone(r.Rlocation("foo"))
+
+    def testManifestBasedRlocations(self) -> None:
+        with _MockFile(
+            contents=[
+                "Foo/runfile1 C:/Actual Path\\runfile1",
+                "Foo/Bar/Dir E:\\Actual Path\\Directory",
+                "protobuf~3.19.2/foo/runfile C:/Actual Path\\protobuf\\runfile",
+            ]
+        ) as mf:
+            r = runfiles.CreateManifestBased(mf.Path())
+            self.assertEqual(
+                r.Rlocations(
+                    [
+                        "Foo/runfile1",
+                        "Foo/Bar/Dir/a",
+                        "Foo/Bar/Dir/b/c",
+                        "unknown",
+                        "protobuf~3.19.2/foo/runfile",
+                    ]
+                ),
+                [
+                    "C:/Actual Path\\runfile1",
+                    "E:\\Actual Path\\Directory/a",
+                    "E:\\Actual Path\\Directory/b/c",
+                    None,
+                    "C:/Actual Path\\protobuf\\runfile",
+                ],
+            )
+            self.assertEqual(r.Rlocations([]), [])
+            self.assertRaisesRegex(
+                ValueError,
+                "is not normalized",
+                lambda: r.Rlocations(["Foo/runfile1", "../foo"]),
+            )
+
+    def testRlocationsWithRepoMapping(self) -> None:
+        with _MockFile(
+            contents=[
+                ",my_module,_main",
+                ",my_protobuf,protobuf~3.19.2",
+            ]
+        ) as rm, _MockFile(
+            contents=[
+                "_repo_mapping " + rm.Path(),
+                "_main/bar/runfile /the/path/to/runfile",
+                "protobuf~3.19.2/bar/dir E:\\Actual Path\\Directory",
+            ],
+        ) as mf:
+            r = runfiles.CreateManifestBased(mf.Path())
+            paths = ["my_module/bar/runfile", "my_protobuf/bar/dir/file", "/abs"]
+            self.assertEqual(
+                r.Rlocations(paths, ""),
+                [r.Rlocation(path, "") for path in paths],
+            )
+
+    def testManifestBasedListDirAndGlob(self) -> None:
+        tree = tempfile.mkdtemp(dir=os.environ.get("TEST_TMPDIR"))
+        os.makedirs(os.path.join(tree, "sub"))
+        for name in ["x.txt", "sub/y.txt"]:
+            with open(os.path.join(tree, name), "w", encoding="utf-8"):
+                pass
+        with _MockFile(
+            contents=[
+                # Sorted by link path, as required by lazy manifests.
+                "_main/data-other/e.csv /e.csv",
+                "_main/data/a.csv /a.csv",
+                "_main/data/b.csv /b.csv",
+                "_main/data/c.txt /c.txt",
+                "_main/data/nested/d.csv /d.csv",
+                "_main/tree " + tree,
+            ]
+        ) as mf:
+            for lazy in [False, True]:
+                r = runfiles.CreateManifestBased(mf.Path(), lazy=lazy)
+                self.assertEqual(
+                    r.ListDir("_main/data"), ["a.csv", "b.csv", "c.txt", "nested"]
+                )
+                self.assertEqual(r.ListDir("_main"), ["data", "data-other", "tree"])
+                self.assertEqual(r.ListDir("_main/tree"), ["sub", "x.txt"])
+                self.assertEqual(r.ListDir("_main/tree/sub"), ["y.txt"])
+                self.assertEqual(r.ListDir("_main/data/a.csv"), [])
+                self.assertEqual(r.ListDir("unknown"), [])
+
+                self.assertEqual(
+                    r.Glob("_main/data/*.csv"),
+                    ["_main/data/a.csv", "_main/data/b.csv"],
+                )
+                self.assertEqual(
+                    r.Glob("_main/*/*.csv"),
+                    [
+                        "_main/data-other/e.csv",
+                        "_main/data/a.csv",
+                        "_main/data/b.csv",
+                    ],
+                )
+                self.assertEqual(r.Glob("_main/tree/*/y.txt"), ["_main/tree/sub/y.txt"])
+                self.assertEqual(r.Glob("_main/data/c.txt"), ["_main/data/c.txt"])
+                self.assertEqual(r.Glob("_main/data/missing.txt"), [])
+                self.assertEqual(r.Glob("unknown/*"), [])
+
+    def testDirectoryBasedListDirAndGlob(self) -> None:
+        root = tempfile.mkdtemp(dir=os.environ.get("TEST_TMPDIR"))
+        os.makedirs(os.path.join(root, "_main", "data", "nested"))
+        for name in ["a.csv", "b.txt", "nested/c.csv"]:
+            with open(os.path.join(root, "_main", "data", name), "w", encoding="utf-8"):
+                pass
+        r = runfiles.CreateDirectoryBased(root)
+        self.assertEqual(r.ListDir("_main/data"), ["a.csv", "b.txt", "nested"])
+        self.assertEqual(r.ListDir("_main/data/a.csv"), [])
+        self.assertEqual(r.ListDir("unknown"), [])
+        self.assertEqual(r.Glob("_main/data/*/*.csv"), ["_main/data/nested/c.csv"])
+        self.assertEqual(
+            r.Glob("_main/data/[ab].*"), ["_main/data/a.csv", "_main/data/b.txt"]
+        )
+
+    def testManifestBasedRlocationWithCache(self) -> None:
+        cache_dir = tempfile.mkdtemp(dir=os.environ.get("TEST_TMPDIR"))
+        with _MockFile(contents=[",my_module,_main"]) as rm, _MockFile(
+            contents=["_repo_mapping " + rm.Path(), "_main/a/b c/d"]
+        ) as mf:
+            r = runfiles.Create(
+                {"RUNFILES_MANIFEST_FILE": mf.Path(), "RUNFILES_CACHE_DIR": cache_dir}
+            )
+            assert r is not None  # mypy doesn't understand the unittest api.
+            self.assertEqual(r.Rlocation("my_module/a/b", ""), "c/d")
+            # One entry for the manifest and one for the repository mapping.
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+            r = runfiles.CreateManifestBased(mf.Path(), cache_dir=cache_dir)
+            self.assertEqual(r.Rlocation("my_module/a/b", ""), "c/d")
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+            # Changing the manifest invalidates the cached entry.
+            with open(mf.Path(), "at", encoding="utf-8", newline="\n") as f:
+                f.write("_main/e/f g/h\n")
+            r = runfiles.CreateManifestBased(mf.Path(), cache_dir=cache_dir)
+            self.assertEqual(r.Rlocation("my_module/e/f", ""), "g/h")
+            # The stale entry is overwritten instead of adding a new one.
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+    def testManifestBasedRlocationIgnoresCorruptCache(self) -> None:
+        cache_dir = tempfile.mkdtemp(dir=os.environ.get("TEST_TMPDIR"))
+        with _MockFile(contents=["a/b c/d"]) as mf:
+            runfiles.CreateManifestBased(mf.Path(), cache_dir=cache_dir)
+            for name in os.listdir(cache_dir):
+                with open(os.path.join(cache_dir, name), "wb") as f:
+                    f.write(b"not marshal data")
+            r = runfiles.CreateManifestBased(mf.Path(), cache_dir=cache_dir)
+            self.assertEqual(r.Rlocation("a/b"), "c/d")
+
     def testManifestBasedRlocationWithRepoMappingFromMain(self) -> None:
         with _MockFile(
             contents=[
@@ -536,6 +720,30 @@ class RunfilesTest(unittest.TestCase):
         assert r is not None  # mypy doesn't understand the unittest api.
         self.assertEqual(r.CurrentRepository(), expected)
 
+    def testCurrentRepositoryIsMemoized(self) -> None:
+        r = runfiles.Create({"RUNFILES_DIR": "whatever"})
+        assert r is not None  # mypy doesn't understand the unittest api.
+        expected = r.CurrentRepository()
+        with mock.patch.object(
+            runfiles.os.path, "relpath", wraps=runfiles.os.path.relpath
+        ) as relpath, mock.patch.object(
+            runfiles.inspect, "getfile", wraps=runfiles.inspect.getfile
+        ) as getfile:
+            for _ in range(1000):
+                self.assertEqual(r.CurrentRepository(), expected)
+            relpath.assert_not_called()
+            getfile.assert_not_called()
+
+    def testRlocationResolvesCallerRepositoryOnce(self) -> None:
+        with _MockFile(name="_repo_mapping", contents=[",my_module,_main"]) as rm:
+            r = runfiles.CreateDirectoryBased(os.path.dirname(rm.Path()))
+            with mock.patch.object(
+                runfiles.os.path, "relpath", wraps=runfiles.os.path.relpath
+            ) as relpath:
+                for i in range(1000):
+                    r.Rlocation("my_module/file%d" % i)
+                self.assertLessEqual(relpath.call_count, 1)
+
     @staticmethod
     def IsWindows() -> bool:
         return os.name == "nt"
@@ -0,0 +1,353 @@
+# Copyright 2025 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import concurrent.futures
+import concurrent.futures.process
+import importlib
+import io
+import json
+import logging
+import os
+import pathlib
+import pstats
+import py_compile
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from tools.precompiler import precompiler
+
+# The precompiler only imports these when it needs them, to keep the startup
+# of non-worker invocations fast.
+_LAZY_MODULES = [
+    "asyncio",
+    "collections",
+    "concurrent",
+    "hashlib",
+    "importlib",
+    "itertools",
+    "json",
+    "logging",
+    "multiprocessing",
+    "os",
+    "threading",
+    "time",
+    "traceback",
+]
+
+
+def setUpModule():
+    for name in _LAZY_MODULES:
+        setattr(precompiler, name, importlib.import_module(name))
+    importlib.import_module("importlib.util")
+    precompiler._logger = logging.getLogger("precompiler")
+
+
+class _FakeWriter:
+    def __init__(self):
+        self.responses = []
+
+    def write(self, data: bytes) -> None:
+        self.responses.append(json.loads(data))
+
+
+class _BrokenExecutor(concurrent.futures.ThreadPoolExecutor):
+    def submit(self, *args, **kwargs):
+        raise concurrent.futures.process.BrokenProcessPool("a process died")
+
+
+class _PrecompilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.addCleanup(setattr, precompiler, "_pyc_cache", None)
+        self.addCleanup(setattr, precompiler, "_metrics", None)
+
+    def _write_src(self, name: str, content: str = "x = 1\n") -> str:
+        path = self.tmpdir / name
+        path.write_text(content)
+        return str(path)
+
+    def _arguments(self, *srcs: str) -> "list[str]":
+        arguments = []
+        for src in srcs:
+            arguments += ["--src", src, "--src_name", os.path.basename(src)]
+            arguments += ["--pyc", src + "c"]
+        return arguments
+
+    def _metrics(self, *args: str) -> "precompiler._WorkerMetrics":
+        options = precompiler._create_parser().parse_args(list(args))
+        precompiler._metrics = precompiler._WorkerMetrics(options)
+        return precompiler._metrics
+
+
+class PycCacheTest(_PrecompilerTestCase):
+    _MODE = py_compile.PycInvalidationMode.CHECKED_HASH
+
+    def _compile(self, cache, src, pyc):
+        key = cache.key(src, "a.py", -1, self._MODE)
+        if not cache.restore(key, pyc):
+            precompiler._compile_one(src, "a.py", pyc, -1, self._MODE)
+            cache.store(key, pyc)
+        return key
+
+    def test_hit_and_miss(self):
+        cache = precompiler._PycCache(10, None)
+        src = self._write_src("a.py")
+        first = str(self.tmpdir / "first.pyc")
+        second = str(self.tmpdir / "out" / "second.pyc")
+
+        self._compile(cache, src, first)
+        self._compile(cache, src, second)
+        self._compile(cache, self._write_src("b.py", "x = 2\n"), first)
+
+        self.assertEqual(
+            cache.stats(), {"hits": 1, "disk_hits": 0, "misses": 2, "entries": 2}
+        )
+        py_compile.compile(
+            src,
+            str(self.tmpdir / "expected.pyc"),
+            dfile="a.py",
+            invalidation_mode=self._MODE,
+        )
+        self.assertEqual(
+            pathlib.Path(second).read_bytes(),
+            (self.tmpdir / "expected.pyc").read_bytes(),
+        )
+
+    def test_key_depends_on_settings(self):
+        cache = precompiler._PycCache(10, None)
+        src = self._write_src("a.py")
+        key = cache.key(src, "a.py", -1, self._MODE)
+
+        self.assertNotEqual(key, cache.key(src, "b.py", -1, self._MODE))
+        self.assertNotEqual(key, cache.key(src, "a.py", 2, self._MODE))
+        self.assertIsNone(
+            cache.key(src, "a.py", -1, py_compile.PycInvalidationMode.TIMESTAMP)
+        )
+
+    def test_evicts_least_recently_used(self):
+        cache = precompiler._PycCache(1, None)
+        pyc = str(self.tmpdir / "a.pyc")
+        self._compile(cache, self._write_src("a.py"), pyc)
+        self._compile(cache, self._write_src("b.py", "x = 2\n"), pyc)
+
+        self._compile(cache, self._write_src("a.py"), pyc)
+
+        self.assertEqual(cache.stats()["misses"], 3)
+        self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_disk_hit(self):
+        cache_dir = str(self.tmpdir / "cache")
+        src = self._write_src("a.py")
+        self._compile(precompiler._PycCache(0, cache_dir), src, src + "c")
+        cache = precompiler._PycCache(10, cache_dir)
+
+        self._compile(cache, src, str(self.tmpdir / "b.pyc"))
+        self._compile(cache, src, str(self.tmpdir / "c.pyc"))
+
+        self.assertEqual(
+            cache.stats(), {"hits": 1, "disk_hits": 1, "misses": 0, "entries": 1}
+        )
+        self.assertEqual(
+            (self.tmpdir / "b.pyc").read_bytes(), pathlib.Path(src + "c").read_bytes()
+        )
+
+    def test_corrupt_disk_entry_is_recompiled(self):
+        cache_dir = str(self.tmpdir / "cache")
+        src = self._write_src("a.py")
+        key = self._compile(precompiler._PycCache(0, cache_dir), src, src + "c")
+        expected = pathlib.Path(src + "c").read_bytes()
+        disk_path = pathlib.Path(cache_dir, key[:2], key + ".pyc")
+        disk_path.write_bytes(expected[:10])
+        cache = precompiler._PycCache(0, cache_dir)
+
+        self._compile(cache, src, str(self.tmpdir / "b.pyc"))
+
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual((self.tmpdir / "b.pyc").read_bytes(), expected)
+        self.assertEqual(disk_path.read_bytes(), expected)
+
+
+class WorkerMetricsTest(_PrecompilerTestCase):
+    _PHASES = ["compile", "parse_args", "queue_wait", "respond"]
+
+    def test_serial_worker_timings(self):
+        stats_file = self.tmpdir / "stats.json"
+        metrics = self._metrics(
+            f"--worker_stats_file={stats_file}", "--worker_stats_interval=0"
+        )
+        src = self._write_src("a.py")
+        request = {"requestId": 1, "arguments": self._arguments(src)}
+        outstream = io.StringIO()
+
+        precompiler._SerialPersistentWorker(
+            io.StringIO(json.dumps(request) + "\n"), outstream
+        ).run()
+
+        self.assertEqual(
+            json.loads(outstream.getvalue()), {"requestId": 1, "exitCode": 0}
+        )
+        stats = json.loads(stats_file.read_text())
+        self.assertEqual(stats, metrics.snapshot())
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["max_in_flight"], 1)
+        self.assertEqual(sorted(stats["phases"]), self._PHASES)
+        for phase in stats["phases"].values():
+            self.assertEqual(phase["count"], 1)
+            self.assertGreaterEqual(phase["total_seconds"], 0)
+
+    def test_async_worker_timings(self):
+        metrics = self._metrics()
+        src = self._write_src("a.py")
+        request = {"requestId": 1, "arguments": self._arguments(src)}
+        worker = precompiler._AsyncPersistentWorker(None, _FakeWriter())
+        received = time.monotonic() - 10
+        timer = metrics.start_request(request, received)
+
+        asyncio.run(worker._process_request(request, timer))
+
+        self.assertEqual(sorted(timer.phases), self._PHASES)
+        # Time since the request was read counts as waiting.
+        self.assertGreaterEqual(timer.phases["queue_wait"], 10)
+        self.assertEqual(metrics.snapshot()["requests"], 1)
+
+    def test_profiles_first_requests(self):
+        profile_file = str(self.tmpdir / "profile")
+        metrics = self._metrics(
+            "--worker_profile_requests=1", f"--worker_profile_file={profile_file}"
+        )
+
+        def compile_request():
+            return 1
+
+        self.assertEqual(metrics.profiled(compile_request), 1)
+        self.assertEqual(metrics.profiled(compile_request), 1)
+
+        self.assertEqual(self._call_count(profile_file, "compile_request"), 1)
+
+    def test_concurrent_requests_are_not_profiled(self):
+        profile_file = str(self.tmpdir / "profile")
+        metrics = self._metrics(
+            "--worker_profile_requests=2", f"--worker_profile_file={profile_file}"
+        )
+
+        def concurrent_request():
+            return 2
+
+        def compile_request():
+            # Starts while this request is being profiled.
+            return metrics.profiled(concurrent_request)
+
+        self.assertEqual(metrics.profiled(compile_request), 2)
+        # The concurrent request didn't count towards the profiled requests.
+        self.assertEqual(metrics.profiled(concurrent_request), 2)
+
+        self.assertEqual(self._call_count(profile_file, "compile_request"), 1)
+        self.assertEqual(self._call_count(profile_file, "concurrent_request"), 2)
+
+    def test_profiler_already_active(self):
+        profile_file = str(self.tmpdir / "profile")
+        metrics = self._metrics(
+            "--worker_profile_requests=2", f"--worker_profile_file={profile_file}"
+        )
+
+        def compile_request():
+            return 3
+
+        with mock.patch(
+            "cProfile.Profile.enable",
+            side_effect=ValueError("Another profiling tool is already active"),
+        ):
+            self.assertEqual(metrics.profiled(compile_request), 3)
+        self.assertFalse(os.path.exists(profile_file))
+
+        self.assertEqual(metrics.profiled(compile_request), 3)
+        self.assertEqual(self._call_count(profile_file, "compile_request"), 1)
+
+    def _call_count(self, profile_file: str, func_name: str) -> int:
+        stats = pstats.Stats(profile_file).stats
+        return sum(
+            calls
+            for (_, _, name), (_, calls, _, _, _) in stats.items()
+            if name == func_name
+        )
+
+
+class ProcessPoolPersistentWorkerTest(_PrecompilerTestCase):
+    def _run_request(self, worker, *srcs):
+        request = {"requestId": 1, "arguments": self._arguments(*srcs)}
+        timer = precompiler._RequestTimer(1, time.monotonic())
+        asyncio.run(worker._process_compile_request(request, timer))
+
+    def test_compile(self):
+        writer = _FakeWriter()
+        worker = precompiler._ProcessPoolPersistentWorker(
+            None, writer, concurrent.futures.ThreadPoolExecutor
+        )
+        self.addCleanup(worker._executor.shutdown)
+        srcs = [self._write_src("a.py"), self._write_src("b.py")]
+
+        self._run_request(worker, *srcs)
+
+        self.assertEqual(writer.responses, [{"requestId": 1, "exitCode": 0}])
+        for src in srcs:
+            self.assertTrue(os.path.exists(src + "c"))
+
+    def test_broken_pool_is_replaced(self):
+        executors = [_BrokenExecutor(), concurrent.futures.ThreadPoolExecutor()]
+        for executor in executors:
+            self.addCleanup(executor.shutdown)
+        writer = _FakeWriter()
+        worker = precompiler._ProcessPoolPersistentWorker(
+            None, writer, iter(executors).__next__
+        )
+        srcs = [self._write_src("a.py"), self._write_src("b.py")]
+
+        self._run_request(worker, *srcs)
+
+        self.assertIs(worker._executor, executors[1])
+        self.assertEqual(writer.responses, [{"requestId": 1, "exitCode": 0}])
+        for src in srcs:
+            self.assertTrue(os.path.exists(src + "c"))
+
+    def test_cache_hits_are_not_sent_to_the_pool(self):
+        precompiler._pyc_cache = precompiler._PycCache(10, None)
+        executor = concurrent.futures.ThreadPoolExecutor()
+        self.addCleanup(executor.shutdown)
+        worker = precompiler._ProcessPoolPersistentWorker(
+            None, _FakeWriter(), lambda: executor
+        )
+        first = self._write_src("a.py")
+        self._run_request(worker, first)
+        (self.tmpdir / "copy").mkdir()
+        copy = self._write_src("copy/a.py")
+        # Any compile would now fail.
+        worker._executor = None
+
+        self._run_request(worker, copy)
+
+        self.assertEqual(precompiler._pyc_cache.stats()["hits"], 1)
+        self.assertEqual(
+            pathlib.Path(copy + "c").read_bytes(),
+            pathlib.Path(first + "c").read_bytes(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
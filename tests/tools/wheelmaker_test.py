@@ -0,0 +1,126 @@
+# Copyright 2025 The Bazel Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pathlib
+import random
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from tools import wheelmaker
+
+
+class WheelMakerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        rng = random.Random(0)
+        self.files = []
+        for i in range(10):
+            path = self.tmpdir / "src" / f"file{i}.py"
+            path.parent.mkdir(exist_ok=True)
+            # Mix compressible text with incompressible data, and files larger
+            # than the 1 MiB read size.
+            size = rng.choice([0, 10, 4096, 2**20 + 4096])
+            text = f"value = {i}\n" * (size // 12)
+            path.write_bytes(text.encode() + rng.randbytes(size // 4))
+            self.files.append((f"pkg/file{i}.py", str(path)))
+
+    def _build(self, name, **kwargs):
+        out = self.tmpdir / name
+        with wheelmaker.WheelMaker(
+            name="example",
+            version="1.0",
+            build_tag="",
+            python_tag="py3",
+            abi="none",
+            platform="any",
+            compress=True,
+            outfile=str(out),
+            stored_file_patterns=["*/file1.py"],
+            min_compression_size=20,
+            **kwargs,
+        ) as maker:
+            maker.add_files(self.files)
+            maker.add_wheelfile()
+            maker.add_recordfile()
+        return out.read_bytes()
+
+    def test_output_is_independent_of_threads_and_reuse(self):
+        serial = self._build("serial.whl")
+
+        self.assertEqual(self._build("threads.whl", compression_threads=4), serial)
+        previous = str(self.tmpdir / "serial.whl")
+        self.assertEqual(self._build("reused.whl", previous_wheel=previous), serial)
+        self.assertEqual(
+            self._build(
+                "reused_threads.whl", previous_wheel=previous, compression_threads=4
+            ),
+            serial,
+        )
+        with zipfile.ZipFile(self.tmpdir / "serial.whl") as zf:
+            self.assertIsNone(zf.testzip())
+
+    def test_changed_files_are_not_reused(self):
+        previous = self.tmpdir / "previous.whl"
+        self._build(previous.name)
+        pathlib.Path(self.files[3][1]).write_bytes(b"changed = True\n" * 100)
+        expected = self._build("expected.whl")
+
+        self.assertEqual(
+            self._build("reused.whl", previous_wheel=str(previous)), expected
+        )
+        self.assertEqual(
+            self._build(
+                "reused_threads.whl",
+                previous_wheel=str(previous),
+                compression_threads=4,
+            ),
+            expected,
+        )
+
+    def test_files_compressed_at_another_level_are_not_reused(self):
+        self._build("previous.whl", compression_level=1)
+        level9 = self._build("level9.whl", compression_level=9)
+        previous = str(self.tmpdir / "previous.whl")
+
+        self.assertNotEqual(
+            self._package_entries("level9.whl"), self._package_entries("previous.whl")
+        )
+        self.assertEqual(
+            self._build("reused.whl", compression_level=9, previous_wheel=previous),
+            level9,
+        )
+        self.assertEqual(
+            self._build(
+                "reused_threads.whl",
+                compression_level=9,
+                previous_wheel=previous,
+                compression_threads=4,
+            ),
+            level9,
+        )
+
+    def _package_entries(self, name):
+        with zipfile.ZipFile(self.tmpdir / name) as zf:
+            return {
+                zinfo.filename: (zinfo.compress_size, zinfo.CRC)
+                for zinfo in zf.infolist()
+                if zinfo.filename.startswith("pkg/")
+            }
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -35,34 +35,342 @@ def _create_parser() -> "argparse.Namespace":
     parser.add_argument("--persistent_worker", action="store_true")
     parser.add_argument("--log_level", default="ERROR")
     parser.add_argument("--worker_impl", default="async")
+    # Number of processes used by the `process` worker impl. Defaults to the
+    # number of CPUs.
+    parser.add_argument("--worker_processes", type=int, default=0)
+    # Number of compiled pycs to keep in memory, keyed by source content and
+    # compile settings, so identical sources are only compiled once.
+    parser.add_argument("--pyc_cache_entries", type=int, default=0)
+    # Directory to additionally keep compiled pycs in, so they survive
+    # restarts of the worker. Entries are never removed from it.
+    parser.add_argument("--pyc_cache_dir")
+    # File to periodically write aggregate worker stats to, as JSON. Use "-"
+    # for stderr.
+    parser.add_argument("--worker_stats_file")
+    parser.add_argument("--worker_stats_interval", type=float, default=60)
+    # Number of requests to profile with cProfile, and the file to write the
+    # profile to. Not supported by the `process` worker impl.
+    parser.add_argument("--worker_profile_requests", type=int, default=0)
+    parser.add_argument("--worker_profile_file")
     return parser
 
 
-def _compile(options: "argparse.Namespace") -> None:
+def _get_invalidation_mode(
+    options: "argparse.Namespace",
+) -> "py_compile.PycInvalidationMode":
     try:
-        invalidation_mode = py_compile.PycInvalidationMode[
-            options.invalidation_mode.upper()
-        ]
+        return py_compile.PycInvalidationMode[options.invalidation_mode.upper()]
     except KeyError as e:
         raise ValueError(
             f"Unknown PycInvalidationMode: {options.invalidation_mode}"
         ) from e
 
+
+def _get_compile_units(
+    options: "argparse.Namespace",
+) -> "list[tuple[str, str, str]]":
     if not (len(options.srcs) == len(options.src_names) == len(options.pycs)):
         raise AssertionError(
             "Mismatched number of --src, --src_name, and/or --pyc args"
         )
+    return list(zip(options.srcs, options.src_names, options.pycs))
+
+
+def _compile_one(
+    src: str,
+    src_name: str,
+    pyc: str,
+    optimize: int,
+    invalidation_mode: "py_compile.PycInvalidationMode",
+) -> None:
+    py_compile.compile(
+        src,
+        pyc,
+        doraise=True,
+        dfile=src_name,
+        optimize=optimize,
+        invalidation_mode=invalidation_mode,
+    )
+
+
+def _compile(options: "argparse.Namespace") -> None:
+    invalidation_mode = _get_invalidation_mode(options)
+    for src, src_name, pyc in _get_compile_units(options):
+        key = None
+        if _pyc_cache:
+            key = _pyc_cache.key(src, src_name, options.optimize, invalidation_mode)
+            if key and _pyc_cache.restore(key, pyc):
+                continue
+        _compile_one(src, src_name, pyc, options.optimize, invalidation_mode)
+        if key:
+            _pyc_cache.store(key, pyc)
+
+
+class _PycCache:
+    """LRU cache of compiled pyc data, keyed by source content and settings.
+
+    The same source is often compiled to different output paths, e.g. vendored
+    copies or different configurations. Because the pyc data only depends on
+    the source content, the name recorded in the pyc, and the compile
+    settings, those can reuse an earlier result instead of compiling again.
+
+    The on-disk cache isn't evicted from; it grows until it is deleted.
+    """
+
+    def __init__(self, max_entries: int, cache_dir: "str | None"):
+        self._max_entries = max_entries
+        self._cache_dir = cache_dir
+        self._entries = collections.OrderedDict()
+        # The async worker compiles from multiple threads.
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(
+        self,
+        src: str,
+        src_name: str,
+        optimize: int,
+        invalidation_mode: "py_compile.PycInvalidationMode",
+    ) -> "str | None":
+        """Returns the cache key for compiling `src`, or None if uncacheable."""
+        # Timestamp-based pycs embed the source's mtime, so they can't be
+        # shared between different copies of a source.
+        if invalidation_mode == py_compile.PycInvalidationMode.TIMESTAMP:
+            return None
+        digest = hashlib.sha256()
+        with open(src, "rb") as f:
+            digest.update(f.read())
+        for part in (importlib.util.MAGIC_NUMBER, optimize, invalidation_mode.name):
+            digest.update(b"\0" + str(part).encode("utf8"))
+        digest.update(b"\0" + src_name.encode("utf8"))
+        return digest.hexdigest()
+
+    def restore(self, key: str, pyc: str) -> bool:
+        """Writes the cached pyc data for `key` to `pyc`, if there is any."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if data is None and self._cache_dir:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                pass
+            # Entries can be damaged outside of the worker's control, e.g. by
+            # a full disk, so only accept data that at least has a valid
+            # header; anything else is recompiled and overwritten.
+            if data is not None and not self._is_pyc(data):
+                data = None
+            if data is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, data)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            return False
+        os.makedirs(os.path.dirname(pyc) or ".", exist_ok=True)
+        with open(pyc, "wb") as f:
+            f.write(data)
+        return True
+
+    def store(self, key: str, pyc: str) -> None:
+        """Adds the pyc data written to `pyc` to the cache."""
+        with open(pyc, "rb") as f:
+            data = f.read()
+        self._remember(key, data)
+        if self._cache_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so that concurrent readers, e.g.
+            # other workers, never see a partially written entry.
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if self._max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _is_pyc(data: bytes) -> bool:
+        # A pyc has a 16 byte header that starts with the magic number.
+        return len(data) > 16 and data.startswith(importlib.util.MAGIC_NUMBER)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, key[:2], key + ".pyc")
+
+    def stats(self) -> "dict[str, int]":
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
 
-    for src, src_name, pyc in zip(options.srcs, options.src_names, options.pycs):
-        py_compile.compile(
-            src,
-            pyc,
-            doraise=True,
-            dfile=src_name,
-            optimize=options.optimize,
-            invalidation_mode=invalidation_mode,
+_pyc_cache = None
+
+
+class _RequestTimer:
+    """Times the phases of processing a single worker request."""
+
+    def __init__(self, request_id: int, start: float):
+        self.request_id = request_id
+        self.phases = {}
+        self._last = start
+
+    def mark(self, phase: str) -> None:
+        """Adds the time since the previous phase ended to `phase`."""
+        now = time.monotonic()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+
+class _WorkerMetrics:
+    """Aggregates request timings of a persistent worker.
+
+    Requests are timed in phases from when they are read: waiting to be
+    processed, including waiting for a free thread (`queue_wait`), parsing
+    arguments (`parse_args`), compiling (`compile`), and sending the
+    response (`respond`). The aggregates are periodically written as JSON to
+    the stats file, if any. The first requests can also be profiled with
+    cProfile.
+    """
+
+    def __init__(self, options: "argparse.Namespace"):
+        if options.worker_profile_requests > 0 and not options.worker_profile_file:
+            raise ValueError("--worker_profile_requests requires --worker_profile_file")
+        self._stats_file = options.worker_stats_file
+        self._stats_interval = options.worker_stats_interval
+        self._profile_remaining = options.worker_profile_requests
+        self._profile_file = options.worker_profile_file
+        self._profile_stats = None
+        self._profiling = False
+        # The async worker compiles, and hence profiles, from multiple threads.
+        self._lock = threading.Lock()
+        self._last_dump = time.monotonic()
+        self._requests = 0
+        self._in_flight = 0
+        self._max_in_flight = 0
+        # Phase name to [count, total seconds, max seconds]
+        self._phases = {}
+
+    def start_request(
+        self, request: "JsonWorkRequest", received: float
+    ) -> _RequestTimer:
+        """Starts timing `request`, which was read at time `received`."""
+        with self._lock:
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+        return _RequestTimer(request.get("requestId", 0), received)
+
+    def finish_request(self, timer: _RequestTimer) -> None:
+        _logger.info(
+            "request %s: timings: %s", timer.request_id, json.dumps(timer.phases)
         )
-    return 0
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight -= 1
+            self._requests += 1
+            for phase, seconds in timer.phases.items():
+                aggregate = self._phases.setdefault(phase, [0, 0.0, 0.0])
+                aggregate[0] += 1
+                aggregate[1] += seconds
+                aggregate[2] = max(aggregate[2], seconds)
+            dump = now - self._last_dump >= self._stats_interval
+            if dump:
+                self._last_dump = now
+        if dump:
+            self.dump()
+
+    def snapshot(self) -> "dict[str, object]":
+        with self._lock:
+            stats = {
+                "requests": self._requests,
+                "in_flight": self._in_flight,
+                "max_in_flight": self._max_in_flight,
+                "phases": {
+                    phase: {
+                        "count": count,
+                        "total_seconds": total,
+                        "mean_seconds": total / count,
+                        "max_seconds": max_seconds,
+                    }
+                    for phase, (count, total, max_seconds) in self._phases.items()
+                },
+            }
+        if _pyc_cache:
+            stats["pyc_cache"] = _pyc_cache.stats()
+        return stats
+
+    def dump(self) -> None:
+        """Writes the aggregate stats to the stats file, if any."""
+        if not self._stats_file:
+            return
+        data = json.dumps(self.snapshot(), sort_keys=True) + "\n"
+        if self._stats_file == "-":
+            sys.stderr.write(data)
+            sys.stderr.flush()
+            return
+        tmp_path = f"{self._stats_file}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self._stats_file)
+
+    def profiled(self, func: "typing.Callable", *args: object) -> object:
+        """Calls `func`, profiling it if more requests should be profiled.
+
+        Only one call is profiled at a time: since Python 3.12, only one
+        profiler can be active in the process, so concurrent calls run
+        unprofiled instead. They don't count towards the profiled requests.
+        """
+        with self._lock:
+            profile = self._profile_remaining > 0 and not self._profiling
+            if profile:
+                self._profile_remaining -= 1
+                self._profiling = True
+        if not profile:
+            return func(*args)
+
+        import cProfile
+        import pstats
+
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler, e.g. of a debugger, is already active.
+                _logger.warning("Unable to profile request", exc_info=True)
+                return func(*args)
+            try:
+                return func(*args)
+            finally:
+                profiler.disable()
+                with self._lock:
+                    if self._profile_stats is None:
+                        self._profile_stats = pstats.Stats(profiler)
+                    else:
+                        self._profile_stats.add(profiler)
+                    self._profile_stats.dump_stats(self._profile_file)
+        finally:
+            with self._lock:
+                self._profiling = False
+
+
+_metrics = None
 
 
 # A stub type alias for readability.
@@ -90,12 +398,18 @@ class _SerialPersistentWorker:
                 request = None
                 try:
                     request = self._get_next_request()
+                    received = time.monotonic()
                     if request is None:
                         _logger.info("Empty request: exiting")
                         break
-                    response = self._process_request(request)
-                    if response:  # May be none for cancel request
-                        self._send_response(response)
+                    timer = _metrics.start_request(request, received)
+                    try:
+                        response = self._process_request(request, timer)
+                        if response:  # May be none for cancel request
+                            self._send_response(response)
+                        timer.mark("respond")
+                    finally:
+                        _metrics.finish_request(timer)
                 except Exception:
                     _logger.exception("Unhandled error: request=%s", request)
                     output = (
@@ -119,11 +433,18 @@ class _SerialPersistentWorker:
             return None
         return json.loads(line)
 
-    def _process_request(self, request: "JsonWorkRequest") -> "JsonWorkResponse | None":
+    def _process_request(
+        self, request: "JsonWorkRequest", timer: _RequestTimer
+    ) -> "JsonWorkResponse | None":
+        timer.mark("queue_wait")
         if request.get("cancel"):
             return None
         options = self._options_from_request(request)
-        _compile(options)
+        timer.mark("parse_args")
+        _metrics.profiled(_compile, options)
+        timer.mark("compile")
+        if _pyc_cache:
+            _logger.info("pyc cache: %s", _pyc_cache.stats())
         response = {
             "requestId": request.get("requestId", 0),
             "exitCode": 0,
@@ -179,9 +500,11 @@ class _AsyncPersistentWorker:
         while True:
             _logger.info("pending requests: %s", len(self._request_id_to_task))
             request = await self._get_next_request()
+            received = time.monotonic()
             request_id = request.get("requestId", 0)
+            timer = _metrics.start_request(request, received)
             task = asyncio.create_task(
-                self._process_request(request), name=f"request_{request_id}"
+                self._process_request(request, timer), name=f"request_{request_id}"
             )
             self._request_id_to_task[request_id] = task
             self._task_to_request_id[task] = request_id
@@ -199,13 +522,16 @@ class _AsyncPersistentWorker:
         del self._task_to_request_id[task]
         del self._request_id_to_task[request_id]
 
-    async def _process_request(self, request: "JsonWorkRequest") -> None:
+    async def _process_request(
+        self, request: "JsonWorkRequest", timer: _RequestTimer
+    ) -> None:
         _logger.info("request %s: start: %s", request.get("requestId"), request)
+        timer.mark("queue_wait")
         try:
             if request.get("cancel", False):
                 await self._process_cancel_request(request)
             else:
-                await self._process_compile_request(request)
+                await self._process_compile_request(request, timer)
         except asyncio.CancelledError:
             _logger.info(
                 "request %s: cancel received, stopping processing",
@@ -224,6 +550,8 @@ class _AsyncPersistentWorker:
                     "requestId": 0 if not request else request.get("requestId", 0),
                 }
             )
+        finally:
+            _metrics.finish_request(timer)
 
     async def _process_cancel_request(self, request: "JsonWorkRequest") -> None:
         request_id = request.get("requestId", 0)
@@ -235,16 +563,29 @@ class _AsyncPersistentWorker:
         task.cancel()
         self._send_response({"requestId": request_id, "wasCancelled": True})
 
-    async def _process_compile_request(self, request: "JsonWorkRequest") -> None:
+    async def _process_compile_request(
+        self, request: "JsonWorkRequest", timer: _RequestTimer
+    ) -> None:
         options = self._options_from_request(request)
+        timer.mark("parse_args")
+
+        def compile_in_thread():
+            # Requests also wait for a free thread.
+            timer.mark("queue_wait")
+            _metrics.profiled(_compile, options)
+
         # _compile performs a varity of blocking IO calls, so run it separately
-        await asyncio.to_thread(_compile, options)
+        await asyncio.to_thread(compile_in_thread)
+        timer.mark("compile")
+        if _pyc_cache:
+            _logger.info("pyc cache: %s", _pyc_cache.stats())
         self._send_response(
             {
                 "requestId": request.get("requestId", 0),
                 "exitCode": 0,
             }
         )
+        timer.mark("respond")
 
     def _options_from_request(self, request: "JsonWorkRequest") -> "argparse.Namespace":
         options = self._parser.parse_args(request["arguments"])
@@ -259,21 +600,137 @@ class _AsyncPersistentWorker:
         self._writer.write(json.dumps(response).encode("utf8") + b"\n")
 
 
+class _ProcessPoolPersistentWorker(_AsyncPersistentWorker):
+    """Asynchronous, concurrent, persistent worker that compiles in subprocesses.
+
+    Compiling is CPU bound, so running it in threads is serialized by the GIL.
+    This worker instead fans the files of all in-flight requests out to a pool
+    of processes that are started once and reused for the life of the worker.
+    """
+
+    def __init__(
+        self,
+        reader: "typing.TextIO",
+        writer: "typing.TextIO",
+        create_executor: "typing.Callable[[], concurrent.futures.Executor]",
+    ):
+        super().__init__(reader, writer)
+        self._create_executor = create_executor
+        self._executor = create_executor()
+
+    @classmethod
+    async def main(
+        cls, instream: "typing.TextIO", outstream: "typing.TextIO", processes: int
+    ) -> None:
+        reader, writer = await cls._connect_streams(instream, outstream)
+
+        def create_executor():
+            # Spawn rather than fork: forking a process that is running an
+            # event loop isn't safe.
+            return concurrent.futures.ProcessPoolExecutor(
+                max_workers=processes or None,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+        worker = cls(reader, writer, create_executor)
+        try:
+            await worker.run()
+        finally:
+            worker._executor.shutdown()
+
+    async def _process_compile_request(
+        self, request: "JsonWorkRequest", timer: _RequestTimer
+    ) -> None:
+        options = self._options_from_request(request)
+        invalidation_mode = _get_invalidation_mode(options)
+        timer.mark("parse_args")
+        await asyncio.gather(
+            *(
+                self._compile_unit(
+                    src, src_name, pyc, options.optimize, invalidation_mode
+                )
+                for src, src_name, pyc in _get_compile_units(options)
+            )
+        )
+        timer.mark("compile")
+        if _pyc_cache:
+            _logger.info("pyc cache: %s", _pyc_cache.stats())
+        self._send_response(
+            {
+                "requestId": request.get("requestId", 0),
+                "exitCode": 0,
+            }
+        )
+        timer.mark("respond")
+
+    async def _compile_unit(
+        self,
+        src: str,
+        src_name: str,
+        pyc: str,
+        optimize: int,
+        invalidation_mode: "py_compile.PycInvalidationMode",
+    ) -> None:
+        # Cache lookups stay in this process, so only cache misses are sent
+        # to the pool. They read and write files, so run them in a thread to
+        # avoid blocking the event loop.
+        key = None
+        if _pyc_cache:
+            key = await asyncio.to_thread(
+                _pyc_cache.key, src, src_name, optimize, invalidation_mode
+            )
+            if key and await asyncio.to_thread(_pyc_cache.restore, key, pyc):
+                return
+        loop = asyncio.get_running_loop()
+        args = (src, src_name, pyc, optimize, invalidation_mode)
+        executor = self._executor
+        try:
+            await loop.run_in_executor(executor, _compile_one, *args)
+        except concurrent.futures.BrokenExecutor:
+            # A pool process died, e.g. it was killed or ran out of memory,
+            # which breaks the whole pool with a BrokenProcessPool error.
+            # Replace the pool so that this and later requests can still be
+            # compiled. Concurrent compiles all fail when that happens; only
+            # the first one replaces the pool.
+            if self._executor is executor:
+                _logger.warning("process pool is broken: starting a new one")
+                self._executor = self._create_executor()
+                executor.shutdown(wait=False)
+            await loop.run_in_executor(self._executor, _compile_one, *args)
+        if key:
+            await asyncio.to_thread(_pyc_cache.store, key, pyc)
+
+
 def main(args: "list[str]") -> int:
+    global asyncio, collections, concurrent, hashlib, importlib, itertools, json
+    global logging, multiprocessing, os, threading, time, traceback
+    global _logger, _metrics, _pyc_cache
     options = _create_parser().parse_args(args)
 
+    if options.pyc_cache_entries > 0 or options.pyc_cache_dir:
+        import collections
+        import hashlib
+        import importlib.util
+        import os.path
+        import threading
+
+        _pyc_cache = _PycCache(options.pyc_cache_entries, options.pyc_cache_dir)
+
     # Persistent workers are started with the `--persistent_worker` flag.
     # See the following docs for details on persistent workers:
     # https://bazel.build/remote/persistent
     # https://bazel.build/remote/multiplex
     # https://bazel.build/remote/creating
     if options.persistent_worker:
-        global asyncio, itertools, json, logging, os, traceback, _logger
         import asyncio
+        import concurrent.futures
         import itertools
         import json
         import logging
+        import multiprocessing
         import os.path
+        import threading
+        import time
         import traceback
 
         _logger = logging.getLogger("precompiler")
@@ -281,12 +738,26 @@ def main(args: "list[str]") -> int:
         # invocations from spamming stderr with logging info
         logging.basicConfig(level=getattr(logging, options.log_level))
         _logger.info("persistent worker: impl=%s", options.worker_impl)
-        if options.worker_impl == "serial":
-            _SerialPersistentWorker(sys.stdin, sys.stdout).run()
-        elif options.worker_impl == "async":
-            asyncio.run(_AsyncPersistentWorker.main(sys.stdin, sys.stdout))
-        else:
-            raise ValueError(f"Unknown worker impl: {options.worker_impl}")
+        _metrics = _WorkerMetrics(options)
+        try:
+            if options.worker_impl == "serial":
+                _SerialPersistentWorker(sys.stdin, sys.stdout).run()
+            elif options.worker_impl == "async":
+                asyncio.run(_AsyncPersistentWorker.main(sys.stdin, sys.stdout))
+            elif options.worker_impl == "process":
+                if options.worker_profile_requests > 0:
+                    _logger.warning(
+                        "--worker_profile_requests is ignored by the process impl"
+                    )
+                asyncio.run(
+                    _ProcessPoolPersistentWorker.main(
+                        sys.stdin, sys.stdout, options.worker_processes
+                    )
+                )
+            else:
+                raise ValueError(f"Unknown worker impl: {options.worker_impl}")
+        finally:
+            _metrics.dump()
     else:
         _compile(options)
     return 0
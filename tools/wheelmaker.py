@@ -16,17 +16,24 @@ from __future__ import annotations
 
 import argparse
 import base64
+import collections
+import concurrent.futures
 import csv
+import fnmatch
 import hashlib
 import io
 import os
 import re
 import stat
+import struct
 import sys
 import zipfile
+import zlib
 from pathlib import Path
 
 _ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+# Same layout as zipfile.structFileHeader.
+_LOCAL_FILE_HEADER = struct.Struct("<4s2B4HL2L2H")
 
 
 def commonpath(path1, path2):
@@ -98,6 +105,49 @@ def normalize_pep440(version):
         return str(packaging.version.Version(f"0+{sanitized}"))
 
 
+def _compression_level_comment(level):
+    """The archive comment recording the deflate level of a wheel's entries.
+
+    Wheels compressed at the default level have no comment, so their bytes
+    don't change.
+    """
+    if level is None:
+        return b""
+    return "compression_level={}".format(level).encode("ascii")
+
+
+def _read_previous_entries(path):
+    """Read a previously built wheel's archive comment and entries.
+
+    Returns the comment and a map of each file to (ZipInfo, RECORD digest).
+    Files without a sha256 digest in the RECORD file are omitted. A missing
+    or unreadable wheel is treated as empty.
+    """
+    try:
+        with zipfile.ZipFile(path) as zf:
+            comment = zf.comment
+            infos = {zinfo.filename: zinfo for zinfo in zf.infolist()}
+            record_name = next(
+                (name for name in infos if name.endswith(".dist-info/RECORD")), None
+            )
+            if record_name is None:
+                return b"", {}
+            record = zf.read(record_name).decode("utf-8", "surrogateescape")
+    except (OSError, zipfile.BadZipFile):
+        return b"", {}
+
+    entries = {}
+    for row in csv.reader(io.StringIO(record)):
+        if len(row) != 3 or not row[1].startswith("sha256="):
+            continue
+        filename, digest, size = row
+        zinfo = infos.get(filename)
+        if zinfo is None or str(zinfo.file_size) != size or zinfo.flag_bits & 0x1:
+            continue
+        entries[filename] = (zinfo, digest.encode("utf-8", "surrogateescape"))
+    return comment, entries
+
+
 class _WhlFile(zipfile.ZipFile):
     def __init__(
         self,
@@ -107,15 +157,36 @@ class _WhlFile(zipfile.ZipFile):
         distribution_prefix: str,
         strip_path_prefixes=None,
         compression=zipfile.ZIP_DEFLATED,
+        stored_file_patterns=None,
+        min_compression_size=0,
+        previous_wheel=None,
         **kwargs,
     ):
         self._distribution_prefix = distribution_prefix
 
         self._strip_path_prefixes = strip_path_prefixes or []
+        # Entries matching any of these globs, or smaller than
+        # min_compression_size bytes, are stored without compression.
+        self._stored_file_patterns = stored_file_patterns or []
+        self._min_compression_size = min_compression_size
         # Entries for the RECORD file as (filename, hash, size) tuples.
         self._record = []
+        # Unchanged files are copied from the previous wheel without
+        # compressing them again.
+        if previous_wheel and os.path.abspath(previous_wheel) == os.path.abspath(
+            filename
+        ):
+            raise ValueError("previous_wheel must not be the wheel being written")
+        self._previous_wheel = previous_wheel
+        self._previous_comment, self._previous_entries = (
+            _read_previous_entries(previous_wheel) if previous_wheel else (b"", {})
+        )
 
         super().__init__(filename, mode=mode, compression=compression, **kwargs)
+        if compression == zipfile.ZIP_DEFLATED:
+            # The zip format doesn't record the deflate level, so it is kept in
+            # the archive comment for builds that reuse this wheel's entries.
+            self.comment = _compression_level_comment(self.compresslevel)
 
     def distinfo_path(self, basename):
         return f"{self._distribution_prefix}.dist-info/{basename}"
@@ -123,53 +194,208 @@ class _WhlFile(zipfile.ZipFile):
     def data_path(self, basename):
         return f"{self._distribution_prefix}.data/{basename}"
 
-    def add_file(self, package_filename, real_filename):
-        """Add given file to the distribution."""
-
-        def arcname_from(name):
-            # Always use unix path separators.
-            normalized_arcname = name.replace(os.path.sep, "/")
-            # Don't manipulate names filenames in the .distinfo or .data directories.
-            if normalized_arcname.startswith(self._distribution_prefix):
-                return normalized_arcname
-            for prefix in self._strip_path_prefixes:
-                if normalized_arcname.startswith(prefix):
-                    return normalized_arcname[len(prefix) :]
-
+    def _arcname_from(self, name):
+        # Always use unix path separators.
+        normalized_arcname = name.replace(os.path.sep, "/")
+        # Don't manipulate names filenames in the .distinfo or .data directories.
+        if normalized_arcname.startswith(self._distribution_prefix):
             return normalized_arcname
+        for prefix in self._strip_path_prefixes:
+            if normalized_arcname.startswith(prefix):
+                return normalized_arcname[len(prefix) :]
+
+        return normalized_arcname
 
+    def _expand_file(self, package_filename, real_filename):
+        """Yield (arcname, real_filename) pairs, recursing into directories."""
         if os.path.isdir(real_filename):
             directory_contents = os.listdir(real_filename)
             for file_ in directory_contents:
-                self.add_file(
+                yield from self._expand_file(
                     "{}/{}".format(package_filename, file_),
                     "{}/{}".format(real_filename, file_),
                 )
             return
 
-        arcname = arcname_from(package_filename)
-        zinfo = self._zipinfo(arcname)
+        yield self._arcname_from(package_filename), real_filename
+
+    def add_file(self, package_filename, real_filename):
+        """Add given file to the distribution."""
+        for arcname, filename in self._expand_file(package_filename, real_filename):
+            zinfo = self._zipinfo(arcname, os.path.getsize(filename))
+
+            if self._previous_entries and self._seekable:
+                previous = self._reuse_previous_entry(zinfo, filename)
+                if previous:
+                    self._write_compressed(zinfo, *previous)
+                    continue
+
+            # Write file to the zip archive while computing the hash and length
+            hash = hashlib.sha256()
+            size = 0
+            with open(filename, "rb") as fsrc:
+                with self.open(zinfo, "w") as fdst:
+                    while True:
+                        block = fsrc.read(2**20)
+                        if not block:
+                            break
+                        fdst.write(block)
+                        hash.update(block)
+                        size += len(block)
+
+            self._add_to_record(arcname, self._serialize_digest(hash), size)
+
+    def add_files(self, files, threads=1):
+        """Add (package_filename, real_filename) pairs to the distribution.
+
+        With more than one thread, entries are compressed and hashed in a
+        thread pool and written in the order given, so the archive is
+        byte-identical to calling `add_file` for each pair.
+        """
+        if threads <= 1 or not self._seekable:
+            for package_filename, real_filename in files:
+                self.add_file(package_filename, real_filename)
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            # Bound the number of compressed entries held in memory.
+            pending = collections.deque()
+            for package_filename, real_filename in files:
+                for arcname, filename in self._expand_file(
+                    package_filename, real_filename
+                ):
+                    zinfo = self._zipinfo(arcname, os.path.getsize(filename))
+                    future = executor.submit(self._compress_file, zinfo, filename)
+                    pending.append((zinfo, future))
+                    if len(pending) > 2 * threads:
+                        zinfo, future = pending.popleft()
+                        self._write_compressed(zinfo, *future.result())
+            while pending:
+                zinfo, future = pending.popleft()
+                self._write_compressed(zinfo, *future.result())
+
+    def _compress_file(self, zinfo, filename):
+        """Compress and hash a file the same way `add_file` would.
+
+        Returns a (data, crc, digest, size) tuple. This runs in a worker
+        thread; zlib and hashlib release the GIL on large buffers.
+        """
+        if self._previous_entries:
+            previous = self._reuse_previous_entry(zinfo, filename)
+            if previous:
+                return previous
+
+        if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+            # Mirrors the compressor zipfile uses for ZIP_DEFLATED entries.
+            level = zinfo._compresslevel
+            if level is None:
+                level = zlib.Z_DEFAULT_COMPRESSION
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        elif zinfo.compress_type == zipfile.ZIP_STORED:
+            compressor = None
+        else:
+            raise NotImplementedError(
+                "unsupported compression type: {}".format(zinfo.compress_type)
+            )
 
-        # Write file to the zip archive while computing the hash and length
+        chunks = []
+        crc = 0
         hash = hashlib.sha256()
         size = 0
-        with open(real_filename, "rb") as fsrc:
-            with self.open(zinfo, "w") as fdst:
-                while True:
-                    block = fsrc.read(2**20)
-                    if not block:
-                        break
-                    fdst.write(block)
-                    hash.update(block)
-                    size += len(block)
-
-        self._add_to_record(arcname, self._serialize_digest(hash), size)
+        with open(filename, "rb") as fsrc:
+            while True:
+                block = fsrc.read(2**20)
+                if not block:
+                    break
+                crc = zlib.crc32(block, crc)
+                hash.update(block)
+                size += len(block)
+                chunks.append(compressor.compress(block) if compressor else block)
+        if compressor:
+            chunks.append(compressor.flush())
+        return b"".join(chunks), crc, self._serialize_digest(hash), size
+
+    def _reuse_previous_entry(self, zinfo, filename):
+        """Return the previous wheel's entry for zinfo if filename is unchanged.
+
+        Returns a (data, crc, digest, size) tuple like `_compress_file`, or None
+        if the entry has to be compressed again.
+        """
+        previous = self._previous_entries.get(zinfo.filename)
+        if previous is None:
+            return None
+        previous_zinfo, digest = previous
+        if (
+            previous_zinfo.compress_type != zinfo.compress_type
+            or previous_zinfo.file_size != os.path.getsize(filename)
+        ):
+            return None
+        # Deflated entries are only reused if they were compressed at the same
+        # level, so the output doesn't depend on what was built before.
+        if (
+            zinfo.compress_type == zipfile.ZIP_DEFLATED
+            and self._previous_comment != self.comment
+        ):
+            return None
+
+        hash = hashlib.sha256()
+        with open(filename, "rb") as fsrc:
+            while True:
+                block = fsrc.read(2**20)
+                if not block:
+                    break
+                hash.update(block)
+        if self._serialize_digest(hash) != digest:
+            return None
+
+        # Copy the raw member data, skipping over its local file header.
+        # Each call opens its own handle so it is safe to use from threads.
+        with open(self._previous_wheel, "rb") as fprev:
+            fprev.seek(previous_zinfo.header_offset)
+            header = fprev.read(_LOCAL_FILE_HEADER.size)
+            signature, *_, name_length, extra_length = _LOCAL_FILE_HEADER.unpack(header)
+            if signature != b"PK\x03\x04":
+                return None
+            fprev.seek(name_length + extra_length, os.SEEK_CUR)
+            data = fprev.read(previous_zinfo.compress_size)
+        return data, previous_zinfo.CRC, digest, previous_zinfo.file_size
+
+    def _write_compressed(self, zinfo, data, crc, digest, size):
+        """Write already compressed entry data to the archive.
+
+        This produces the same local header that `ZipFile.open(zinfo, "w")`
+        leaves behind once the entry is closed.
+        """
+        if size > zipfile.ZIP64_LIMIT or len(data) > zipfile.ZIP64_LIMIT:
+            raise RuntimeError("File size too large, try using force_zip64")
+        if self._writing:
+            raise ValueError(
+                "Can't write to the ZIP file while there is another write handle "
+                "open on it."
+            )
+
+        zinfo.flag_bits = 0x00
+        zinfo.CRC = crc
+        zinfo.file_size = size
+        zinfo.compress_size = len(data)
+
+        self.fp.seek(self.start_dir)
+        zinfo.header_offset = self.fp.tell()
+        self._writecheck(zinfo)
+        self._didModify = True
+        self.fp.write(zinfo.FileHeader(False))
+        self.fp.write(data)
+        self.start_dir = self.fp.tell()
+        self.filelist.append(zinfo)
+        self.NameToInfo[zinfo.filename] = zinfo
+
+        self._add_to_record(zinfo.filename, digest, size)
 
     def add_string(self, filename, contents):
         """Add given 'contents' as filename to the distribution."""
         if isinstance(contents, str):
             contents = contents.encode("utf-8", "surrogateescape")
-        zinfo = self._zipinfo(filename)
+        zinfo = self._zipinfo(filename, len(contents))
         self.writestr(zinfo, contents)
         hash = hashlib.sha256()
         hash.update(contents)
@@ -186,8 +412,23 @@ class _WhlFile(zipfile.ZipFile):
         size = str(size).encode("ascii")
         self._record.append((filename, hash, size))
 
-    def _zipinfo(self, filename):
-        """Construct deterministic ZipInfo entry for a file named filename"""
+    def _compress_type(self, arcname, size):
+        """Return the compression method for an entry per the policy."""
+        if self.compression == zipfile.ZIP_STORED:
+            return zipfile.ZIP_STORED
+        if size is not None and size < self._min_compression_size:
+            return zipfile.ZIP_STORED
+        for pattern in self._stored_file_patterns:
+            if fnmatch.fnmatchcase(arcname, pattern):
+                return zipfile.ZIP_STORED
+        return self.compression
+
+    def _zipinfo(self, filename, size=None):
+        """Construct deterministic ZipInfo entry for a file named filename
+
+        The compression method is chosen by `_compress_type`; `size` is the
+        uncompressed size of the entry, if known.
+        """
         # Strip leading path separators to mirror ZipInfo.from_file behavior
         separators = os.path.sep
         if os.path.altsep is not None:
@@ -203,7 +444,11 @@ class _WhlFile(zipfile.ZipFile):
         zinfo.external_attr = (
             stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO | stat.S_IFREG
         ) << 16  # permissions: -rwxrwxrwx
-        zinfo.compress_type = self.compression
+        zinfo.compress_type = self._compress_type(arcname, size)
+        if zinfo.compress_type != zipfile.ZIP_STORED:
+            # ZipFile only applies its compresslevel to entries it creates
+            # the ZipInfo for, so set it explicitly.
+            zinfo._compresslevel = self.compresslevel
         return zinfo
 
     def add_recordfile(self):
@@ -241,6 +486,11 @@ class WheelMaker(object):
         compress,
         outfile=None,
         strip_path_prefixes=None,
+        compression_threads=1,
+        compression_level=None,
+        stored_file_patterns=None,
+        min_compression_size=0,
+        previous_wheel=None,
     ):
         self._name = name
         self._version = normalize_pep440(version)
@@ -251,6 +501,11 @@ class WheelMaker(object):
         self._outfile = outfile
         self._strip_path_prefixes = strip_path_prefixes
         self._compress = compress
+        self._compression_threads = compression_threads
+        self._compression_level = compression_level
+        self._stored_file_patterns = stored_file_patterns
+        self._min_compression_size = min_compression_size
+        self._previous_wheel = previous_wheel
         self._wheelname_fragment_distribution_name = escape_filename_distribution_name(
             self._name
         )
@@ -268,6 +523,10 @@ class WheelMaker(object):
             distribution_prefix=self._distribution_prefix,
             strip_path_prefixes=self._strip_path_prefixes,
             compression=zipfile.ZIP_DEFLATED if self._compress else zipfile.ZIP_STORED,
+            compresslevel=self._compression_level,
+            stored_file_patterns=self._stored_file_patterns,
+            min_compression_size=self._min_compression_size,
+            previous_wheel=self._previous_wheel,
         )
         return self
 
@@ -303,6 +562,10 @@ class WheelMaker(object):
         """Add given file to the distribution."""
         self._whlfile.add_file(package_filename, real_filename)
 
+    def add_files(self, files):
+        """Add (package_filename, real_filename) pairs to the distribution."""
+        self._whlfile.add_files(files, threads=self._compression_threads)
+
     def add_wheelfile(self):
         """Write WHEEL file to the distribution"""
         # TODO(pstradomski): Support non-purelib wheels.
@@ -407,6 +670,43 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Disable compression of the final archive",
     )
+    output_group.add_argument(
+        "--compression_threads",
+        type=int,
+        default=1,
+        help="Number of threads used to compress and hash the wheel contents. "
+        "The output is the same regardless of the number of threads.",
+    )
+    output_group.add_argument(
+        "--compression_level",
+        type=int,
+        default=None,
+        choices=range(0, 10),
+        metavar="{0..9}",
+        help="Deflate compression level. Defaults to the zlib default.",
+    )
+    output_group.add_argument(
+        "--stored_file_pattern",
+        type=str,
+        action="append",
+        default=[],
+        help="Glob matched against paths in the wheel, e.g. '*.so'. Matching "
+        "files are stored without compression. Can be supplied multiple times.",
+    )
+    output_group.add_argument(
+        "--min_compression_size",
+        type=int,
+        default=0,
+        help="Files smaller than this many bytes are stored without compression.",
+    )
+    output_group.add_argument(
+        "--previous_wheel",
+        type=str,
+        default=None,
+        help="A previously built version of this wheel. Files whose contents "
+        "match its RECORD, and that were compressed at the same level, are copied "
+        "from it instead of being compressed again.",
+    )
     output_group.add_argument(
         "--name_file",
         type=Path,
@@ -536,9 +836,13 @@ def main() -> None:
         outfile=arguments.out,
         strip_path_prefixes=strip_prefixes,
         compress=not arguments.no_compress,
+        compression_threads=arguments.compression_threads,
+        compression_level=arguments.compression_level,
+        stored_file_patterns=arguments.stored_file_pattern,
+        min_compression_size=arguments.min_compression_size,
+        previous_wheel=arguments.previous_wheel,
     ) as maker:
-        for package_filename, real_filename in all_files:
-            maker.add_file(package_filename, real_filename)
+        maker.add_files(all_files)
         maker.add_wheelfile()
 
         description = None